@@ -24,6 +24,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pytz import timezone
 from uvloop import install
 
+from bot.core.task_registry import TaskRegistry
 from sabnzbdapi import SabnzbdClient
 
 getLogger("requests").setLevel(WARNING)
@@ -85,10 +86,8 @@ user_data = {}
 aria2_options = {}
 qbit_options = {}
 nzb_options = {}
-queued_dl = {}
-queued_up = {}
 status_dict = {}
-task_dict = {}
+task_dict = TaskRegistry()
 jd_downloads = {}
 nzb_jobs = {}
 rss_dict = {}
@@ -104,7 +103,6 @@ multi_tags = set()
 task_dict_lock = Lock()
 queue_dict_lock = Lock()
 qb_listener_lock = Lock()
-cpu_eater_lock = Lock()
 same_directory_lock = Lock()
 nzb_listener_lock = Lock()
 jd_listener_lock = Lock()
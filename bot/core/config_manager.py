@@ -19,8 +19,12 @@ class Config:
     DEFAULT_UPLOAD: str = "gd"
     EXCLUDED_EXTENSIONS: str = ""
     FFMPEG_CMDS: ClassVar[dict[str, list[str]]] = {}
+    FFMPEG_PARALLEL_FILES: int = 1
     FILELION_API: str = ""
     GDRIVE_ID: str = ""
+    GDRIVE_WORKERS: int = 8
+    GDRIVE_WRITE_BURST: int = 20
+    GDRIVE_WRITE_RATE: int = 3
     INCOMPLETE_TASK_NOTIFIER: bool = False
     INDEX_URL: str = ""
     JD_EMAIL: str = ""
@@ -36,10 +40,16 @@ class Config:
     NAME_SUBSTITUTE: str = ""
     OWNER_ID: int = 0
     QUEUE_ALL: int = 0
+    QUEUE_CPU_LIMIT: int = 0
     QUEUE_DOWNLOAD: int = 0
+    QUEUE_LINK_CAPACITY: int = 0
+    QUEUE_SHORT_FIRST: bool = False
     QUEUE_UPLOAD: int = 0
     RCLONE_FLAGS: str = ""
     RCLONE_PATH: str = ""
+    RCLONE_RCD: bool = True
+    RCLONE_RCD_TPSLIMIT: int = 3
+    RCLONE_RCD_TPSLIMIT_BURST: int = 1
     RCLONE_SERVE_URL: str = ""
     RCLONE_SERVE_USER: str = ""
     RCLONE_SERVE_PASS: str = ""
@@ -0,0 +1,148 @@
+from collections.abc import MutableMapping
+
+
+class TaskRegistry(MutableMapping):
+    """Mapping of message id to task status object with secondary indexes.
+
+    Behaves like the plain ``task_dict`` it replaces, and additionally keeps
+    indexes on full gid, short gid (first/last 8 and first 12 characters),
+    user id and status, so lookups don't need to scan every task. Every
+    change goes through ``__setitem__`` and ``__delitem__``, so ``pop()``,
+    ``clear()``, ``update()`` and the other mapping methods keep the indexes
+    in sync.
+
+    Gids of some tools (qBittorrent hash, aria2 followed-by gid) are only
+    known or may change after ``update()``; such tasks report it through
+    :meth:`refresh_gid`. Statuses are computed by the tasks themselves, so
+    the status index holds the last status recorded with :meth:`set_status`.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._by_gid = {}
+        self._gid_keys = {}
+        self._no_gid = set()
+        self._by_user = {}
+        self._by_status = {}
+        self._status = {}
+
+    def __getitem__(self, mid):
+        return self._tasks[mid]
+
+    def __setitem__(self, mid, task):
+        if mid in self._tasks:
+            self._unindex(mid)
+        self._tasks[mid] = task
+        self._by_user.setdefault(task.listener.user_id, {})[mid] = task
+        self._index_gid(mid, task)
+
+    def __delitem__(self, mid):
+        self._unindex(mid)
+        del self._tasks[mid]
+
+    def __contains__(self, mid):
+        return mid in self._tasks
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def get(self, mid, default=None):
+        return self._tasks.get(mid, default)
+
+    def values(self):
+        return self._tasks.values()
+
+    def items(self):
+        return self._tasks.items()
+
+    def _unindex(self, mid):
+        task = self._tasks[mid]
+        user_id = task.listener.user_id
+        if (user_tasks := self._by_user.get(user_id)) is not None:
+            user_tasks.pop(mid, None)
+            if not user_tasks:
+                del self._by_user[user_id]
+        for key in self._gid_keys.pop(mid, ()):
+            if self._by_gid.get(key) is task:
+                del self._by_gid[key]
+        self._no_gid.discard(mid)
+        if (status := self._status.pop(mid, None)) is not None:
+            self._by_status[status].discard(mid)
+            if not self._by_status[status]:
+                del self._by_status[status]
+
+    def _index_gid(self, mid, task):
+        for key in self._gid_keys.pop(mid, ()):
+            if self._by_gid.get(key) is task:
+                del self._by_gid[key]
+        try:
+            gid = task.gid()
+        except Exception:
+            gid = None
+        if not gid:
+            self._no_gid.add(mid)
+            return
+        self._no_gid.discard(mid)
+        keys = {gid, gid[:8], gid[-8:], gid[:12]}
+        for key in keys:
+            self._by_gid[key] = task
+        self._gid_keys[mid] = keys
+
+    def refresh_gid(self, task):
+        """Indexes the current gid of a task again, if it's registered."""
+        mid = task.listener.mid
+        if self._tasks.get(mid) is task:
+            self._index_gid(mid, task)
+
+    def without_gid(self):
+        """Returns the tasks whose gid isn't known yet."""
+        return [self._tasks[mid] for mid in self._no_gid]
+
+    def find(self, gid):
+        """Returns the task with the full or short gid ``gid``, or None."""
+        if (task := self._by_gid.get(gid)) is not None and _gid_matches(task, gid):
+            return task
+        return None
+
+    def by_user(self, user_id):
+        """Returns the tasks of a user."""
+        return list(self._by_user.get(user_id, {}).values())
+
+    def set_status(self, mid, status):
+        """Records the last computed status of a task."""
+        if mid not in self._tasks:
+            return
+        if (old := self._status.get(mid)) is not None:
+            if old == status:
+                return
+            self._by_status[old].discard(mid)
+            if not self._by_status[old]:
+                del self._by_status[old]
+        self._status[mid] = status
+        self._by_status.setdefault(status, set()).add(mid)
+
+    def by_status(self, status, user_id=None):
+        """Returns the tasks whose last recorded status is ``status``.
+
+        Args:
+            status: The recorded status.
+            user_id: Only return the tasks of this user.
+        """
+        mids = self._by_status.get(status, set())
+        if not user_id:
+            return [self._tasks[mid] for mid in mids]
+        user_tasks = self._by_user.get(user_id, {})
+        if len(user_tasks) < len(mids):
+            return [task for mid, task in user_tasks.items() if mid in mids]
+        return [user_tasks[mid] for mid in mids if mid in user_tasks]
+
+
+def _gid_matches(task, gid):
+    try:
+        task_gid = task.gid()
+    except Exception:
+        return False
+    return task_gid.startswith(gid) or task_gid.endswith(gid)
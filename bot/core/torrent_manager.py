@@ -1,7 +1,9 @@
 import contextlib
-from asyncio import gather
+from asyncio import Lock, gather
 from inspect import iscoroutinefunction
 from pathlib import Path
+from time import time
+from typing import ClassVar
 
 from aioaria2 import Aria2WebsocketClient
 from aiohttp import ClientError
@@ -156,6 +158,135 @@ class TorrentManager:
             aria2_options[key] = value
 
 
+class QbitSnapshot:
+    """Shared in-memory mirror of every torrent known to qBittorrent.
+
+    The mirror is kept up to date through ``sync/maindata`` with the last
+    seen ``rid``, so each poll only fetches the torrents that changed.
+    Torrents are indexed by tag and by hash, and the listener, the
+    status objects and task lookups all read the same data instead of
+    querying qBittorrent once per torrent.
+    """
+
+    by_tag: ClassVar[dict] = {}
+    by_hash: ClassVar[dict] = {}
+    changed: ClassVar[set] = set()
+    rid = 0
+    updated_at = 0
+    max_age = 3
+    _lock = Lock()
+
+    @classmethod
+    async def refresh(cls, max_age=0):
+        """Applies the next ``sync/maindata`` delta unless the mirror is
+        younger than ``max_age``.
+
+        Concurrent callers are serialized on a lock, so a burst of status
+        refreshes shares one poll. Torrents named in the delta are fetched
+        with a single ``torrents/info`` call filtered by hash, and their
+        hashes are collected in ``changed`` until :meth:`pop_changed`.
+
+        Args:
+            max_age: Maximum accepted age of the current mirror in seconds.
+                Zero forces a refresh.
+        """
+        async with cls._lock:
+            if max_age and time() - cls.updated_at < max_age:
+                return
+            data = await TorrentManager.qbittorrent.sync.maindata(cls.rid)
+            if data.full_update:
+                cls.by_tag.clear()
+                cls.by_hash.clear()
+            for hash_ in data.torrents_removed:
+                cls.remove(hash_)
+            if data.torrents:
+                for tor in await TorrentManager.qbittorrent.torrents.info(
+                    hashes=list(data.torrents),
+                ):
+                    cls._index(tor)
+                    cls.changed.add(tor.hash)
+            cls.rid = data.rid
+            cls.updated_at = time()
+
+    @classmethod
+    def _index(cls, tor):
+        if old := cls.by_hash.get(tor.hash):
+            for tag in old.tags:
+                if cls.by_tag.get(tag) is old:
+                    del cls.by_tag[tag]
+        cls.by_hash[tor.hash] = tor
+        if tor.tags:
+            cls.by_tag[tor.tags[0]] = tor
+
+    @classmethod
+    def pop_changed(cls, watch_states=()):
+        """Returns the torrents changed since the last call.
+
+        Args:
+            watch_states: States whose torrents are returned even when they
+                didn't change, for checks that depend on elapsed time.
+
+        Returns:
+            A list of torrents to be processed by the listener.
+        """
+        changed = cls.changed.copy()
+        cls.changed.clear()
+        if watch_states:
+            changed.update(
+                hash_
+                for hash_, tor in cls.by_hash.items()
+                if tor.state in watch_states
+            )
+        return [cls.by_hash[hash_] for hash_ in changed if hash_ in cls.by_hash]
+
+    @classmethod
+    def touch(cls, tag):
+        """Marks the torrent with the given tag as changed, so the listener
+        processes it even if qBittorrent reports no new fields for it.
+
+        Args:
+            tag: The qBittorrent tag of the torrent.
+        """
+        if tor := cls.by_tag.get(tag):
+            cls.changed.add(tor.hash)
+
+    @classmethod
+    async def get_by_tag(cls, tag, old_info=None):
+        """Returns the torrent with the given tag from a fresh-enough mirror.
+
+        Args:
+            tag: The qBittorrent tag of the torrent.
+            old_info: Value to return if the torrent is unavailable.
+
+        Returns:
+            The torrent info, or ``old_info`` if it can't be found.
+        """
+        try:
+            await cls.refresh(cls.max_age)
+        except Exception as e:
+            LOGGER.error(f"{e}: Qbittorrent, while refreshing torrents snapshot.")
+            return old_info
+        return cls.by_tag.get(tag, old_info)
+
+    @classmethod
+    def get_by_hash(cls, hash_):
+        """Returns the torrent with the given hash from the current mirror."""
+        return cls.by_hash.get(hash_)
+
+    @classmethod
+    def remove(cls, hash_):
+        """Drops a deleted torrent from the mirror.
+
+        Args:
+            hash_: The info hash of the removed torrent.
+        """
+        cls.changed.discard(hash_)
+        if tor := cls.by_hash.pop(hash_, None):
+            for tag in tor.tags:
+                if cls.by_tag.get(tag) is tor:
+                    del cls.by_tag[tag]
+
+
 def aria2_name(download_info):
     """Extracts a display name for an Aria2c download.
 
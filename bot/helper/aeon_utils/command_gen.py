@@ -1,13 +1,10 @@
-import json
-from asyncio import create_subprocess_exec
-from asyncio.subprocess import PIPE
-
 from bot import LOGGER, cpu_no
+from bot.helper.ext_utils.media_utils import probe_media
 
 
 async def get_streams(file):
     """
-    Gets media stream information using ffprobe.
+    Gets media stream information using the shared ffprobe cache.
 
     Args:
         file: Path to the media file.
@@ -16,31 +13,20 @@ async def get_streams(file):
         A list of stream objects (dictionaries) or None if an error occurs
         or no streams are found.
     """
-    cmd = [
-        "ffprobe",
-        "-hide_banner",
-        "-loglevel",
-        "error",
-        "-print_format",
-        "json",
-        "-show_streams",
-        file,
-    ]
-    process = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = await process.communicate()
-
-    if process.returncode != 0:
-        LOGGER.error(f"Error getting stream info: {stderr.decode().strip()}")
+    try:
+        result = await probe_media(file)
+    except Exception as e:
+        LOGGER.error(f"Error getting stream info: {e}")
         return None
 
-    try:
-        return json.loads(stdout)["streams"]
-    except KeyError:
-        LOGGER.error(
-            f"No streams found in the ffprobe output: {stdout.decode().strip()}",
-        )
+    if not result["ok"]:
+        LOGGER.error(f"Error getting stream info: {result['stderr']}")
         return None
 
+    if result["streams"] is None:
+        LOGGER.error(f"No streams found in the ffprobe output for: {file}")
+    return result["streams"]
+
 
 # TODO Lots of work need
 async def get_watermark_cmd(file, key):
@@ -3,6 +3,7 @@ import os
 from asyncio import gather, sleep
 from collections import Counter
 from copy import deepcopy
+from functools import partial
 from os import path as ospath
 from os import walk
 from re import IGNORECASE, findall, sub
@@ -17,7 +18,6 @@ from pyrogram.enums import ChatAction
 from bot import (
     DOWNLOAD_DIR,
     LOGGER,
-    cpu_eater_lock,
     excluded_extensions,
     intervals,
     multi_tags,
@@ -35,14 +35,15 @@ from bot.helper.aeon_utils.command_gen import (
 
 from .ext_utils.bot_utils import get_size_bytes, new_task, sync_to_async
 from .ext_utils.bulk_links import extract_bulk_links
+from .ext_utils.cpu_scheduler import ENCODE_WEIGHT, cpu_scheduler, ffmpeg_weight
 from .ext_utils.files_utils import (
+    FileSplitter,
     SevenZ,
     get_base_name,
     get_path_size,
     is_archive,
     is_archive_split,
     is_first_archive_split,
-    split_file,
 )
 from .ext_utils.links_utils import (
     is_gdrive_id,
@@ -52,6 +53,7 @@ from .ext_utils.links_utils import (
 )
 from .ext_utils.media_utils import (
     FFMpeg,
+    FFMpegPool,
     create_thumb,
     get_document_type,
     is_mkv,
@@ -61,6 +63,7 @@ from .mirror_leech_utils.gdrive_utils.list import GoogleDriveList
 from .mirror_leech_utils.rclone_utils.list import RcloneList
 from .mirror_leech_utils.status_utils.ffmpeg_status import FFmpegStatus
 from .mirror_leech_utils.status_utils.sevenz_status import SevenZStatus
+from .mirror_leech_utils.status_utils.split_status import SplitStatus
 from .telegram_helper.message_utils import (
     get_tg_link_message,
     send_message,
@@ -783,167 +786,174 @@ class TaskConfig:
         """Processes media files using FFmpeg commands defined in the task."""
         checked = False
         inputs = {}
+        pool = FFMpegPool(self, Config.FFMPEG_PARALLEL_FILES)
+
+        async def run_cmd(var_cmd, f_path, delete_files, ffmpeg):
+            LOGGER.info(f"Running FFmpeg command for: {f_path}")
+            res = await ffmpeg.ffmpeg_cmds(var_cmd, f_path)
+            if res and delete_files:
+                await remove(f_path)
+                if len(res) == 1:
+                    file_name = ospath.basename(res[0])
+                    if file_name.startswith("ffmpeg"):
+                        newname = file_name.split(".", 1)[-1]
+                        newres = ospath.join(ospath.dirname(f_path), newname)
+                        await move(res[0], newres)
+            return res
+
         cmds = [
             [part.strip() for part in split(item) if part.strip()]
             for item in self.ffmpeg_cmds
         ]
-        try:
-            ffmpeg = FFMpeg(self)
-            for ffmpeg_cmd in cmds:
-                self.proceed_count = 0
-                cmd = [
-                    "xtra",
-                    "-hide_banner",
-                    "-loglevel",
-                    "error",
-                    "-progress",
-                    "pipe:1",
-                    "-threads",
-                    "4",
-                    *ffmpeg_cmd,
-                ]
-                if "-del" in cmd:
-                    cmd.remove("-del")
-                    delete_files = True
-                else:
-                    delete_files = False
-                input_indexes = [
-                    index for index, value in enumerate(cmd) if value == "-i"
-                ]
+        for ffmpeg_cmd in cmds:
+            self.proceed_count = 0
+            cmd = [
+                "xtra",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-progress",
+                "pipe:1",
+                "-threads",
+                "4",
+                *ffmpeg_cmd,
+            ]
+            if "-del" in cmd:
+                cmd.remove("-del")
+                delete_files = True
+            else:
+                delete_files = False
+            input_indexes = [
+                index for index, value in enumerate(cmd) if value == "-i"
+            ]
+            for index in input_indexes:
+                if cmd[index + 1].startswith("mltb"):
+                    input_file = cmd[index + 1]
+                    break
+            if input_file.lower().endswith(".video"):
+                ext = "video"
+            elif input_file.lower().endswith(".audio"):
+                ext = "audio"
+            elif "." not in input_file:
+                ext = "all"
+            else:
+                ext = ospath.splitext(input_file)[-1].lower()
+            weight = ffmpeg_weight(cmd)
+            if await aiopath.isfile(dl_path):
+                is_video, is_audio, _ = await get_document_type(dl_path)
+                if (not is_video and not is_audio) or (is_video and ext == "audio"):
+                    break
+                if (is_audio and not is_video and ext == "video") or (
+                    ext
+                    not in [
+                        "all",
+                        "audio",
+                        "video",
+                    ]
+                    and not dl_path.strip().lower().endswith(ext)
+                ):
+                    break
+                new_folder = ospath.splitext(dl_path)[0]
+                name = ospath.basename(dl_path)
+                await makedirs(new_folder, exist_ok=True)
+                file_path = f"{new_folder}/{name}"
+                await move(dl_path, file_path)
+                if not checked:
+                    checked = True
+                    async with task_dict_lock:
+                        task_dict[self.mid] = FFmpegStatus(self, pool, gid, "FFmpeg")
                 for index in input_indexes:
                     if cmd[index + 1].startswith("mltb"):
-                        input_file = cmd[index + 1]
-                        break
-                if input_file.lower().endswith(".video"):
-                    ext = "video"
-                elif input_file.lower().endswith(".audio"):
-                    ext = "audio"
-                elif "." not in input_file:
-                    ext = "all"
+                        cmd[index + 1] = file_path
+                    elif is_telegram_link(cmd[index + 1]):
+                        msg = (await get_tg_link_message(cmd[index + 1]))[0]
+                        file_dir = await temp_download(msg)
+                        inputs[index + 1] = file_dir
+                        cmd[index + 1] = file_dir
+                self.files_to_proceed = [file_path]
+                res = (
+                    await pool.run(
+                        [
+                            (
+                                file_path,
+                                weight,
+                                partial(run_cmd, cmd, file_path, False),
+                            )
+                        ],
+                    )
+                )[0]
+                if res:
+                    if delete_files:
+                        await remove(file_path)
+                        if len(await listdir(new_folder)) == 1:
+                            folder = new_folder.rsplit("/", 1)[0]
+                            self.name = ospath.basename(res[0])
+                            if self.name.startswith("ffmpeg"):
+                                self.name = self.name.split(".", 1)[-1]
+                            dl_path = ospath.join(folder, self.name)
+                            await move(res[0], dl_path)
+                            await rmtree(new_folder)
+                        else:
+                            dl_path = new_folder
+                            self.name = new_folder.rsplit("/", 1)[-1]
+                    else:
+                        dl_path = new_folder
+                        self.name = new_folder.rsplit("/", 1)[-1]
                 else:
-                    ext = ospath.splitext(input_file)[-1].lower()
-                if await aiopath.isfile(dl_path):
-                    is_video, is_audio, _ = await get_document_type(dl_path)
-                    if (not is_video and not is_audio) or (
-                        is_video and ext == "audio"
-                    ):
-                        break
-                    if (is_audio and not is_video and ext == "video") or (
-                        ext
-                        not in [
-                            "all",
-                            "audio",
-                            "video",
-                        ]
-                        and not dl_path.strip().lower().endswith(ext)
-                    ):
-                        break
-                    new_folder = ospath.splitext(dl_path)[0]
-                    name = ospath.basename(dl_path)
-                    await makedirs(new_folder, exist_ok=True)
-                    file_path = f"{new_folder}/{name}"
-                    await move(dl_path, file_path)
+                    await move(file_path, dl_path)
+                    await rmtree(new_folder)
+            else:
+                jobs = []
+                for dirpath, _, files in await sync_to_async(
+                    walk,
+                    dl_path,
+                    topdown=False,
+                ):
+                    for file_ in files:
+                        var_cmd = cmd.copy()
+                        if self.is_cancelled:
+                            return False
+                        f_path = ospath.join(dirpath, file_)
+                        is_video, is_audio, _ = await get_document_type(f_path)
+                        if (not is_video and not is_audio) or (
+                            is_video and ext == "audio"
+                        ):
+                            continue
+                        if (is_audio and not is_video and ext == "video") or (
+                            ext
+                            not in [
+                                "all",
+                                "audio",
+                                "video",
+                            ]
+                            and not f_path.strip().lower().endswith(ext)
+                        ):
+                            continue
+                        var_cmd[index + 1] = f_path
+                        jobs.append(
+                            (
+                                f_path,
+                                weight,
+                                partial(run_cmd, var_cmd, f_path, delete_files),
+                            ),
+                        )
+                if jobs:
                     if not checked:
                         checked = True
                         async with task_dict_lock:
                             task_dict[self.mid] = FFmpegStatus(
                                 self,
-                                ffmpeg,
+                                pool,
                                 gid,
                                 "FFmpeg",
                             )
-                        self.progress = False
-                        await cpu_eater_lock.acquire()
-                        self.progress = True
-                    LOGGER.info(f"Running FFmpeg command for: {file_path}")
-                    for index in input_indexes:
-                        if cmd[index + 1].startswith("mltb"):
-                            cmd[index + 1] = file_path
-                        elif is_telegram_link(cmd[index + 1]):
-                            msg = (await get_tg_link_message(cmd[index + 1]))[0]
-                            file_dir = await temp_download(msg)
-                            inputs[index + 1] = file_dir
-                            cmd[index + 1] = file_dir
-                    self.subsize = self.size
-                    res = await ffmpeg.ffmpeg_cmds(cmd, file_path)
-                    if res:
-                        if delete_files:
-                            await remove(file_path)
-                            if len(await listdir(new_folder)) == 1:
-                                folder = new_folder.rsplit("/", 1)[0]
-                                self.name = ospath.basename(res[0])
-                                if self.name.startswith("ffmpeg"):
-                                    self.name = self.name.split(".", 1)[-1]
-                                dl_path = ospath.join(folder, self.name)
-                                await move(res[0], dl_path)
-                                await rmtree(new_folder)
-                            else:
-                                dl_path = new_folder
-                                self.name = new_folder.rsplit("/", 1)[-1]
-                        else:
-                            dl_path = new_folder
-                            self.name = new_folder.rsplit("/", 1)[-1]
-                    else:
-                        await move(file_path, dl_path)
-                        await rmtree(new_folder)
-                else:
-                    for dirpath, _, files in await sync_to_async(
-                        walk,
-                        dl_path,
-                        topdown=False,
-                    ):
-                        for file_ in files:
-                            var_cmd = cmd.copy()
-                            if self.is_cancelled:
-                                return False
-                            f_path = ospath.join(dirpath, file_)
-                            is_video, is_audio, _ = await get_document_type(f_path)
-                            if (not is_video and not is_audio) or (
-                                is_video and ext == "audio"
-                            ):
-                                continue
-                            if (is_audio and not is_video and ext == "video") or (
-                                ext
-                                not in [
-                                    "all",
-                                    "audio",
-                                    "video",
-                                ]
-                                and not f_path.strip().lower().endswith(ext)
-                            ):
-                                continue
-                            self.proceed_count += 1
-                            var_cmd[index + 1] = f_path
-                            if not checked:
-                                checked = True
-                                async with task_dict_lock:
-                                    task_dict[self.mid] = FFmpegStatus(
-                                        self,
-                                        ffmpeg,
-                                        gid,
-                                        "FFmpeg",
-                                    )
-                                self.progress = False
-                                await cpu_eater_lock.acquire()
-                                self.progress = True
-                            LOGGER.info(f"Running FFmpeg command for: {f_path}")
-                            self.subsize = await get_path_size(f_path)
-                            self.subname = file_
-                            res = await ffmpeg.ffmpeg_cmds(var_cmd, f_path)
-                            if res and delete_files:
-                                await remove(f_path)
-                                if len(res) == 1:
-                                    file_name = ospath.basename(res[0])
-                                    if file_name.startswith("ffmpeg"):
-                                        newname = file_name.split(".", 1)[-1]
-                                        newres = ospath.join(dirpath, newname)
-                                        await move(res[0], newres)
-                for inp in inputs.values():
-                    if "/temp/" in inp and aiopath.exists(inp):
-                        await remove(inp)
-        finally:
-            if checked:
-                cpu_eater_lock.release()
+                    self.files_to_proceed = [job[0] for job in jobs]
+                    await pool.run(jobs)
+                    if self.is_cancelled:
+                        return False
+            for inp in inputs.values():
+                if "/temp/" in inp and aiopath.exists(inp):
+                    await remove(inp)
         return dl_path
 
     async def substitute(self, dl_path):
@@ -1152,32 +1162,34 @@ class TaskConfig:
         del all_files
 
         if self.files_to_proceed:
-            ffmpeg = FFMpeg(self)
+            pool = FFMpegPool(self, Config.FFMPEG_PARALLEL_FILES)
             async with task_dict_lock:
-                task_dict[self.mid] = FFmpegStatus(self, ffmpeg, gid, "Convert")
-            self.progress = False
-            async with cpu_eater_lock:
-                self.progress = True
-                for f_path, f_type in self.files_to_proceed.items():
-                    self.proceed_count += 1
-                    LOGGER.info(f"Converting: {f_path}")
-                    if self.is_file:
-                        self.subsize = self.size
-                    else:
-                        self.subsize = await get_path_size(f_path)
-                        self.subname = ospath.basename(f_path)
-                    if f_type == "video":
-                        res = await ffmpeg.convert_video(f_path, vext)
-                    else:
-                        res = await ffmpeg.convert_audio(f_path, aext)
-                    if res:
-                        try:
-                            await remove(f_path)
-                        except Exception:
-                            self.is_cancelled = True
-                            return False
-                        if self.is_file:
-                            return res
+                task_dict[self.mid] = FFmpegStatus(self, pool, gid, "Convert")
+
+            async def convert(f_path, f_type, ffmpeg):
+                LOGGER.info(f"Converting: {f_path}")
+                if f_type == "video":
+                    res = await ffmpeg.convert_video(f_path, vext)
+                else:
+                    res = await ffmpeg.convert_audio(f_path, aext)
+                if res:
+                    try:
+                        await remove(f_path)
+                    except Exception:
+                        self.is_cancelled = True
+                        return False
+                return res
+
+            results = await pool.run(
+                [
+                    (f_path, ENCODE_WEIGHT, partial(convert, f_path, f_type))
+                    for f_path, f_type in self.files_to_proceed.items()
+                ],
+            )
+            if self.is_cancelled:
+                return False
+            if self.is_file and results[0]:
+                return results[0]
         return dl_path
 
     async def generate_sample_video(self, dl_path, gid):
@@ -1213,7 +1225,7 @@ class TaskConfig:
             async with task_dict_lock:
                 task_dict[self.mid] = FFmpegStatus(self, ffmpeg, gid, "Sample Video")
             self.progress = False
-            async with cpu_eater_lock:
+            async with cpu_scheduler.slot(self, ENCODE_WEIGHT):
                 self.progress = True
                 LOGGER.info(f"Creating sample video for: {self.name}")
                 for f_path, file_ in self.files_to_proceed.items():
@@ -1277,8 +1289,7 @@ class TaskConfig:
                         self.files_to_proceed[f_path] = [f_size, file_]
         if self.files_to_proceed:
             ffmpeg = FFMpeg(self)
-            async with task_dict_lock:
-                task_dict[self.mid] = FFmpegStatus(self, ffmpeg, gid, "Split")
+            splitter = FileSplitter(self)
             LOGGER.info(f"Splitting: {self.name}")
             for f_path, (f_size, file_) in self.files_to_proceed.items():
                 self.proceed_count += 1
@@ -1290,11 +1301,17 @@ class TaskConfig:
                 parts = -(-f_size // self.split_size)
                 split_size = self.split_size
                 if not self.as_doc and (await get_document_type(f_path))[0]:
-                    self.progress = True
+                    async with task_dict_lock:
+                        task_dict[self.mid] = FFmpegStatus(
+                            self, ffmpeg, gid, "Split"
+                        )
                     res = await ffmpeg.split(f_path, file_, parts, split_size)
                 else:
-                    self.progress = False
-                    res = await split_file(f_path, split_size, self)
+                    async with task_dict_lock:
+                        task_dict[self.mid] = SplitStatus(
+                            self, splitter, gid, "Split"
+                        )
+                    res = await splitter.split(f_path, split_size)
                 if self.is_cancelled:
                     return False
                 if res or f_size >= self.max_split_size:
@@ -1305,150 +1322,82 @@ class TaskConfig:
             return None
         return None
 
-    async def proceed_metadata(self, dl_path, gid):
-        """Adds metadata to MKV files based on the task's metadata key."""
-        key = self.metadata
-        ffmpeg = FFMpeg(self)
-        checked = False
-        if self.is_file:
-            if is_mkv(dl_path):
-                cmd, temp_file = await get_metadata_cmd(dl_path, key)
+    async def _run_mkv_jobs(self, dl_path, gid, key, get_cmd, cstatus):
+        """Runs a metadata/watermark command on every MKV file of the task
+        through an FFMpegPool and replaces each source with its output.
+        """
+
+        async def run_cmd(cmd, file_path, temp_file, ffmpeg):
+            LOGGER.info(f"Running {cstatus.lower()} command for: {file_path}")
+            if await ffmpeg.metadata_watermark_cmds(cmd, file_path):
+                os.replace(temp_file, file_path)
+            elif await aiopath.exists(temp_file):
+                os.remove(temp_file)
+
+        jobs = []
+        for file_path in await self._list_files(dl_path):
+            if self.is_cancelled:
+                return ""
+            if is_mkv(file_path):
+                cmd, temp_file = await get_cmd(file_path, key)
                 if cmd:
-                    if not checked:
-                        checked = True
-                        async with task_dict_lock:
-                            task_dict[self.mid] = FFmpegStatus(
-                                self,
-                                ffmpeg,
-                                gid,
-                                "Metadata",
-                            )
-                        self.progress = False
-                        await cpu_eater_lock.acquire()
-                        self.progress = True
-                    self.subsize = self.size
-                    res = await ffmpeg.metadata_watermark_cmds(cmd, dl_path)
-                    if res:
-                        os.replace(temp_file, dl_path)
-                    elif await aiopath.exists(temp_file):
-                        os.remove(temp_file)
-        else:
-            for dirpath, _, files in await sync_to_async(
-                walk,
-                dl_path,
-                topdown=False,
-            ):
-                for file_ in files:
-                    file_path = ospath.join(dirpath, file_)
-                    if self.is_cancelled:
-                        cpu_eater_lock.release()
-                        return ""
-                    self.proceed_count += 1
-                    if is_mkv(file_path):
-                        cmd, temp_file = await get_metadata_cmd(file_path, key)
-                        if cmd:
-                            if not checked:
-                                checked = True
-                                async with task_dict_lock:
-                                    task_dict[self.mid] = FFmpegStatus(
-                                        self,
-                                        ffmpeg,
-                                        gid,
-                                        "Metadata",
-                                    )
-                                self.progress = False
-                                await cpu_eater_lock.acquire()
-                                self.progress = True
-                            LOGGER.info(f"Running metadata command for: {file_path}")
-                            self.subsize = await aiopath.getsize(file_path)
-                            self.subname = file_
-                            res = await ffmpeg.metadata_watermark_cmds(
-                                cmd,
-                                file_path,
-                            )
-                            if res:
-                                os.replace(temp_file, file_path)
-                            elif await aiopath.exists(temp_file):
-                                os.remove(temp_file)
-        if checked:
-            cpu_eater_lock.release()
+                    jobs.append(
+                        (
+                            file_path,
+                            ffmpeg_weight(cmd),
+                            partial(run_cmd, cmd, file_path, temp_file),
+                        ),
+                    )
+        if jobs:
+            self.files_to_proceed = [job[0] for job in jobs]
+            pool = FFMpegPool(self, Config.FFMPEG_PARALLEL_FILES)
+            async with task_dict_lock:
+                task_dict[self.mid] = FFmpegStatus(self, pool, gid, cstatus)
+            await pool.run(jobs)
+            if self.is_cancelled:
+                return ""
         return dl_path
 
-    async def proceed_watermark(self, dl_path, gid):
-        """Adds a text watermark to MKV video files."""
-        key = self.watermark
-        ffmpeg = FFMpeg(self)
-        checked = False
+    async def _list_files(self, dl_path):
+        """Returns the files of the task, or the task path if it's a file."""
         if self.is_file:
-            if is_mkv(dl_path):
-                cmd, temp_file = await get_watermark_cmd(dl_path, key)
-                if cmd:
-                    if not checked:
-                        checked = True
-                        async with task_dict_lock:
-                            task_dict[self.mid] = FFmpegStatus(
-                                self,
-                                ffmpeg,
-                                gid,
-                                "Watermark",
-                            )
-                        self.progress = False
-                        await cpu_eater_lock.acquire()
-                        self.progress = True
-                    self.subsize = self.size
-                    res = await ffmpeg.metadata_watermark_cmds(cmd, dl_path)
-                    if res:
-                        os.replace(temp_file, dl_path)
-                    elif await aiopath.exists(temp_file):
-                        os.remove(temp_file)
-        else:
+            return [dl_path]
+        return [
+            ospath.join(dirpath, file_)
             for dirpath, _, files in await sync_to_async(
                 walk,
                 dl_path,
                 topdown=False,
-            ):
-                for file_ in files:
-                    file_path = ospath.join(dirpath, file_)
-                    if self.is_cancelled:
-                        cpu_eater_lock.release()
-                        return ""
-                    if is_mkv(file_path):
-                        cmd, temp_file = await get_watermark_cmd(file_path, key)
-                        if cmd:
-                            if not checked:
-                                checked = True
-                                async with task_dict_lock:
-                                    task_dict[self.mid] = FFmpegStatus(
-                                        self,
-                                        ffmpeg,
-                                        gid,
-                                        "Watermark",
-                                    )
-                                self.progress = False
-                                await cpu_eater_lock.acquire()
-                                self.progress = True
-                            LOGGER.info(
-                                f"Running watermark command for: {file_path}"
-                            )
-                            self.subsize = await aiopath.getsize(file_path)
-                            self.subname = file_
-                            res = await ffmpeg.metadata_watermark_cmds(
-                                cmd,
-                                file_path,
-                            )
-                            if res:
-                                os.replace(temp_file, file_path)
-                            elif await aiopath.exists(temp_file):
-                                os.remove(temp_file)
-        if checked:
-            cpu_eater_lock.release()
-        return dl_path
+            )
+            for file_ in files
+        ]
+
+    async def proceed_metadata(self, dl_path, gid):
+        """Adds metadata to MKV files based on the task's metadata key."""
+        return await self._run_mkv_jobs(
+            dl_path,
+            gid,
+            self.metadata,
+            get_metadata_cmd,
+            "Metadata",
+        )
+
+    async def proceed_watermark(self, dl_path, gid):
+        """Adds a text watermark to MKV video files."""
+        return await self._run_mkv_jobs(
+            dl_path,
+            gid,
+            self.watermark,
+            get_watermark_cmd,
+            "Watermark",
+        )
 
     async def proceed_embed_thumb(self, dl_path, gid):
         """Embeds a thumbnail into MKV video files."""
         thumb = self.e_thumb
         ffmpeg = FFMpeg(self)
         checked = False
+        cpu_token = None
         if self.is_file:
             if is_mkv(dl_path):
                 cmd, temp_file = await get_embed_thumb_cmd(dl_path, thumb)
@@ -1463,7 +1412,9 @@ class TaskConfig:
                                 "E_thumb",
                             )
                         self.progress = False
-                        await cpu_eater_lock.acquire()
+                        cpu_token = await cpu_scheduler.acquire(
+                            self, ffmpeg_weight(cmd)
+                        )
                         self.progress = True
                     self.subsize = self.size
                     res = await ffmpeg.metadata_watermark_cmds(cmd, dl_path)
@@ -1480,7 +1431,8 @@ class TaskConfig:
                 for file_ in files:
                     file_path = ospath.join(dirpath, file_)
                     if self.is_cancelled:
-                        cpu_eater_lock.release()
+                        if cpu_token is not None:
+                            cpu_scheduler.release(cpu_token)
                         return ""
                     if is_mkv(file_path):
                         cmd, temp_file = await get_embed_thumb_cmd(file_path, thumb)
@@ -1495,7 +1447,9 @@ class TaskConfig:
                                         "E_thumb",
                                     )
                                 self.progress = False
-                                await cpu_eater_lock.acquire()
+                                cpu_token = await cpu_scheduler.acquire(
+                                    self, ffmpeg_weight(cmd)
+                                )
                                 self.progress = True
                             LOGGER.info(f"Running cmd for: {file_path}")
                             self.subsize = await aiopath.getsize(file_path)
@@ -1508,6 +1462,6 @@ class TaskConfig:
                                 os.replace(temp_file, file_path)
                             elif await aiopath.exists(temp_file):
                                 os.remove(temp_file)
-        if checked:
-            cpu_eater_lock.release()
+        if cpu_token is not None:
+            cpu_scheduler.release(cpu_token)
         return dl_path
@@ -0,0 +1,132 @@
+from asyncio import CancelledError, get_running_loop
+from contextlib import asynccontextmanager
+from itertools import count
+
+from bot import cpu_no
+
+COPY_WEIGHT = 1
+ENCODE_WEIGHT = max(1, cpu_no // 2)
+VIDEO_CODEC_ARGS = {"-c", "-codec", "-c:v", "-codec:v", "-vcodec"}
+
+
+def ffmpeg_weight(cmd):
+    """Returns the slot weight of an ffmpeg command.
+
+    Commands that copy the video stream cost ``COPY_WEIGHT``; anything else
+    is treated as a video re-encode, which runs with ``cpu_no // 2`` threads
+    and costs ``ENCODE_WEIGHT``.
+    """
+    for index, arg in enumerate(cmd[:-1]):
+        if arg in VIDEO_CODEC_ARGS and cmd[index + 1] == "copy":
+            return COPY_WEIGHT
+    return ENCODE_WEIGHT
+
+
+class CpuScheduler:
+    """Weighted CPU slots shared by all ffmpeg stages of all tasks.
+
+    The scheduler holds ``capacity`` slots and every job asks for a weight
+    that reflects how much of the CPU it uses. Waiting jobs are served in
+    order of the slots their user already holds, then in arrival order, so
+    one user's bulk can't keep others waiting behind it. A job that doesn't
+    fit blocks the jobs after it, so heavy jobs aren't starved by a stream
+    of light ones.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(capacity, 1)
+        self._used = 0
+        self._running = {}
+        self._user_load = {}
+        self._waiters = []
+        self._seq = count()
+
+    @property
+    def used(self):
+        return self._used
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def _grant(self, token, user_id, weight):
+        self._running[token] = (user_id, weight)
+        self._used += weight
+        self._user_load[user_id] = self._user_load.get(user_id, 0) + weight
+
+    def _order(self):
+        return sorted(
+            self._waiters,
+            key=lambda w: (self._user_load.get(w[1], 0), w[0]),
+        )
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._order()[0]
+            token, user_id, weight, _, future = waiter
+            if self._used + weight > self.capacity:
+                break
+            self._waiters.remove(waiter)
+            self._grant(token, user_id, weight)
+            future.set_result(None)
+
+    async def acquire(self, listener, weight=COPY_WEIGHT):
+        """Waits until ``weight`` slots are free for the listener's task.
+
+        Args:
+            listener: The task listener running the job.
+            weight: Number of slots the job uses, capped at the capacity.
+
+        Returns:
+            A token to pass to :meth:`release`.
+        """
+        weight = min(max(weight, 1), self.capacity)
+        token = next(self._seq)
+        if not self._waiters and self._used + weight <= self.capacity:
+            self._grant(token, listener.user_id, weight)
+            return token
+        future = get_running_loop().create_future()
+        waiter = (token, listener.user_id, weight, listener.mid, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._wake()
+            else:
+                self.release(token)
+            raise
+        return token
+
+    def release(self, token):
+        """Frees the slots of a job and starts the next waiting jobs."""
+        if (entry := self._running.pop(token, None)) is None:
+            return
+        user_id, weight = entry
+        self._used -= weight
+        self._user_load[user_id] -= weight
+        if not self._user_load[user_id]:
+            del self._user_load[user_id]
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, listener, weight=COPY_WEIGHT):
+        """Holds ``weight`` slots for the duration of the block."""
+        token = await self.acquire(listener, weight)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def position(self, mid):
+        """Returns the 1-based queue position of a task's first waiting job,
+        or 0 if the task isn't waiting.
+        """
+        for index, waiter in enumerate(self._order(), start=1):
+            if waiter[3] == mid:
+                return index
+        return 0
+
+
+cpu_scheduler = CpuScheduler(cpu_no)
@@ -12,3 +12,7 @@ class RssShutdownException(Exception):
 
 class TgLinkException(Exception):
     """Access denied for this chat."""
+
+
+class RcloneRcException(Exception):
+    """The rclone rcd daemon is unavailable or returned an error."""
@@ -1,3 +1,5 @@
+import contextlib
+import os
 from asyncio import create_subprocess_exec, sleep, wait_for
 from asyncio.subprocess import PIPE
 from os import path as ospath
@@ -5,6 +7,7 @@ from os import readlink, walk
 from re import IGNORECASE, escape
 from re import search as re_search
 from re import split as re_split
+from time import time
 
 from aiofiles.os import (
     listdir,
@@ -27,7 +30,7 @@ from magic import Magic
 from bot import DOWNLOAD_DIR, LOGGER
 from bot.core.torrent_manager import TorrentManager
 
-from .bot_utils import cmd_exec, sync_to_async
+from .bot_utils import sync_to_async
 from .exceptions import NotSupportedExtractionArchive
 
 ARCH_EXT = [
@@ -242,26 +245,42 @@ async def remove_excluded_files(fpath, ee):
                 await remove(ospath.join(root, f))
 
 
-async def join_files(opath):
+ARCHIVE_HEADERS = (b"7z\xbc\xaf\x27\x1c", b"PK\x03\x04")
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def _is_archive_volume(path):
+    with open(path, "rb") as f:
+        return f.read(6).startswith(ARCHIVE_HEADERS)
+
+
+async def join_files(opath, splitter):
     files = await listdir(opath)
     results = []
     exists = False
     for file_ in files:
-        if re_search(r"\.0+2$", file_) and await sync_to_async(
-            get_mime_type,
+        if re_search(r"\.0+2$", file_) and not await sync_to_async(
+            _is_archive_volume,
             f"{opath}/{file_}",
-        ) not in ["application/x-7z-compressed", "application/zip"]:
+        ):
             exists = True
             final_name = file_.rsplit(".", 1)[0]
             fpath = f"{opath}/{final_name}"
-            cmd = f'cat "{fpath}."* > "{fpath}"'
-            _, stderr, code = await cmd_exec(cmd, True)
-            if code != 0:
-                LOGGER.error(f"Failed to join {final_name}, stderr: {stderr}")
+            parts = sorted(
+                (
+                    f"{opath}/{part}"
+                    for part in files
+                    if re_search(rf"^{escape(final_name)}\.\d{{3,}}$", part)
+                ),
+                key=lambda part: int(part.rsplit(".", 1)[1]),
+            )
+            if await splitter.join(fpath, parts):
+                results.append(final_name)
+            else:
                 if await aiopath.isfile(fpath):
                     await remove(fpath)
-            else:
-                results.append(final_name)
+                if splitter.is_cancelled:
+                    return
 
     if not exists:
         LOGGER.warning("No files to join!")
@@ -269,37 +288,167 @@ async def join_files(opath):
         LOGGER.info("Join Completed!")
         for res in results:
             for file_ in files:
-                if re_search(rf"{escape(res)}\.0[0-9]+$", file_):
+                if re_search(rf"^{escape(res)}\.\d{{3,}}$", file_):
                     await remove(f"{opath}/{file_}")
 
 
-async def split_file(f_path, split_size, listener):
-    out_path = f"{f_path}."
-    if listener.is_cancelled:
-        return False
-    listener.subproc = await create_subprocess_exec(
-        "split",
-        "--numeric-suffixes=1",
-        "--suffix-length=3",
-        f"--bytes={split_size}",
-        f_path,
-        out_path,
-        stderr=PIPE,
-    )
-    _, stderr = await listener.subproc.communicate()
-    code = listener.subproc.returncode
-    if listener.is_cancelled:
-        return False
-    if code == -9:
-        listener.is_cancelled = True
+class FileSplitter:
+    """Splits and joins files by byte ranges inside the bot's thread pool.
+
+    Data is moved with ``copy_file_range``, falling back to ``sendfile`` and
+    then to plain reads and writes where the kernel or filesystem doesn't
+    support it, so parts never pass through Python buffers when they don't
+    have to. Copies run in chunks of ``COPY_CHUNK`` bytes, which keeps the
+    progress current and lets a cancelled task stop between chunks.
+    """
+
+    def __init__(self, listener):
+        self._listener = listener
+        self._processed_bytes = 0
+        self._total_size = 0
+        self._start_time = 0
+        self._use_copy_range = hasattr(os, "copy_file_range")
+        self._use_sendfile = hasattr(os, "sendfile")
+
+    @property
+    def processed_bytes(self):
+        return self._processed_bytes
+
+    @property
+    def speed_raw(self):
+        try:
+            return self._processed_bytes / (time() - self._start_time)
+        except ZeroDivisionError:
+            return 0
+
+    @property
+    def progress_raw(self):
+        try:
+            return self._processed_bytes / self._total_size * 100
+        except ZeroDivisionError:
+            return 0
+
+    @property
+    def eta_raw(self):
+        try:
+            return (self._total_size - self._processed_bytes) / self.speed_raw
+        except ZeroDivisionError:
+            return 0
+
+    @property
+    def is_cancelled(self):
+        return self._listener.is_cancelled
+
+    def _clear(self, total_size):
+        self._processed_bytes = 0
+        self._total_size = total_size
+        self._start_time = time()
+
+    def _copy(self, src, dst, count):
+        """Copies ``count`` bytes from the offset of ``src`` to the offset of
+        ``dst``, advancing both. Returns False if the task was cancelled.
+
+        Raises:
+            OSError: If ``src`` ends before ``count`` bytes were copied.
+        """
+        while count > 0:
+            if self._listener.is_cancelled:
+                return False
+            size = min(count, COPY_CHUNK)
+            if self._use_copy_range:
+                try:
+                    done = os.copy_file_range(src, dst, size)
+                except OSError:
+                    self._use_copy_range = False
+                    continue
+            elif self._use_sendfile:
+                try:
+                    done = os.sendfile(dst, src, None, size)
+                except OSError:
+                    self._use_sendfile = False
+                    continue
+            else:
+                data = os.read(src, size)
+                done = len(data)
+                written = 0
+                while written < done:
+                    written += os.write(dst, data[written:])
+            if not done:
+                raise OSError(f"Unexpected end of file, {count} bytes missing")
+            count -= done
+            self._processed_bytes += done
+        return True
+
+    def _split(self, f_path, split_size):
+        size = ospath.getsize(f_path)
+        self._clear(size)
+        src = os.open(f_path, os.O_RDONLY)
+        try:
+            for part, offset in enumerate(range(0, size, split_size), start=1):
+                dst = os.open(
+                    f"{f_path}.{part:03}",
+                    os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                    0o644,
+                )
+                try:
+                    if not self._copy(src, dst, min(split_size, size - offset)):
+                        return False
+                finally:
+                    os.close(dst)
+        finally:
+            os.close(src)
+        return True
+
+    def _join(self, fpath, parts):
+        self._clear(sum(ospath.getsize(part) for part in parts))
+        dst = os.open(fpath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            for part in parts:
+                src = os.open(part, os.O_RDONLY)
+                try:
+                    if not self._copy(src, dst, ospath.getsize(part)):
+                        return False
+                finally:
+                    os.close(src)
+        finally:
+            os.close(dst)
+        return True
+
+    async def split(self, f_path, split_size):
+        """Splits a file into ``f_path.001``, ``f_path.002``, ... parts of
+        ``split_size`` bytes.
+
+        Returns:
+            True if all parts were written, False if the task was cancelled
+            or the split failed, in which case the written parts are removed.
+        """
+        if self._listener.is_cancelled:
+            return False
+        try:
+            if await sync_to_async(self._split, f_path, split_size):
+                return True
+        except OSError as e:
+            LOGGER.error(f"{e}. Split Document: {f_path}")
+        for part in range(1, -(-self._total_size // split_size) + 1):
+            with contextlib.suppress(OSError):
+                await remove(f"{f_path}.{part:03}")
         return False
-    if code != 0:
+
+    async def join(self, fpath, parts):
+        """Joins ``parts`` in order into ``fpath``.
+
+        Returns:
+            True if the file was written, False if the task was cancelled or
+            the join failed.
+        """
+        if self._listener.is_cancelled:
+            return False
+        LOGGER.info(f"Joining: {fpath}")
         try:
-            stderr = stderr.decode().strip()
-        except Exception:
-            stderr = "Unable to decode the error!"
-        LOGGER.error(f"{stderr}. Split Document: {f_path}")
-    return True
+            return await sync_to_async(self._join, fpath, parts)
+        except OSError as e:
+            LOGGER.error(f"Failed to join {ospath.basename(fpath)}, error: {e}")
+            return False
 
 
 class SevenZ:
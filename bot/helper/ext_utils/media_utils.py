@@ -1,19 +1,29 @@
 import contextlib
-from asyncio import create_subprocess_exec, gather, sleep, wait_for
-from asyncio.subprocess import PIPE
+from asyncio import (
+    Semaphore,
+    create_subprocess_exec,
+    create_task,
+    gather,
+    sleep,
+    wait_for,
+)
+from asyncio.subprocess import DEVNULL, PIPE
+from json import JSONDecodeError, loads
 from os import path as ospath
 from re import escape
 from re import search as re_search
 from time import time
 
-from aiofiles.os import makedirs, remove
+from aiofiles.os import makedirs, remove, stat
 from aiofiles.os import path as aiopath
 from aioshutil import rmtree
+from cachetools import LRUCache
 from PIL import Image
 
 from bot import DOWNLOAD_DIR, LOGGER, cpu_no
 
 from .bot_utils import cmd_exec, sync_to_async
+from .cpu_scheduler import cpu_scheduler
 from .files_utils import get_mime_type, is_archive, is_archive_split
 from .status_utils import time_to_seconds
 
@@ -32,9 +42,43 @@ async def create_thumb(msg, _id=""):
     return output
 
 
-async def get_media_info(path):
-    try:
-        result = await cmd_exec(
+_probe_cache = LRUCache(maxsize=4096)
+
+
+async def _cache_entry(path):
+    """Returns the cached probe data of a file, reset when the file changed.
+
+    Entries are checked against the size, mtime and inode of the file, so a
+    stage that rewrites or replaces the file gets fresh results.
+    """
+    st = await stat(path)
+    signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+    cached = _probe_cache.get(path)
+    if cached is None or cached[0] != signature:
+        cached = (signature, {})
+        _probe_cache[path] = cached
+    return cached[1]
+
+
+async def probe_media(path):
+    """Runs one ``ffprobe`` for the format and streams of a file.
+
+    Results are cached per file, so every stage of a task that needs the
+    type, duration or streams of the same file shares one subprocess.
+
+    Args:
+        path: Path of the media file.
+
+    Returns:
+        A dict with the ``format`` and ``streams`` parsed from ffprobe (None
+        if it failed) and its ``stderr``.
+
+    Raises:
+        Exception: The file doesn't exist or ffprobe couldn't be started.
+    """
+    entry = await _cache_entry(path)
+    if "probe" not in entry:
+        stdout, stderr, code = await cmd_exec(
             [
                 "ffprobe",
                 "-hide_banner",
@@ -43,14 +87,38 @@ async def get_media_info(path):
                 "-print_format",
                 "json",
                 "-show_format",
+                "-show_streams",
                 path,
             ],
         )
+        data = {}
+        if stdout and code == 0:
+            with contextlib.suppress(JSONDecodeError):
+                data = loads(stdout)
+        entry["probe"] = {
+            "format": data.get("format"),
+            "streams": data.get("streams"),
+            "stderr": stderr,
+            "ok": bool(stdout) and code == 0,
+        }
+    return entry["probe"]
+
+
+async def _get_mime_type(path):
+    entry = await _cache_entry(path)
+    if "mime" not in entry:
+        entry["mime"] = await sync_to_async(get_mime_type, path)
+    return entry["mime"]
+
+
+async def get_media_info(path):
+    try:
+        result = await probe_media(path)
     except Exception as e:
         LOGGER.error(f"Get Media Info: {e}. Mostly File not found! - File: {path}")
         return 0, None, None
-    if result[0] and result[2] == 0:
-        fields = eval(result[0]).get("format")
+    if result["ok"]:
+        fields = result["format"]
         if fields is None:
             LOGGER.error(f"get_media_info: {result}")
             return 0, None, None
@@ -70,23 +138,15 @@ async def get_document_type(path):
         or re_search(r".+(\.|_)(rar|7z|zip|bin)(\.0*\d+)?$", path)
     ):
         return is_video, is_audio, is_image
-    mime_type = await sync_to_async(get_mime_type, path)
+    try:
+        mime_type = await _get_mime_type(path)
+    except Exception:
+        mime_type = await sync_to_async(get_mime_type, path)
     if mime_type.startswith("image"):
         return False, False, True
     try:
-        result = await cmd_exec(
-            [
-                "ffprobe",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-print_format",
-                "json",
-                "-show_streams",
-                path,
-            ],
-        )
-        if result[1] and mime_type.startswith("video"):
+        result = await probe_media(path)
+        if result["stderr"] and mime_type.startswith("video"):
             is_video = True
     except Exception as e:
         LOGGER.error(
@@ -101,8 +161,8 @@ async def get_document_type(path):
         if mime_type.startswith("video"):
             is_video = True
         return is_video, is_audio, is_image
-    if result[0] and result[2] == 0:
-        fields = eval(result[0]).get("streams")
+    if result["ok"]:
+        fields = result["streams"]
         if fields is None:
             LOGGER.error(f"get_document_type: {result}")
             return is_video, is_audio, is_image
@@ -309,6 +369,7 @@ class FFMpeg:
         self._eta_raw = 0
         self._time_rate = 0.1
         self._start_time = 0
+        self._proc = None
 
     @property
     def processed_bytes(self):
@@ -337,14 +398,19 @@ class FFMpeg:
         self._last_processed_time = 0
         self._last_processed_bytes = 0
 
+    def kill(self):
+        if self._proc is not None and self._proc.returncode is None:
+            with contextlib.suppress(Exception):
+                self._proc.kill()
+
     async def _ffmpeg_progress(self):
         while not (
-            self._listener.subproc.returncode is not None
+            self._proc.returncode is not None
             or self._listener.is_cancelled
-            or self._listener.subproc.stdout.at_eof()
+            or self._proc.stdout.at_eof()
         ):
             try:
-                line = await wait_for(self._listener.subproc.stdout.readline(), 60)
+                line = await wait_for(self._proc.stdout.readline(), 60)
             except Exception:
                 break
             line = line.decode().strip()
@@ -408,14 +474,14 @@ class FFMpeg:
             ffmpeg[index] = output
         if self._listener.is_cancelled:
             return False
-        self._listener.subproc = await create_subprocess_exec(
+        self._proc = self._listener.subproc = await create_subprocess_exec(
             *ffmpeg,
             stdout=PIPE,
             stderr=PIPE,
         )
         await self._ffmpeg_progress()
-        _, stderr = await self._listener.subproc.communicate()
-        code = self._listener.subproc.returncode
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
         if self._listener.is_cancelled:
             return False
         if code == 0:
@@ -440,14 +506,14 @@ class FFMpeg:
         self._total_time = (await get_media_info(f_path))[0]
         if self._listener.is_cancelled:
             return False
-        self._listener.subproc = await create_subprocess_exec(
+        self._proc = self._listener.subproc = await create_subprocess_exec(
             *ffmpeg,
             stdout=PIPE,
             stderr=PIPE,
         )
         await self._ffmpeg_progress()
-        _, stderr = await self._listener.subproc.communicate()
-        code = self._listener.subproc.returncode
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
         if self._listener.is_cancelled:
             return False
         if code == 0:
@@ -515,14 +581,14 @@ class FFMpeg:
             ]
         if self._listener.is_cancelled:
             return False
-        self._listener.subproc = await create_subprocess_exec(
+        self._proc = self._listener.subproc = await create_subprocess_exec(
             *cmd,
             stdout=PIPE,
             stderr=PIPE,
         )
         await self._ffmpeg_progress()
-        _, stderr = await self._listener.subproc.communicate()
-        code = self._listener.subproc.returncode
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
         if self._listener.is_cancelled:
             return False
         if code == 0:
@@ -563,14 +629,14 @@ class FFMpeg:
         ]
         if self._listener.is_cancelled:
             return False
-        self._listener.subproc = await create_subprocess_exec(
+        self._proc = self._listener.subproc = await create_subprocess_exec(
             *cmd,
             stdout=PIPE,
             stderr=PIPE,
         )
         await self._ffmpeg_progress()
-        _, stderr = await self._listener.subproc.communicate()
-        code = self._listener.subproc.returncode
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
         if self._listener.is_cancelled:
             return False
         if code == 0:
@@ -645,14 +711,14 @@ class FFMpeg:
 
         if self._listener.is_cancelled:
             return False
-        self._listener.subproc = await create_subprocess_exec(
+        self._proc = self._listener.subproc = await create_subprocess_exec(
             *cmd,
             stdout=PIPE,
             stderr=PIPE,
         )
         await self._ffmpeg_progress()
-        _, stderr = await self._listener.subproc.communicate()
-        code = self._listener.subproc.returncode
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
         if self._listener.is_cancelled:
             return False
         if code == -9:
@@ -671,7 +737,190 @@ class FFMpeg:
             await remove(output_file)
         return False
 
+    async def _keyframe_cuts(self, f_path, video_index, budget):
+        """Finds where to cut a file in one ffprobe pass over its packets.
+
+        Packet sizes of all streams are summed in file order and a cut is
+        placed at the last video keyframe before a part would hold more than
+        ``budget`` bytes.
+
+        Returns:
+            The keyframe times to cut at, or None if a single GOP is larger
+            than the budget or ffprobe failed.
+        """
+        self._proc = self._listener.subproc = await create_subprocess_exec(
+            "ffprobe",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-show_entries",
+            "packet=stream_index,pts_time,size,flags",
+            "-of",
+            "compact=p=0",
+            f_path,
+            stdout=PIPE,
+            stderr=DEVNULL,
+        )
+        cuts = []
+        total = part_start = 0
+        last_key = None
+        buffer = b""
+        while chunk := await self._proc.stdout.read(1 << 16):
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                fields = dict(
+                    item.split("=", 1)
+                    for item in line.decode(errors="ignore").split("|")
+                    if "=" in item
+                )
+                try:
+                    size = int(fields["size"])
+                except (KeyError, ValueError):
+                    continue
+                if (
+                    fields.get("stream_index") == video_index
+                    and "K" in fields.get("flags", "")
+                    and fields.get("pts_time", "N/A") != "N/A"
+                ):
+                    if total - part_start > budget:
+                        if last_key is None or last_key[1] <= part_start:
+                            self.kill()
+                            await self._proc.wait()
+                            return None
+                        cuts.append(last_key[0])
+                        part_start = last_key[1]
+                    last_key = (fields["pts_time"], total)
+                total += size
+        if await self._proc.wait() != 0 or self._listener.is_cancelled:
+            return None
+        if total - part_start > budget:
+            if last_key is None or last_key[1] <= part_start:
+                return None
+            cuts.append(last_key[0])
+            if total - last_key[1] > budget:
+                return None
+        return cuts
+
+    async def _segment_split(self, f_path, file_, split_size):
+        """Writes all parts of a video in one pass with the segment muxer.
+
+        Returns:
+            True on success, False if the task was cancelled and None if
+            this mode doesn't fit the file, in which case nothing is left
+            behind.
+        """
+        probe = await probe_media(f_path)
+        streams = probe["streams"] or []
+        video = next(
+            (
+                stream
+                for stream in streams
+                if stream.get("codec_type") == "video"
+                and not stream.get("disposition", {}).get("attached_pic")
+            ),
+            None,
+        )
+        if video is None:
+            return None
+        budget = (split_size - 3000000) * 99 // 100
+        cuts = await self._keyframe_cuts(f_path, str(video["index"]), budget)
+        if self._listener.is_cancelled:
+            return False
+        if not cuts:
+            return None
+        # Packet times keep the input's start time, which ffmpeg subtracts
+        # from the timestamps the segment muxer compares with its cut times.
+        try:
+            start = float((probe["format"] or {}).get("start_time", 0))
+        except ValueError:
+            start = 0
+        cuts = [f"{float(cut) - start:.6f}" for cut in cuts]
+        dir_path = ospath.dirname(f_path)
+        base_name, extension = ospath.splitext(file_)
+        pattern = (
+            ospath.join(dir_path, f"{base_name}.part").replace("%", "%%")
+            + "%03d"
+            + extension.replace("%", "%%")
+        )
+        outputs = [
+            ospath.join(dir_path, f"{base_name}.part{i:03}{extension}")
+            for i in range(1, len(cuts) + 2)
+        ]
+        cmd = [
+            "xtra",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-progress",
+            "pipe:1",
+            "-i",
+            f_path,
+            "-map",
+            "0",
+            "-map_chapters",
+            "-1",
+            "-strict",
+            "-2",
+            "-c",
+            "copy",
+            "-f",
+            "segment",
+            "-segment_times",
+            ",".join(cuts),
+            "-segment_start_number",
+            "1",
+            "-reset_timestamps",
+            "1",
+            "-threads",
+            f"{max(1, cpu_no // 2)}",
+            pattern,
+        ]
+        if self._listener.is_cancelled:
+            return False
+        self._proc = self._listener.subproc = await create_subprocess_exec(
+            *cmd,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        await self._ffmpeg_progress()
+        _, stderr = await self._proc.communicate()
+        code = self._proc.returncode
+        if self._listener.is_cancelled:
+            return False
+        if code == -9:
+            self._listener.is_cancelled = True
+            return False
+        if code == 0:
+            for output in outputs:
+                if not await aiopath.exists(output):
+                    stderr = f"Missing part {output}".encode()
+                    break
+                if await aiopath.getsize(output) > self._listener.max_split_size:
+                    stderr = f"Part {output} is too large".encode()
+                    break
+            else:
+                return True
+        try:
+            stderr = stderr.decode().strip()
+        except Exception:
+            stderr = "Unable to decode the error!"
+        LOGGER.warning(
+            f"{stderr}. Segment split failed, splitting part by part. Path: {f_path}",
+        )
+        for output in outputs:
+            if await aiopath.exists(output):
+                await remove(output)
+        return None
+
     async def split(self, f_path, file_, parts, split_size):
+        self.clear()
+        self._total_time = (await get_media_info(f_path))[0]
+        res = await self._segment_split(f_path, file_, split_size)
+        if res is not None:
+            return res
+        return await self._split_by_seek(f_path, file_, parts, split_size)
+
+    async def _split_by_seek(self, f_path, file_, parts, split_size):
         self.clear()
         multi_streams = True
         self._total_time = duration = (await get_media_info(f_path))[0]
@@ -713,14 +962,14 @@ class FFMpeg:
                 del cmd[12]
             if self._listener.is_cancelled:
                 return False
-            self._listener.subproc = await create_subprocess_exec(
+            self._proc = self._listener.subproc = await create_subprocess_exec(
                 *cmd,
                 stdout=PIPE,
                 stderr=PIPE,
             )
             await self._ffmpeg_progress()
-            _, stderr = await self._listener.subproc.communicate()
-            code = self._listener.subproc.returncode
+            _, stderr = await self._proc.communicate()
+            code = self._proc.returncode
             if self._listener.is_cancelled:
                 return False
             if code == -9:
@@ -771,3 +1020,100 @@ class FFMpeg:
             i += 1
 
         return True
+
+
+class FFMpegPool:
+    """Bounded pool of FFMpeg workers processing the files of one task.
+
+    Every job waits for a free worker, then for its own CPU scheduler slots,
+    so a pool of stream copies can run side by side while re-encodes still
+    share the CPU with other tasks. The pool exposes the progress attributes
+    of FFMpeg aggregated over its workers, so FFmpegStatus can show it the
+    same way as a single worker.
+    """
+
+    def __init__(self, listener, size=1):
+        self._listener = listener
+        self._workers = [FFMpeg(listener) for _ in range(max(size, 1))]
+        self._idle = list(self._workers)
+        self._active = {}
+        self._slots = Semaphore(len(self._workers))
+        self._total = 0
+        self._done = 0
+        self._start_time = 0
+
+    @property
+    def processed_bytes(self):
+        return sum(worker.processed_bytes for worker in self._active)
+
+    @property
+    def speed_raw(self):
+        return sum(worker.speed_raw for worker in self._active)
+
+    @property
+    def progress_raw(self):
+        if not self._total:
+            return 0
+        running = sum(worker.progress_raw for worker in self._active)
+        return (self._done * 100 + running) / self._total
+
+    @property
+    def eta_raw(self):
+        if not (progress := self.progress_raw):
+            return 0
+        return (time() - self._start_time) * (100 - progress) / progress
+
+    def kill(self):
+        for worker in self._workers:
+            worker.kill()
+
+    async def _run_job(self, f_path, weight, func):
+        async with self._slots:
+            if self._listener.is_cancelled:
+                return False
+            if not self._active:
+                self._listener.progress = False
+            async with cpu_scheduler.slot(self._listener, weight):
+                self._listener.progress = True
+                if self._listener.is_cancelled:
+                    return False
+                worker = self._idle.pop()
+                self._active[worker] = (await stat(f_path)).st_size
+                self._start_time = self._start_time or time()
+                self._listener.proceed_count += 1
+                self._listener.subsize = sum(self._active.values())
+                if not self._listener.is_file:
+                    self._listener.subname = ospath.basename(f_path)
+                try:
+                    return await func(worker)
+                finally:
+                    del self._active[worker]
+                    self._idle.append(worker)
+                    self._done += 1
+
+    async def run(self, jobs):
+        """Runs the jobs of a stage through the pool.
+
+        Args:
+            jobs: List of ``(f_path, weight, func)`` tuples, where ``func``
+                is an async callable that processes ``f_path`` with the
+                FFMpeg worker it receives and ``weight`` is the number of
+                CPU slots it needs.
+
+        Returns:
+            The results of the jobs, in order.
+        """
+        self._total = len(jobs)
+        self._done = 0
+        self._start_time = 0
+        self._listener.proceed_count = 0
+        tasks = [create_task(self._run_job(*job)) for job in jobs]
+        try:
+            return await gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            self.kill()
+            raise
+        finally:
+            self._listener.progress = True
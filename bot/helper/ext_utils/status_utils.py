@@ -1,11 +1,12 @@
 import contextlib
-from asyncio import gather, iscoroutinefunction
+from asyncio import Lock, gather, iscoroutinefunction
 from html import escape
 from time import time
 
 from psutil import cpu_percent, disk_usage, virtual_memory
 
 from bot import DOWNLOAD_DIR, bot_start_time, status_dict, task_dict, task_dict_lock
+from bot.helper.ext_utils.cpu_scheduler import cpu_scheduler
 from bot.helper.telegram_helper.button_build import ButtonMaker
 
 SIZE_UNITS = ["B", "KB", "MB", "GB", "TB", "PB"]
@@ -21,6 +22,7 @@ class MirrorStatus:
     STATUS_ARCHIVE = "Archive"
     STATUS_EXTRACT = "Extract"
     STATUS_SPLIT = "Split"
+    STATUS_JOIN = "Join"
     STATUS_CHECK = "CheckUp"
     STATUS_SEED = "Seed"
     STATUS_SAMVID = "SamVid"
@@ -44,6 +46,7 @@ STATUSES = {
     "CL": MirrorStatus.STATUS_CLONE,
     "CM": MirrorStatus.STATUS_CONVERT,
     "SP": MirrorStatus.STATUS_SPLIT,
+    "JN": MirrorStatus.STATUS_JOIN,
     "SV": MirrorStatus.STATUS_SAMVID,
     "FF": MirrorStatus.STATUS_FFMPEG,
     "PA": MirrorStatus.STATUS_PAUSED,
@@ -51,49 +54,41 @@ STATUSES = {
 }
 
 
+STATUS_TICK = 2
+_status_tick = {"time": 0, "ids": None}
+_status_tick_lock = Lock()
+
+
 async def get_task_by_gid(gid: str):
     async with task_dict_lock:
-        for task in task_dict.values():
-            if hasattr(task, "seeding"):
-                await task.update()
-            if task.gid().startswith(gid) or task.gid().endswith(gid):
-                return task
+        if task := task_dict.find(gid):
+            return task
+        pending = [
+            task for task in task_dict.without_gid() if hasattr(task, "seeding")
+        ]
+    if not pending:
         return None
+    await gather(*(task.update() for task in pending))
+    async with task_dict_lock:
+        return task_dict.find(gid)
 
 
-async def get_specific_tasks(status, user_id):
+def get_specific_tasks(status, user_id):
+    """Returns the tasks of ``user_id``, or of everyone, in ``status``.
+
+    Statuses are taken from the status index, which holds the ones of the
+    last status tick.
+    """
     if status == "All":
-        if user_id:
-            return [
-                tk for tk in task_dict.values() if tk.listener.user_id == user_id
-            ]
-        return list(task_dict.values())
-    tasks_to_check = (
-        [tk for tk in task_dict.values() if tk.listener.user_id == user_id]
-        if user_id
-        else list(task_dict.values())
-    )
-    coro_tasks = []
-    coro_tasks.extend(tk for tk in tasks_to_check if iscoroutinefunction(tk.status))
-    coro_statuses = await gather(*[tk.status() for tk in coro_tasks])
-    result = []
-    coro_index = 0
-    for tk in tasks_to_check:
-        if tk in coro_tasks:
-            st = coro_statuses[coro_index]
-            coro_index += 1
-        else:
-            st = tk.status()
-        if (st == status) or (
-            status == MirrorStatus.STATUS_DOWNLOAD and st not in STATUSES.values()
-        ):
-            result.append(tk)
-    return result
+        return task_dict.by_user(user_id) if user_id else list(task_dict.values())
+    return task_dict.by_status(status, user_id)
 
 
 async def get_all_tasks(req_status: str, user_id):
+    if req_status != "All":
+        await get_status_tick()
     async with task_dict_lock:
-        return await get_specific_tasks(req_status, user_id)
+        return get_specific_tasks(req_status, user_id)
 
 
 def get_readable_file_size(size_in_bytes):
@@ -185,37 +180,68 @@ def source(self):
     )
 
 
-async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=1):
-    msg = ""
-    button = None
+async def _get_task_status(task):
+    if iscoroutinefunction(task.status):
+        return await task.status()
+    return task.status()
 
-    tasks = await get_specific_tasks(status, sid if is_user else None)
 
-    STATUS_LIMIT = 4
-    tasks_no = len(tasks)
-    pages = (max(tasks_no, 1) + STATUS_LIMIT - 1) // STATUS_LIMIT
-    if page_no > pages:
-        page_no = (page_no - 1) % pages + 1
-        status_dict[sid]["page_no"] = page_no
-    elif page_no < 1:
-        page_no = pages - (abs(page_no) % pages)
-        status_dict[sid]["page_no"] = page_no
-    start_position = (page_no - 1) * STATUS_LIMIT
-
-    for index, task in enumerate(
-        tasks[start_position : STATUS_LIMIT + start_position],
-        start=1,
-    ):
-        if status != "All":
-            tstatus = status
-        elif iscoroutinefunction(task.status):
-            tstatus = await task.status()
-        else:
-            tstatus = task.status()
+def _filter_status(st):
+    """Returns the status filter a task status belongs to. Statuses without
+    a filter of their own are listed as downloads.
+    """
+    return st if st in STATUSES.values() else MirrorStatus.STATUS_DOWNLOAD
+
+
+def _match_status(st, status):
+    return status == "All" or _filter_status(st) == status
+
+
+async def get_status_tick():
+    """Returns the status snapshot shared by all chats.
+
+    Statuses of all tasks and the system stats footer are computed once per
+    tick, or sooner if tasks were added, removed or replaced, and rendered
+    pages are cached in the tick until it expires.
+
+    The tasks are copied from ``task_dict`` in one step before any await, so
+    tasks added or removed while statuses are computed can't break the
+    iteration. ``task_dict_lock`` isn't taken here, since the status message
+    updaters call this while holding it.
+    """
+    async with _status_tick_lock:
+        tasks = list(task_dict.values())
+        ids = [id(task) for task in tasks]
+        if (
+            time() - _status_tick["time"] >= STATUS_TICK
+            or ids != _status_tick["ids"]
+        ):
+            statuses = await gather(*(_get_task_status(task) for task in tasks))
+            for task, st in zip(tasks, statuses, strict=True):
+                if task_dict.get(task.listener.mid) is task:
+                    task_dict.set_status(task.listener.mid, _filter_status(st))
+            stats = f"<b>CPU:</b> {cpu_percent()}% | <b>FREE:</b> {get_readable_file_size(disk_usage(DOWNLOAD_DIR).free)}"
+            stats += f"\n<b>RAM:</b> {virtual_memory().percent}% | <b>UPTIME:</b> {get_readable_time(time() - bot_start_time)}"
+            _status_tick.update(
+                {
+                    "time": time(),
+                    "ids": ids,
+                    "tasks": list(zip(tasks, statuses, strict=True)),
+                    "stats": stats,
+                    "lists": {},
+                    "pages": {},
+                },
+            )
+        return _status_tick
+
+
+def _render_tasks(tasks, start_position):
+    msg = ""
+    for index, (task, tstatus) in enumerate(tasks, start=start_position + 1):
         if task.listener.is_super_chat:
-            msg += f"<b>{index + start_position}. <a href='{task.listener.message.link}'>{tstatus}</a>: </b>"
+            msg += f"<b>{index}. <a href='{task.listener.message.link}'>{tstatus}</a>: </b>"
         else:
-            msg += f"<b>{index + start_position}. {tstatus}: </b>"
+            msg += f"<b>{index}. {tstatus}: </b>"
         msg += f"<code>{escape(f'{task.name()}')}</code>"
         if task.listener.subname:
             msg += f"\n<i>{task.listener.subname}</i>"
@@ -252,20 +278,69 @@ async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=
             msg += f" | <b>Time: </b>{task.seeding_time()}"
         else:
             msg += f"\n<b>Size: </b>{task.size()}"
+            if cpu_position := cpu_scheduler.position(task.listener.mid):
+                msg += (
+                    f"\n<b>CPU Queue:</b> {cpu_position}/{cpu_scheduler.waiting}"
+                    f" | <b>Slots:</b> {cpu_scheduler.used}/{cpu_scheduler.capacity}"
+                )
         msg += f"\n<b>Tool:</b> {task.tool}"
         task_gid = task.gid()
         short_gid = task_gid[-8:] if task_gid.startswith("SABnzbd") else task_gid[:8]
         msg += f"\n/stop_{short_gid}\n\n"
+    return msg
+
+
+async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=1):
+    tick = await get_status_tick()
+    user_id = sid if is_user else None
+
+    list_key = (status, user_id)
+    if list_key not in tick["lists"]:
+        tick["lists"][list_key] = [
+            (tk, st)
+            for tk, st in tick["tasks"]
+            if (not user_id or tk.listener.user_id == user_id)
+            and _match_status(st, status)
+        ]
+    tasks = tick["lists"][list_key]
+
+    STATUS_LIMIT = 4
+    tasks_no = len(tasks)
+    pages = (max(tasks_no, 1) + STATUS_LIMIT - 1) // STATUS_LIMIT
+    if page_no > pages:
+        page_no = (page_no - 1) % pages + 1
+        status_dict[sid]["page_no"] = page_no
+    elif page_no < 1:
+        page_no = pages - (abs(page_no) % pages)
+        status_dict[sid]["page_no"] = page_no
+
+    page_key = (status, user_id, page_no, page_step)
+    if page_key not in tick["pages"]:
+        start_position = (page_no - 1) * STATUS_LIMIT
+        msg = _render_tasks(
+            [
+                (tk, status if status != "All" else st)
+                for tk, st in tasks[start_position : STATUS_LIMIT + start_position]
+            ],
+            start_position,
+        )
+        if len(msg) == 0:
+            if status == "All":
+                tick["pages"][page_key] = None
+            else:
+                msg = f"No Active {status} Tasks!\n\n"
+        if msg:
+            if tasks_no > STATUS_LIMIT:
+                msg += f"<b>Page:</b> {page_no}/{pages} | <b>Tasks:</b> {tasks_no} | <b>Step:</b> {page_step}\n"
+            tick["pages"][page_key] = msg + tick["stats"]
+    msg = tick["pages"][page_key]
+    if msg is None:
+        return None, None
 
-    if len(msg) == 0:
-        if status == "All":
-            return None, None
-        msg = f"No Active {status} Tasks!\n\n"
     buttons = ButtonMaker()
     if not is_user:
         buttons.data_button("≈", f"status {sid} ov", position="header")
-    if len(tasks) > STATUS_LIMIT:
-        msg += f"<b>Page:</b> {page_no}/{pages} | <b>Tasks:</b> {tasks_no} | <b>Step:</b> {page_step}\n"
+    if tasks_no > STATUS_LIMIT:
         buttons.data_button("prev", f"status {sid} pre", position="header")
         buttons.data_button("next", f"status {sid} nex", position="header")
         if tasks_no > 30:
@@ -276,6 +351,4 @@ async def get_readable_message(sid, is_user, page_no=1, status="All", page_step=
             if status_value != status:
                 buttons.data_button(label, f"status {sid} st {status_value}")
     button = buttons.build_menu(8)
-    msg += f"<b>CPU:</b> {cpu_percent()}% | <b>FREE:</b> {get_readable_file_size(disk_usage(DOWNLOAD_DIR).free)}"
-    msg += f"\n<b>RAM:</b> {virtual_memory().percent}% | <b>UPTIME:</b> {get_readable_time(time() - bot_start_time)}"
     return msg, button
@@ -1,19 +1,35 @@
-from asyncio import Event
+import contextlib
+from asyncio import Event, create_task, sleep
+from heapq import heappop, heappush
+from html import escape
+from itertools import count
+from math import inf
+from os import lstat, walk
+from os import path as ospath
+from time import time
+
+from psutil import cpu_percent, disk_usage
 
 from bot import (
+    DOWNLOAD_DIR,
     LOGGER,
     non_queued_dl,
     non_queued_up,
     queue_dict_lock,
-    queued_dl,
-    queued_up,
+    sudo_users,
+    task_dict,
+    task_dict_lock,
+    user_data,
 )
 from bot.core.config_manager import Config
+from bot.core.torrent_manager import TorrentManager
 from bot.helper.mirror_leech_utils.gdrive_utils.search import GoogleDriveSearch
+from bot.helper.telegram_helper.message_utils import send_message
 
 from .bot_utils import get_telegraph_list, sync_to_async
 from .files_utils import get_base_name
 from .links_utils import is_gdrive_id
+from .status_utils import get_readable_file_size
 
 
 async def stop_duplicate_check(listener):
@@ -54,20 +70,295 @@ async def stop_duplicate_check(listener):
     return False, None
 
 
+class TaskQueue:
+    """Fair-share priority queue of tasks waiting for a download/upload slot.
+
+    Users are served round-robin through a virtual clock: every user with
+    waiting tasks holds one entry in a heap ordered by priority class and
+    the round in which that user is served next, so a single bulk can't
+    starve everyone else. Owner and sudo tasks form a higher class. Each
+    user's own tasks are kept in a heap ordered by size when
+    ``QUEUE_SHORT_FIRST`` is enabled, otherwise in submission order.
+    Enqueue and dequeue are O(log n); removal is lazy.
+
+    The queue behaves like a ``{mid: event}`` mapping for membership tests,
+    event lookup and removal.
+    """
+
+    def __init__(self):
+        self._events = {}
+        self._listeners = {}
+        self._pending = {}
+        self._users = {}
+        self._ready = []
+        self._seq = count()
+        self._round = 0
+
+    def __contains__(self, mid):
+        return mid in self._events
+
+    def __getitem__(self, mid):
+        return self._events[mid]
+
+    def __delitem__(self, mid):
+        del self._events[mid]
+        user_id = self._listeners.pop(mid).user_id
+        self._pending[user_id] -= 1
+        if not self._pending[user_id]:
+            del self._pending[user_id]
+
+    def __len__(self):
+        return len(self._events)
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def push(self, listener, event):
+        """Adds a listener's task to the queue.
+
+        Args:
+            listener: The task listener waiting for a slot.
+            event: The event set once the task is started.
+        """
+        mid = listener.mid
+        user_id = listener.user_id
+        if mid in self._events:
+            del self[mid]
+        self._events[mid] = event
+        self._listeners[mid] = listener
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        if user_id not in self._users:
+            self._users[user_id] = []
+            heappush(
+                self._ready,
+                (_priority(user_id), self._round, next(self._seq), user_id),
+            )
+        size = (listener.size or inf) if Config.QUEUE_SHORT_FIRST else 0
+        heappush(self._users[user_id], (size, next(self._seq), mid))
+
+    def listener(self, mid):
+        """Returns the listener of a queued task."""
+        return self._listeners[mid]
+
+    def peek(self):
+        """Returns the mid of the task that should start next without
+        removing it.
+
+        Returns:
+            The message id of the next task, or None if the queue is empty.
+        """
+        while self._ready:
+            user_id = self._ready[0][3]
+            tasks = self._users[user_id]
+            while tasks and tasks[0][2] not in self._events:
+                heappop(tasks)
+            if tasks:
+                return tasks[0][2]
+            heappop(self._ready)
+            del self._users[user_id]
+        return None
+
+    def next(self):
+        """Returns the mid of the task that should start next.
+
+        The task stays in the queue until it's started and deleted by the
+        caller, which must happen before the next call.
+
+        Returns:
+            The message id of the next task, or None if the queue is empty.
+        """
+        entry, _ = self.pop_ready()
+        if entry is None:
+            return None
+        return self.take(entry)
+
+    def pop_ready(self):
+        """Removes the user that should be served next from the ready heap.
+
+        The entry must be passed back to :meth:`take` to start the user's
+        first task, or to :meth:`restore` to keep the user's turn.
+
+        Returns:
+            The ready entry and the mid of the user's first task, or
+            ``(None, None)`` if no task is waiting.
+        """
+        while self._ready:
+            entry = heappop(self._ready)
+            user_id = entry[3]
+            tasks = self._users[user_id]
+            while tasks and tasks[0][2] not in self._events:
+                heappop(tasks)
+            if tasks:
+                return entry, tasks[0][2]
+            del self._users[user_id]
+        return None, None
+
+    def take(self, entry):
+        """Takes the first task of the user of an entry from
+        :meth:`pop_ready` and charges the user a round.
+
+        Returns:
+            The message id of the task.
+        """
+        priority, round_, _, user_id = entry
+        _, _, mid = heappop(self._users[user_id])
+        if self._pending[user_id] > 1:
+            heappush(self._ready, (priority, round_ + 1, next(self._seq), user_id))
+        else:
+            del self._users[user_id]
+        self._round = round_
+        return mid
+
+    def restore(self, entries):
+        """Puts entries from :meth:`pop_ready` back without charging their
+        users.
+        """
+        for entry in entries:
+            heappush(self._ready, entry)
+
+
+def _priority(user_id):
+    if (
+        user_id == Config.OWNER_ID
+        or user_id in sudo_users
+        or user_data.get(user_id, {}).get("SUDO")
+    ):
+        return 0
+    return 1
+
+
+queued_dl = TaskQueue()
+queued_up = TaskQueue()
+ALLOCATION_TTL = 10
+reserved_space = {}
+_allocations = {}
+_admission_retry = {"task": None}
+
+
+def _allocated_bytes(mid):
+    """Returns the bytes a download has allocated on disk so far.
+
+    The directory is walked at most once every ``ALLOCATION_TTL`` seconds
+    per task, so admission checks don't scan large trees on every call.
+    """
+    if (cached := _allocations.get(mid)) is not None and (
+        time() - cached[0] < ALLOCATION_TTL
+    ):
+        return cached[1]
+    total = 0
+    for root, _, files in walk(f"{DOWNLOAD_DIR}{mid}"):
+        for file_ in files:
+            with contextlib.suppress(OSError):
+                total += lstat(ospath.join(root, file_)).st_blocks * 512
+    _allocations[mid] = (time(), total)
+    return total
+
+
+def _pending_bytes(reservations):
+    return sum(
+        max(target - _allocated_bytes(mid), 0) for mid, target in reservations
+    )
+
+
+async def _free_space(exclude=None):
+    """Returns the free space of DOWNLOAD_DIR minus what running downloads
+    still need.
+
+    A reservation holds the size a download will reach on disk. The bytes
+    it already wrote are counted by the disk itself, so only the rest of
+    the reservation is subtracted.
+    """
+    for mid in list(reserved_space):
+        if mid not in non_queued_dl:
+            del reserved_space[mid]
+            _allocations.pop(mid, None)
+    reservations = [
+        (mid, target) for mid, target in reserved_space.items() if mid != exclude
+    ]
+    pending = await sync_to_async(_pending_bytes, reservations)
+    return disk_usage(DOWNLOAD_DIR).free - pending
+
+
+async def reserve_space(mid, size):
+    """Reserves space in DOWNLOAD_DIR for a running download.
+
+    Args:
+        mid: The message id of the task.
+        size: The number of bytes the download still needs.
+
+    Returns:
+        True if the space is available and now reserved, False otherwise.
+    """
+    if await _free_space(mid) < size:
+        return False
+    allocated = await sync_to_async(_allocated_bytes, mid)
+    reserved_space[mid] = allocated + size
+    return True
+
+
+async def _download_speed():
+    if not Config.QUEUE_LINK_CAPACITY:
+        return 0
+    try:
+        dl_speed, _ = await TorrentManager.overall_speed()
+    except Exception as e:
+        LOGGER.error(f"Admission control, while getting overall speed: {e}")
+        return 0
+    return dl_speed
+
+
+def _resources_busy(dl_speed):
+    if Config.QUEUE_CPU_LIMIT and cpu_percent() >= Config.QUEUE_CPU_LIMIT:
+        return True
+    return bool(
+        Config.QUEUE_LINK_CAPACITY and dl_speed >= Config.QUEUE_LINK_CAPACITY,
+    )
+
+
+async def _reject_download(listener, total):
+    LOGGER.info(f"Download is larger than the disk: {listener.name}")
+    msg = (
+        f"{listener.tag} Download: {escape(listener.name)} needs "
+        f"{get_readable_file_size(listener.size)}, more than the "
+        f"{get_readable_file_size(total)} of the download disk!"
+    )
+    async with task_dict_lock:
+        task = task_dict.get(listener.mid)
+    if task is None:
+        await listener.on_download_error(msg)
+        return
+    await send_message(listener.message, msg)
+    await task.cancel_task()
+
+
+async def _retry_admission():
+    await sleep(30)
+    _admission_retry["task"] = None
+    await start_from_queued()
+
+
+def _schedule_admission_retry():
+    if _admission_retry["task"] is None:
+        _admission_retry["task"] = create_task(_retry_admission())
+
+
 async def check_running_tasks(listener, state="dl"):
     all_limit = Config.QUEUE_ALL
     state_limit = Config.QUEUE_DOWNLOAD if state == "dl" else Config.QUEUE_UPLOAD
     event = None
     is_over_limit = False
+    forced = (
+        listener.force_run
+        or (listener.force_upload and state == "up")
+        or (listener.force_download and state == "dl")
+    )
+    if state == "dl" and not forced:
+        free = await _free_space()
+        dl_speed = await _download_speed()
     async with queue_dict_lock:
         if state == "up" and listener.mid in non_queued_dl:
             non_queued_dl.remove(listener.mid)
-        if (
-            (all_limit or state_limit)
-            and not listener.force_run
-            and not (listener.force_upload and state == "up")
-            and not (listener.force_download and state == "dl")
-        ):
+        if (all_limit or state_limit) and not forced:
             dl_count = len(non_queued_dl)
             up_count = len(non_queued_up)
             t_count = dl_count if state == "dl" else up_count
@@ -76,22 +367,33 @@ async def check_running_tasks(listener, state="dl"):
                 and dl_count + up_count >= all_limit
                 and (not state_limit or t_count >= state_limit)
             ) or (state_limit and t_count >= state_limit)
+        if not is_over_limit and not forced and state == "dl":
+            is_over_limit = free < max(listener.size, 1) or _resources_busy(
+                dl_speed,
+            )
             if is_over_limit:
-                event = Event()
-                if state == "dl":
-                    queued_dl[listener.mid] = event
-                else:
-                    queued_up[listener.mid] = event
+                LOGGER.info(
+                    f"Holding download until resources are free: {listener.name}",
+                )
+                _schedule_admission_retry()
+        if is_over_limit:
+            event = Event()
+            if state == "dl":
+                queued_dl.push(listener, event)
+            else:
+                queued_up.push(listener, event)
         if not is_over_limit:
             if state == "up":
                 non_queued_up.add(listener.mid)
             else:
                 non_queued_dl.add(listener.mid)
+                reserved_space[listener.mid] = listener.size
 
     return is_over_limit, event
 
 
 async def start_dl_from_queued(mid: int):
+    reserved_space[mid] = queued_dl.listener(mid).size
     queued_dl[mid].set()
     del queued_dl[mid]
     non_queued_dl.add(mid)
@@ -103,55 +405,57 @@ async def start_up_from_queued(mid: int):
     non_queued_up.add(mid)
 
 
+def _has_free_slot(running, state_limit):
+    if state_limit and running >= state_limit:
+        return False
+    all_limit = Config.QUEUE_ALL
+    return not all_limit or len(non_queued_dl) + len(non_queued_up) < all_limit
+
+
 async def start_from_queued():
-    if all_limit := Config.QUEUE_ALL:
-        dl_limit = Config.QUEUE_DOWNLOAD
-        up_limit = Config.QUEUE_UPLOAD
-        async with queue_dict_lock:
-            dl = len(non_queued_dl)
-            up = len(non_queued_up)
-            all_ = dl + up
-            if all_ < all_limit:
-                f_tasks = all_limit - all_
-                if queued_up and (not up_limit or up < up_limit):
-                    for index, mid in enumerate(list(queued_up.keys()), start=1):
-                        await start_up_from_queued(mid)
-                        f_tasks -= 1
-                        if f_tasks == 0 or (up_limit and index >= up_limit - up):
-                            break
-                if queued_dl and (not dl_limit or dl < dl_limit) and f_tasks != 0:
-                    for index, mid in enumerate(list(queued_dl.keys()), start=1):
-                        await start_dl_from_queued(mid)
-                        if (dl_limit and index >= dl_limit - dl) or index == f_tasks:
-                            break
-        return
+    """Starts queued uploads and downloads while slots are free.
 
-    if up_limit := Config.QUEUE_UPLOAD:
-        async with queue_dict_lock:
-            up = len(non_queued_up)
-            if queued_up and up < up_limit:
-                f_tasks = up_limit - up
-                for index, mid in enumerate(list(queued_up.keys()), start=1):
-                    await start_up_from_queued(mid)
-                    if index == f_tasks:
-                        break
-    else:
-        async with queue_dict_lock:
-            if queued_up:
-                for mid in list(queued_up.keys()):
-                    await start_up_from_queued(mid)
-
-    if dl_limit := Config.QUEUE_DOWNLOAD:
-        async with queue_dict_lock:
-            dl = len(non_queued_dl)
-            if queued_dl and dl < dl_limit:
-                f_tasks = dl_limit - dl
-                for index, mid in enumerate(list(queued_dl.keys()), start=1):
-                    await start_dl_from_queued(mid)
-                    if index == f_tasks:
-                        break
-    else:
-        async with queue_dict_lock:
-            if queued_dl:
-                for mid in list(queued_dl.keys()):
-                    await start_dl_from_queued(mid)
+    Downloads are tried in the order of :meth:`TaskQueue.pop_ready`. One that
+    doesn't fit on the disk yet is skipped, so it doesn't hold back smaller
+    tasks of other users, and one larger than the whole disk is failed.
+    """
+    free = dl_speed = total = None
+    if queued_dl:
+        free = await _free_space()
+        dl_speed = await _download_speed()
+        total = disk_usage(DOWNLOAD_DIR).total
+    rejected = []
+    async with queue_dict_lock:
+        while queued_up and _has_free_slot(len(non_queued_up), Config.QUEUE_UPLOAD):
+            await start_up_from_queued(queued_up.next())
+        busy = free is None or _resources_busy(dl_speed)
+        waiting = busy and bool(queued_dl)
+        held = []
+        while (
+            not busy
+            and queued_dl
+            and _has_free_slot(len(non_queued_dl), Config.QUEUE_DOWNLOAD)
+        ):
+            entry, mid = queued_dl.pop_ready()
+            if entry is None:
+                break
+            held.append(entry)
+            listener = queued_dl.listener(mid)
+            if listener.is_cancelled:
+                continue
+            if listener.size > total:
+                listener.is_cancelled = True
+                rejected.append(listener)
+                continue
+            size = max(listener.size, 1)
+            if free < size:
+                waiting = True
+                continue
+            free -= size
+            held.pop()
+            await start_dl_from_queued(queued_dl.take(entry))
+        queued_dl.restore(held)
+        if waiting:
+            _schedule_admission_retry()
+    for listener in rejected:
+        await _reject_download(listener, total)
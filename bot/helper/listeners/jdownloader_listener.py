@@ -4,6 +4,7 @@ from bot import intervals, jd_downloads, jd_listener_lock
 from bot.core.jdownloader_booter import jdownloader
 from bot.helper.ext_utils.bot_utils import new_task
 from bot.helper.ext_utils.status_utils import get_task_by_gid
+from bot.helper.mirror_leech_utils.status_utils.jdownloader_status import JDSnapshot
 
 
 @new_task
@@ -50,31 +51,29 @@ async def _jd_listener():
                 intervals["jd"] = ""
                 break
             try:
-                packages = await jdownloader.device.downloads.query_packages(
-                    [{"finished": True, "saveTo": True}],
-                )
+                await JDSnapshot.refresh()
             except Exception:
                 continue
 
-            all_packages = {pack["uuid"]: pack for pack in packages}
+            all_packages = JDSnapshot.packages
             for d_gid, d_dict in list(jd_downloads.items()):
                 if d_dict["status"] == "down":
-                    for index, pid in enumerate(d_dict["ids"]):
-                        if pid not in all_packages:
-                            del jd_downloads[d_gid]["ids"][index]
-                    if len(jd_downloads[d_gid]["ids"]) == 0:
-                        path = jd_downloads[d_gid]["path"]
-                        jd_downloads[d_gid]["ids"] = [
+                    d_dict["ids"] = [
+                        pid for pid in d_dict["ids"] if pid in all_packages
+                    ]
+                    if len(d_dict["ids"]) == 0:
+                        path = d_dict["path"]
+                        d_dict["ids"] = [
                             uid
                             for uid, pk in all_packages.items()
                             if pk["saveTo"].startswith(path)
                         ]
-                    if len(jd_downloads[d_gid]["ids"]) == 0:
+                    if len(d_dict["ids"]) == 0:
                         await remove_download(d_gid)
 
-            if completed_packages := [
-                pack["uuid"] for pack in packages if pack.get("finished", False)
-            ]:
+            if completed_packages := {
+                uid for uid, pack in all_packages.items() if pack.get("finished")
+            }:
                 for d_gid, d_dict in list(jd_downloads.items()):
                     if d_dict["status"] == "down":
                         is_finished = all(
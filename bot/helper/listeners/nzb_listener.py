@@ -4,6 +4,7 @@ from bot import LOGGER, intervals, nzb_jobs, nzb_listener_lock, sabnzbd_client
 from bot.helper.ext_utils.bot_utils import new_task
 from bot.helper.ext_utils.status_utils import get_task_by_gid
 from bot.helper.ext_utils.task_manager import stop_duplicate_check
+from bot.helper.mirror_leech_utils.status_utils.nzb_status import NzbSnapshot
 
 
 async def _remove_job(nzo_id, mid):
@@ -16,6 +17,7 @@ async def _remove_job(nzo_id, mid):
     async with nzb_listener_lock:
         if nzo_id in nzb_jobs:
             del nzb_jobs[nzo_id]
+    NzbSnapshot.remove(nzo_id)
 
 
 @new_task
@@ -52,33 +54,29 @@ async def _nzb_listener():
     while not intervals["stopAll"]:
         async with nzb_listener_lock:
             try:
-                jobs = (await sabnzbd_client.get_history())["history"]["slots"]
-                downloads = (await sabnzbd_client.get_downloads())["queue"]["slots"]
                 if len(nzb_jobs) == 0:
                     intervals["nzb"] = ""
                     break
-                for job in jobs:
-                    nzo_id = job["nzo_id"]
+                await NzbSnapshot.refresh()
+                for nzo_id, job in list(NzbSnapshot.jobs.items()):
                     if nzo_id not in nzb_jobs:
                         continue
-                    if job["status"] == "Completed":
-                        if not nzb_jobs[nzo_id]["uploaded"]:
-                            nzb_jobs[nzo_id]["uploaded"] = True
-                            await _on_download_complete(nzo_id)
-                            nzb_jobs[nzo_id]["status"] = "Completed"
-                    elif job["status"] == "Failed":
-                        await _on_download_error(job["fail_message"], nzo_id)
-                for dl in downloads:
-                    nzo_id = dl["nzo_id"]
-                    if nzo_id not in nzb_jobs:
+                    if job["source"] == "history":
+                        if job["status"] == "Completed":
+                            if not nzb_jobs[nzo_id]["uploaded"]:
+                                nzb_jobs[nzo_id]["uploaded"] = True
+                                await _on_download_complete(nzo_id)
+                                nzb_jobs[nzo_id]["status"] = "Completed"
+                        elif job["status"] == "Failed":
+                            await _on_download_error(job["fail_message"], nzo_id)
                         continue
-                    if dl["labels"] and dl["labels"][0] == "ALTERNATIVE":
+                    if job["labels"] and job["labels"][0] == "ALTERNATIVE":
                         await _on_download_error("Duplicated Job!", nzo_id)
                         continue
                     if (
-                        dl["status"] == "Downloading"
+                        job["status"] == "Downloading"
                         and not nzb_jobs[nzo_id]["stop_dup_check"]
-                        and not dl["filename"].startswith("Trying")
+                        and not job["filename"].startswith("Trying")
                     ):
                         nzb_jobs[nzo_id]["stop_dup_check"] = True
                         await _stop_duplicate(nzo_id)
@@ -16,17 +16,21 @@ from bot import (
     task_dict_lock,
 )
 from bot.core.config_manager import Config
-from bot.core.torrent_manager import TorrentManager
+from bot.core.torrent_manager import QbitSnapshot, TorrentManager
 from bot.helper.ext_utils.bot_utils import new_task
 from bot.helper.ext_utils.files_utils import clean_unwanted
 from bot.helper.ext_utils.status_utils import get_readable_time, get_task_by_gid
-from bot.helper.ext_utils.task_manager import stop_duplicate_check
+from bot.helper.ext_utils.task_manager import reserve_space, stop_duplicate_check
 from bot.helper.mirror_leech_utils.status_utils.qbit_status import QbittorrentStatus
 from bot.helper.telegram_helper.message_utils import update_status_message
 
+# States handled by timeouts, checked every tick even without a delta
+_TIMED_STATES = ("metaDL", "stalledDL")
+
 
 async def _remove_torrent(hash_, tag):
     await TorrentManager.qbittorrent.torrents.delete([hash_], True)
+    QbitSnapshot.remove(hash_)
     async with qb_listener_lock:
         if tag in qb_torrents:
             del qb_torrents[tag]
@@ -68,6 +72,15 @@ async def _stop_duplicate(tor):
             _on_download_error(msg, tor, button)
 
 
+@new_task
+async def _check_free_space(tor):
+    if not await reserve_space(int(tor.tags[0]), tor.amount_left):
+        await _on_download_error(
+            "No enough space for this torrent on device",
+            tor,
+        )
+
+
 @new_task
 async def _on_download_complete(tor):
     ext_hash = tor.hash
@@ -102,6 +115,7 @@ async def _on_download_complete(tor):
             async with qb_listener_lock:
                 if tag in qb_torrents:
                     qb_torrents[tag]["seeding"] = True
+                    QbitSnapshot.touch(tag)
                 else:
                     return
             await update_status_message(task.listener.message.chat.id)
@@ -117,11 +131,13 @@ async def _qb_listener():
     while True:
         async with qb_listener_lock:
             try:
-                torrents = await TorrentManager.qbittorrent.torrents.info()
-                if len(torrents) == 0:
+                await QbitSnapshot.refresh()
+                if not QbitSnapshot.by_hash:
                     intervals["qb"] = ""
                     break
-                for tor_info in torrents:
+                for tor_info in QbitSnapshot.pop_changed(_TIMED_STATES):
+                    if not tor_info.tags:
+                        continue
                     tag = tor_info.tags[0]
                     if tag not in qb_torrents:
                         continue
@@ -142,6 +158,7 @@ async def _qb_listener():
                         qb_torrents[tag]["stalled_time"] = time()
                         if not qb_torrents[tag]["stop_dup_check"]:
                             qb_torrents[tag]["stop_dup_check"] = True
+                            await _check_free_space(tor_info)
                             await _stop_duplicate(tor_info)
                     elif state == "stalledDL":
                         if (
@@ -210,5 +227,6 @@ async def on_download_start(tag):
             "uploaded": False,
             "seeding": False,
         }
+        QbitSnapshot.touch(tag)
         if not intervals["qb"]:
             intervals["qb"] = await _qb_listener()
@@ -14,8 +14,6 @@ from bot import (
     non_queued_dl,
     non_queued_up,
     queue_dict_lock,
-    queued_dl,
-    queued_up,
     same_directory_lock,
     task_dict,
     task_dict_lock,
@@ -26,6 +24,7 @@ from bot.helper.common import TaskConfig
 from bot.helper.ext_utils.bot_utils import sync_to_async
 from bot.helper.ext_utils.db_handler import database
 from bot.helper.ext_utils.files_utils import (
+    FileSplitter,
     clean_download,
     clean_target,
     create_recursive_symlink,
@@ -35,7 +34,12 @@ from bot.helper.ext_utils.files_utils import (
 )
 from bot.helper.ext_utils.links_utils import is_gdrive_id
 from bot.helper.ext_utils.status_utils import get_readable_file_size
-from bot.helper.ext_utils.task_manager import check_running_tasks, start_from_queued
+from bot.helper.ext_utils.task_manager import (
+    check_running_tasks,
+    queued_dl,
+    queued_up,
+    start_from_queued,
+)
 from bot.helper.mirror_leech_utils.gdrive_utils.upload import GoogleDriveUpload
 from bot.helper.mirror_leech_utils.rclone_utils.transfer import RcloneTransferHelper
 from bot.helper.mirror_leech_utils.status_utils.gdrive_status import (
@@ -43,6 +47,7 @@ from bot.helper.mirror_leech_utils.status_utils.gdrive_status import (
 )
 from bot.helper.mirror_leech_utils.status_utils.queue_status import QueueStatus
 from bot.helper.mirror_leech_utils.status_utils.rclone_status import RcloneStatus
+from bot.helper.mirror_leech_utils.status_utils.split_status import SplitStatus
 from bot.helper.mirror_leech_utils.status_utils.telegram_status import TelegramStatus
 from bot.helper.mirror_leech_utils.status_utils.yt_status import YtStatus
 from bot.helper.mirror_leech_utils.telegram_uploader import TelegramUploader
@@ -207,7 +212,12 @@ class TaskListener(TaskConfig):
             await start_from_queued()
 
         if self.join and not self.is_file:
-            await join_files(up_path)
+            splitter = FileSplitter(self)
+            async with task_dict_lock:
+                task_dict[self.mid] = SplitStatus(self, splitter, gid, "Join")
+            await join_files(up_path, splitter)
+            if self.is_cancelled:
+                return
 
         if self.extract and not self.is_nzb:
             up_path = await self.proceed_extract(up_path, gid)
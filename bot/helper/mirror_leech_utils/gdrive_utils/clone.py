@@ -1,5 +1,4 @@
 from logging import getLogger
-from os import path as ospath
 from time import time
 
 from googleapiclient.errors import HttpError
@@ -12,7 +11,10 @@ from tenacity import (
 )
 
 from bot.helper.ext_utils.bot_utils import async_to_sync
-from bot.helper.mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
+from bot.helper.mirror_leech_utils.gdrive_utils.helper import (
+    TRANSFER_CACHE_AGE,
+    GoogleDriveHelper,
+)
 
 LOGGER = getLogger(__name__)
 
@@ -111,28 +113,85 @@ class GoogleDriveClone(GoogleDriveHelper):
 
     def _clone_folder(self, folder_name, folder_id, dest_id):
         LOGGER.info(f"Syncing: {folder_name}")
-        files = self.get_files_by_folder_id(folder_id)
-        if len(files) == 0:
-            return dest_id
-        for file in files:
-            if file.get("mimeType") == self.G_DRIVE_DIR_MIME_TYPE:
-                self.total_folders += 1
-                file_path = ospath.join(folder_name, file.get("name"))
-                current_dir_id = self.create_directory(file.get("name"), dest_id)
-                self._clone_folder(file_path, file.get("id"), current_dir_id)
-            elif (
-                not file.get("name")
-                .strip()
-                .lower()
-                .endswith(tuple(self.listener.excluded_extensions))
-            ):
-                self.total_files += 1
-                self._copy_file(file.get("id"), dest_id)
-                self.proc_bytes += int(file.get("size", 0))
-                self.total_time = int(time() - self._start_time)
-            if self.listener.is_cancelled:
-                break
-        return None
+        folders, files = self._list_tree(folder_id)
+        if self.listener.is_cancelled:
+            return
+        dest_ids = {folder_id: dest_id}
+        self._create_directories(folders, dest_ids)
+        if self.listener.is_cancelled or not files:
+            return
+        self._copy_files([(file, dest_ids[parent]) for file, parent in files])
+
+    def _list_tree(self, folder_id):
+        folders = []
+        files = []
+        for parent, items in self.get_folder_tree(
+            folder_id,
+            max_age=TRANSFER_CACHE_AGE,
+        ).items():
+            for file in items:
+                if file.get("mimeType") == self.G_DRIVE_DIR_MIME_TYPE:
+                    folders.append((file["id"], file.get("name"), parent))
+                elif (
+                    not file.get("name")
+                    .strip()
+                    .lower()
+                    .endswith(tuple(self.listener.excluded_extensions))
+                ):
+                    files.append((file, parent))
+        return folders, files
+
+    def _create_directories(self, folders, dest_ids):
+        """Creates the folder skeleton with batched requests, parents first.
+
+        Folders that fail inside a batch are created again one by one.
+        """
+        failed = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                dest_ids[request_id] = response["id"]
+            else:
+                failed.append(request_id)
+
+        names = {}
+        while folders and not self.listener.is_cancelled:
+            ready = [f for f in folders if f[2] in dest_ids]
+            folders = [f for f in folders if f[2] not in dest_ids]
+            for i in range(0, len(ready), 100):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for src_id, name, parent in ready[i : i + 100]:
+                    names[src_id] = (name, parent)
+                    batch.add(
+                        self.service.files().create(
+                            body={
+                                "name": name,
+                                "description": "Uploaded by Mirror-leech-telegram-bot",
+                                "mimeType": self.G_DRIVE_DIR_MIME_TYPE,
+                                "parents": [dest_ids[parent]],
+                            },
+                            supportsAllDrives=True,
+                            fields="id",
+                        ),
+                        request_id=src_id,
+                    )
+                batch.execute()
+                while failed:
+                    src_id = failed.pop()
+                    name, parent = names[src_id]
+                    dest_ids[src_id] = self.create_directory(name, dest_ids[parent])
+            self.total_folders += len(ready)
+
+    def _copy_files(self, files):
+        self.run_workers(files, self._copy_job)
+
+    def _copy_job(self, worker, job):
+        file, dest_id = job
+        worker._copy_file(file.get("id"), dest_id)
+        with self._lock:
+            self.total_files += 1
+            self.proc_bytes += int(file.get("size", 0))
+            self.total_time = int(time() - self._start_time)
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
@@ -141,12 +200,15 @@ class GoogleDriveClone(GoogleDriveHelper):
     )
     def _copy_file(self, file_id, dest_id):
         body = {"parents": [dest_id]}
+        self.wait_write_slot()
         try:
-            return (
+            file = (
                 self.service.files()
                 .copy(fileId=file_id, body=body, supportsAllDrives=True)
                 .execute()
             )
+            self.invalidate_folder(dest_id)
+            return file
         except HttpError as err:
             if err.resp.get("content-type", "").startswith("application/json"):
                 reason = (
@@ -168,7 +230,7 @@ class GoogleDriveClone(GoogleDriveHelper):
                         raise err
                     if self.listener.is_cancelled:
                         return None
-                    self.switch_service_account()
+                    self.switch_service_account(reason)
                     return self._copy_file(file_id, dest_id)
                 else:
                     LOGGER.error(f"Got: {reason}")
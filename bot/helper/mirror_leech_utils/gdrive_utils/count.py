@@ -62,20 +62,26 @@ class GoogleDriveCount(GoogleDriveHelper):
         self.proc_bytes += size
 
     def _gdrive_directory(self, drive_folder):
-        files = self.get_files_by_folder_id(drive_folder["id"])
-        if len(files) == 0:
-            return
-        for filee in files:
+        tree = self.get_folder_tree(drive_folder["id"], follow_shortcuts=True)
+        targets = self.get_shortcut_targets(
+            [filee for files in tree.values() for filee in files],
+        )
+        self._count_folder(tree, targets, drive_folder["id"], {drive_folder["id"]})
+
+    def _count_folder(self, tree, targets, folder_id, seen):
+        for filee in tree.get(folder_id, []):
             shortcut_details = filee.get("shortcutDetails")
             if shortcut_details is not None:
                 mime_type = shortcut_details["targetMimeType"]
                 file_id = shortcut_details["targetId"]
-                filee = self.get_file_metadata(file_id)
+                filee = targets.get(file_id, {"id": file_id})
             else:
                 mime_type = filee.get("mimeType")
+                file_id = filee["id"]
             if mime_type == self.G_DRIVE_DIR_MIME_TYPE:
                 self.total_folders += 1
-                self._gdrive_directory(filee)
+                if file_id not in seen:
+                    self._count_folder(tree, targets, file_id, seen | {file_id})
             else:
                 self.total_files += 1
                 self._gdrive_file(filee)
@@ -1,7 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 from io import FileIO
 from logging import getLogger
-from os import makedirs
+from os import O_CREAT, O_WRONLY, ftruncate, makedirs, pwrite, remove
+from os import close as osclose
+from os import open as osopen
 from os import path as ospath
+from threading import Lock
+from time import sleep, time
 
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
@@ -14,18 +19,41 @@ from tenacity import (
 )
 
 from bot.helper.ext_utils.bot_utils import SetInterval, async_to_sync
-from bot.helper.mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
+from bot.helper.mirror_leech_utils.gdrive_utils.helper import (
+    TRANSFER_CACHE_AGE,
+    GoogleDriveHelper,
+    get_service,
+)
 
 LOGGER = getLogger(__name__)
 
+SEGMENT_SIZE = 32 * 1024 * 1024
+SEGMENT_WORKERS = 4
+READ_SIZE = 4 * 1024 * 1024
+GOOGLE_APPS_MIME = "application/vnd.google-apps."
+
 
 class GoogleDriveDownload(GoogleDriveHelper):
     def __init__(self, listener, path):
         self.listener = listener
         self._updater = None
         self._path = path
+        self._start_time = time()
         super().__init__()
         self.is_downloading = True
+        self._file_progress = {}
+
+    @property
+    def processed_bytes(self):
+        with self._lock:
+            return sum(self._file_progress.values())
+
+    @property
+    def speed(self):
+        try:
+            return self.processed_bytes / (time() - self._start_time)
+        except ZeroDivisionError:
+            return 0
 
     def download(self):
         file_id = self.get_id_from_url(self.listener.link, self.listener.user_id)
@@ -42,6 +70,7 @@ class GoogleDriveDownload(GoogleDriveHelper):
                     self._path,
                     self.listener.name,
                     meta.get("mimeType"),
+                    int(meta.get("size", 0)),
                 )
         except Exception as err:
             if isinstance(err, RetryError):
@@ -67,51 +96,76 @@ class GoogleDriveDownload(GoogleDriveHelper):
         return None
 
     def _download_folder(self, folder_id, path, folder_name):
+        tree = self.get_folder_tree(
+            folder_id,
+            follow_shortcuts=True,
+            max_age=TRANSFER_CACHE_AGE,
+        )
+        targets = self.get_shortcut_targets(
+            [item for items in tree.values() for item in items],
+        )
+        files = []
+        self._list_folder(
+            tree,
+            targets,
+            (folder_id, path, folder_name),
+            {folder_id},
+            files,
+        )
+        if files and not self.listener.is_cancelled:
+            self.run_workers(files, self._download_job)
+
+    def _list_folder(self, tree, targets, folder, seen, files):
+        folder_id, path, folder_name = folder
         folder_name = folder_name.replace("/", "")
-        if not ospath.exists(f"{path}/{folder_name}"):
-            makedirs(f"{path}/{folder_name}")
         path += f"/{folder_name}"
-        result = self.get_files_by_folder_id(folder_id)
-        if len(result) == 0:
-            return
-        result = sorted(result, key=lambda k: k["name"])
-        for item in result:
+        makedirs(path, exist_ok=True)
+        for item in sorted(tree.get(folder_id, []), key=lambda k: k["name"]):
             file_id = item["id"]
             filename = item["name"]
+            size = int(item.get("size", 0))
             shortcut_details = item.get("shortcutDetails")
             if shortcut_details is not None:
                 file_id = shortcut_details["targetId"]
                 mime_type = shortcut_details["targetMimeType"]
+                size = int(targets.get(file_id, {}).get("size", 0))
             else:
                 mime_type = item.get("mimeType")
             if mime_type == self.G_DRIVE_DIR_MIME_TYPE:
-                self._download_folder(file_id, path, filename)
-            elif not ospath.isfile(
-                f"{path}{filename}",
-            ) and not filename.strip().lower().endswith(
-                tuple(self.listener.excluded_extensions),
+                if file_id not in seen:
+                    self._list_folder(
+                        tree,
+                        targets,
+                        (file_id, path, filename),
+                        seen | {file_id},
+                        files,
+                    )
+            elif (
+                not filename.strip()
+                .lower()
+                .endswith(
+                    tuple(self.listener.excluded_extensions),
+                )
             ):
-                self._download_file(file_id, path, filename, mime_type)
-            if self.listener.is_cancelled:
-                break
+                files.append((file_id, path, filename, mime_type, size))
+
+    def _download_job(self, worker, job):
+        worker._download_file(*job)
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(3),
         retry=retry_if_exception_type(Exception),
     )
-    def _download_file(self, file_id, path, filename, mime_type, export=False):
-        if export:
-            request = self.service.files().export_media(
-                fileId=file_id,
-                mimeType="application/pdf",
-            )
-        else:
-            request = self.service.files().get_media(
-                fileId=file_id,
-                supportsAllDrives=True,
-                acknowledgeAbuse=True,
-            )
+    def _download_file(
+        self,
+        file_id,
+        path,
+        filename,
+        mime_type,
+        size=0,
+        export=False,
+    ):
         filename = filename.replace("/", "")
         if export:
             filename = f"{filename}.pdf"
@@ -123,55 +177,165 @@ class GoogleDriveDownload(GoogleDriveHelper):
                 self.listener.name = filename
         if self.listener.is_cancelled:
             return None
-        fh = FileIO(f"{path}/{filename}", "wb")
-        downloader = MediaIoBaseDownload(fh, request, chunksize=100 * 1024 * 1024)
-        done = False
-        retries = 0
-        while not done:
-            if self.listener.is_cancelled:
-                fh.close()
-                break
-            try:
-                self.status, done = downloader.next_chunk()
-            except HttpError as err:
-                LOGGER.error(err)
-                if err.resp.status in [500, 502, 503, 504, 429] and retries < 10:
-                    retries += 1
-                    continue
-                if err.resp.get("content-type", "").startswith("application/json"):
-                    reason = (
-                        eval(err.content).get("error").get("errors")[0].get("reason")
+        file_path = f"{path}/{filename}"
+        try:
+            if export:
+                content = (
+                    self.service.files()
+                    .export_media(fileId=file_id, mimeType="application/pdf")
+                    .execute()
+                )
+                with open(file_path, "wb") as f:
+                    f.write(content)
+                self._set_progress(file_path, len(content))
+            elif size and not (mime_type or "").startswith(GOOGLE_APPS_MIME):
+                self._download_ranges(file_id, file_path, size)
+            else:
+                self._download_media(file_id, file_path)
+        except HttpError as err:
+            LOGGER.error(err)
+            if not err.resp.get("content-type", "").startswith("application/json"):
+                raise err
+            reason = eval(err.content).get("error").get("errors")[0].get("reason")
+            if "fileNotDownloadable" in reason and "document" in mime_type:
+                return self._download_file(
+                    file_id,
+                    path,
+                    filename,
+                    mime_type,
+                    export=True,
+                )
+            if reason not in [
+                "downloadQuotaExceeded",
+                "dailyLimitExceeded",
+            ]:
+                raise err
+            if self.use_sa:
+                if self.sa_count >= self.sa_number:
+                    LOGGER.info(
+                        f"Reached maximum number of service accounts switching, which is {self.sa_count}",
                     )
-                    if "fileNotDownloadable" in reason and "document" in mime_type:
-                        return self._download_file(
-                            file_id,
-                            path,
-                            filename,
-                            mime_type,
-                            True,
-                        )
-                    if reason not in [
-                        "downloadQuotaExceeded",
-                        "dailyLimitExceeded",
-                    ]:
-                        raise err
-                    if self.use_sa:
-                        if self.sa_count >= self.sa_number:
-                            LOGGER.info(
-                                f"Reached maximum number of service accounts switching, which is {self.sa_count}",
-                            )
-                            raise err
-                        if self.listener.is_cancelled:
-                            return None
-                        self.switch_service_account()
-                        LOGGER.info(f"Got: {reason}, Trying Again...")
-                        return self._download_file(
-                            file_id,
-                            path,
-                            filename,
-                            mime_type,
-                        )
-                    LOGGER.error(f"Got: {reason}")
                     raise err
-        self.file_processed_bytes = 0
+                if self.listener.is_cancelled:
+                    return None
+                self.switch_service_account(reason)
+                LOGGER.info(f"Got: {reason}, Trying Again...")
+                return self._download_file(
+                    file_id,
+                    path,
+                    filename,
+                    mime_type,
+                    size,
+                )
+            LOGGER.error(f"Got: {reason}")
+            raise err
         return None
+
+    def _download_ranges(self, file_id, file_path, size):
+        """Downloads a file in ``SEGMENT_SIZE`` HTTP ranges, fetching up to
+        ``SEGMENT_WORKERS`` ranges at once.
+
+        Completed ranges are recorded in a ``.parts`` journal next to the
+        file, so a retried or restarted download only fetches the missing
+        ranges. The journal is removed once the file is complete.
+        """
+        journal_path = f"{file_path}.parts"
+        done = set()
+        if ospath.exists(journal_path) and ospath.exists(file_path):
+            with open(journal_path) as f:
+                done = {int(line) for line in f if line.endswith("\n")}
+        elif ospath.exists(file_path) and ospath.getsize(file_path) == size:
+            self._set_progress(file_path, size)
+            return
+        segments = []
+        done_bytes = 0
+        for segment in range(-(-size // SEGMENT_SIZE)):
+            if segment in done:
+                done_bytes += min(SEGMENT_SIZE, size - segment * SEGMENT_SIZE)
+            else:
+                segments.append(segment)
+        self._set_progress(file_path, done_bytes)
+        fd = osopen(file_path, O_WRONLY | O_CREAT)
+        journal_lock = Lock()
+
+        def fetch(segment):
+            segment_end = min((segment + 1) * SEGMENT_SIZE, size)
+            for start in range(segment * SEGMENT_SIZE, segment_end, READ_SIZE):
+                if self.listener.is_cancelled:
+                    return
+                data = self._get_range(
+                    file_id, start, min(start + READ_SIZE, segment_end) - 1
+                )
+                pwrite(fd, data, start)
+                self._add_progress(file_path, len(data))
+            with journal_lock:
+                journal.write(f"{segment}\n")
+                journal.flush()
+
+        try:
+            ftruncate(fd, size)
+            with open(journal_path, "a") as journal:
+                if segments:
+                    with ThreadPoolExecutor(
+                        max_workers=min(SEGMENT_WORKERS, len(segments)),
+                    ) as executor:
+                        list(executor.map(fetch, segments))
+        finally:
+            osclose(fd)
+        if not self.listener.is_cancelled:
+            remove(journal_path)
+
+    def _get_range(self, file_id, start, end):
+        service = (
+            get_service(self.credential_file, self._OAUTH_SCOPE)
+            if self.credential_file
+            else self.service
+        )
+        retries = 0
+        while True:
+            request = service.files().get_media(
+                fileId=file_id,
+                supportsAllDrives=True,
+                acknowledgeAbuse=True,
+            )
+            request.headers["Range"] = f"bytes={start}-{end}"
+            try:
+                return request.execute()
+            except HttpError as err:
+                if err.resp.status not in [500, 502, 503, 504, 429] or retries >= 10:
+                    raise
+                retries += 1
+                sleep(min(2**retries, 30))
+
+    def _download_media(self, file_id, file_path):
+        """Streams a file of unknown size, such as an empty file or a Google
+        Workspace document, in one request. Documents fail here with
+        ``fileNotDownloadable`` and are exported by the caller.
+        """
+        request = self.service.files().get_media(
+            fileId=file_id,
+            supportsAllDrives=True,
+            acknowledgeAbuse=True,
+        )
+        with FileIO(file_path, "wb") as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=SEGMENT_SIZE)
+            done = False
+            while not done:
+                if self.listener.is_cancelled:
+                    return
+                status, done = downloader.next_chunk(num_retries=10)
+                if status is not None:
+                    self._set_progress(file_path, status.resumable_progress)
+
+    def _set_progress(self, file_path, size):
+        """Sets the downloaded bytes of a file, so a retried file is counted
+        from what is already on disk instead of being added again.
+        """
+        with self._lock:
+            self._file_progress[file_path] = size
+
+    def _add_progress(self, file_path, size):
+        with self._lock:
+            self._file_progress[file_path] = (
+                self._file_progress.get(file_path, 0) + size
+            )
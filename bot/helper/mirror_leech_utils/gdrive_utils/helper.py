@@ -1,13 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from logging import ERROR, getLogger
 from os import listdir
 from os import path as ospath
 from pickle import load as pload
+from queue import Empty, SimpleQueue
 from random import randrange
 from re import search as re_search
+from threading import Lock, local
+from time import sleep, time
 from urllib.parse import parse_qs, urlparse
 
+from cachetools import TTLCache
 from google.oauth2 import service_account
-from google_auth_httplib2 import AuthorizedHttp
+from google_auth_httplib2 import AuthorizedHttp, Request
 from googleapiclient.discovery import build
 from googleapiclient.http import build_http
 from tenacity import (
@@ -23,6 +29,76 @@ from bot.helper.ext_utils.links_utils import is_gdrive_id
 LOGGER = getLogger(__name__)
 getLogger("googleapiclient.discovery").setLevel(ERROR)
 
+SA_QUOTA_COOLDOWN = 3600
+TOKEN_REFRESH_MARGIN = 300
+FOLDER_CACHE_TTL = 300
+TRANSFER_CACHE_AGE = 30
+
+_credentials = {}
+_credentials_lock = Lock()
+_thread_services = local()
+_write_buckets = {}
+_write_buckets_lock = Lock()
+exhausted_accounts = {}
+_folder_cache = TTLCache(maxsize=20000, ttl=FOLDER_CACHE_TTL)
+_metadata_cache = TTLCache(maxsize=20000, ttl=FOLDER_CACHE_TTL)
+_cache_lock = Lock()
+
+
+def _get_credentials(credential_file, scopes):
+    key = (credential_file, ospath.getmtime(credential_file))
+    with _credentials_lock:
+        if key not in _credentials:
+            for old_key in [k for k in _credentials if k[0] == credential_file]:
+                del _credentials[old_key]
+            if credential_file.startswith("accounts/"):
+                credentials = service_account.Credentials.from_service_account_file(
+                    credential_file,
+                    scopes=scopes,
+                )
+            else:
+                with open(credential_file, "rb") as f:
+                    credentials = pload(f)
+            _credentials[key] = (credentials, Lock())
+        credentials, lock = _credentials[key]
+    with lock:
+        expiry = getattr(credentials, "expiry", None)
+        if not credentials.valid or (
+            expiry and expiry.timestamp() - time() < TOKEN_REFRESH_MARGIN
+        ):
+            try:
+                credentials.refresh(Request(build_http()))
+            except Exception as e:
+                LOGGER.error(f"Failed to refresh {credential_file}: {e}")
+    return key, credentials
+
+
+def get_service(credential_file, scopes):
+    """Returns a Drive v3 service authorized with a credential file.
+
+    Credentials are loaded once per file (again if the file changes) and
+    refreshed before they expire. Built services are cached per thread,
+    since their ``Http`` objects must not be shared between threads.
+
+    Args:
+        credential_file: Path of token.pickle or of a service account json.
+        scopes: OAuth scopes requested for service accounts.
+
+    Returns:
+        The authorized Drive service.
+    """
+    key, credentials = _get_credentials(credential_file, scopes)
+    services = _thread_services.__dict__.setdefault("services", {})
+    if (service := services.get(credential_file)) is None or service[0] != key:
+        authorized_http = AuthorizedHttp(credentials, http=build_http())
+        authorized_http.http.disable_ssl_certificate_validation = True
+        service = (
+            key,
+            build("drive", "v3", http=authorized_http, cache_discovery=False),
+        )
+        services[credential_file] = service
+    return service[1]
+
 
 class GoogleDriveHelper:
     def __init__(self):
@@ -51,6 +127,10 @@ class GoogleDriveHelper:
         self.status = None
         self.update_interval = 3
         self.use_sa = Config.USE_SERVICE_ACCOUNTS
+        self.credential_file = ""
+        self.workers = []
+        self._lock = Lock()
+        self._failed = False
 
     @property
     def speed(self):
@@ -64,48 +144,135 @@ class GoogleDriveHelper:
         return self.proc_bytes
 
     async def progress(self):
-        if self.status is not None:
-            chunk_size = (
-                self.status.total_size * self.status.progress()
-                - self.file_processed_bytes
-            )
-            self.file_processed_bytes = (
-                self.status.total_size * self.status.progress()
-            )
-            self.proc_bytes += chunk_size
+        active = False
+        with self._lock:
+            for obj in [self, *self.workers]:
+                if (status := obj.status) is not None:
+                    active = True
+                    file_processed_bytes = status.total_size * status.progress()
+                    chunk_size = file_processed_bytes - obj.file_processed_bytes
+                    obj.file_processed_bytes = file_processed_bytes
+                    self.proc_bytes += chunk_size
+        if active:
             self.total_time += self.update_interval
 
+    def run_workers(self, jobs, handler):
+        """Runs ``handler(worker, job)`` for every job on a pool of
+        ``GDRIVE_WORKERS`` threads.
+
+        Every worker is a copy of this helper with its own Drive service
+        and, with service accounts, starts on a different account, so it
+        can switch accounts on its own. Handlers update shared counters of
+        this helper under its lock. The first error stops the remaining
+        workers and is raised once all of them have returned.
+
+        Args:
+            jobs: The list of jobs.
+            handler: Callable run in a worker thread for each job.
+        """
+        queue = SimpleQueue()
+        for job in jobs:
+            queue.put(job)
+        workers = max(min(Config.GDRIVE_WORKERS, len(jobs)), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._worker_loop, index, queue, handler)
+                for index in range(workers)
+            ]
+        for future in futures:
+            future.result()
+
+    def _worker_loop(self, index, queue, handler):
+        worker = copy(self)
+        worker.status = None
+        worker.file_processed_bytes = 0
+        if self.use_sa:
+            worker.sa_index = (self.sa_index + index) % self.sa_number
+            worker.sa_count = 1
+        worker.service = worker.authorize()
+        with self._lock:
+            self.workers.append(worker)
+        while not self.listener.is_cancelled and not self._failed:
+            try:
+                job = queue.get_nowait()
+            except Empty:
+                break
+            try:
+                handler(worker, job)
+            except Exception:
+                self._failed = True
+                raise
+
+    def wait_write_slot(self):
+        """Waits for a token of the write bucket of this credential.
+
+        Every credential has a bucket of ``GDRIVE_WRITE_BURST`` tokens that
+        refills at ``GDRIVE_WRITE_RATE`` tokens per second, so parallel
+        workers and tasks can create files in bursts and stay under the
+        per-user write rate limit of Drive over time.
+        """
+        if (rate := Config.GDRIVE_WRITE_RATE) <= 0:
+            return
+        burst = max(Config.GDRIVE_WRITE_BURST, 1)
+        with _write_buckets_lock:
+            now = time()
+            tokens, updated_at = _write_buckets.get(
+                self.credential_file, (burst, now)
+            )
+            tokens = min(burst, tokens + (now - updated_at) * rate) - 1
+            _write_buckets[self.credential_file] = (tokens, now)
+        if tokens < 0:
+            sleep(-tokens / rate)
+
+    def _quota_kind(self):
+        if self.is_uploading:
+            return "upload"
+        if self.is_downloading:
+            return "download"
+        if self.is_cloning:
+            return "clone"
+        return ""
+
+    def _usable_account(self, index, json_files):
+        now = time()
+        kind = self._quota_kind()
+        for offset in range(self.sa_number):
+            i = (index + offset) % self.sa_number
+            if exhausted_accounts.get((json_files[i], kind), 0) <= now:
+                return i
+        return index % self.sa_number
+
     def authorize(self):
-        credentials = None
         if self.use_sa:
-            json_files = listdir("accounts")
+            json_files = sorted(listdir("accounts"))
             self.sa_number = len(json_files)
-            self.sa_index = randrange(self.sa_number)
+            if self.service is None:
+                self.sa_index = randrange(self.sa_number)
+            self.sa_index = self._usable_account(self.sa_index, json_files)
             LOGGER.info(
                 f"Authorizing with {json_files[self.sa_index]} service account",
             )
-            credentials = service_account.Credentials.from_service_account_file(
-                f"accounts/{json_files[self.sa_index]}",
-                scopes=self._OAUTH_SCOPE,
-            )
-        elif ospath.exists(self.token_path):
+            self.credential_file = f"accounts/{json_files[self.sa_index]}"
+            return get_service(self.credential_file, self._OAUTH_SCOPE)
+        if ospath.exists(self.token_path):
             LOGGER.info(f"Authorize with {self.token_path}")
-            with open(self.token_path, "rb") as f:
-                credentials = pload(f)
-        else:
-            LOGGER.error("token.pickle not found!")
-        authorized_http = AuthorizedHttp(credentials, http=build_http())
+            self.credential_file = self.token_path
+            return get_service(self.token_path, self._OAUTH_SCOPE)
+        LOGGER.error("token.pickle not found!")
+        authorized_http = AuthorizedHttp(None, http=build_http())
         authorized_http.http.disable_ssl_certificate_validation = True
         return build("drive", "v3", http=authorized_http, cache_discovery=False)
 
-    def switch_service_account(self):
-        if self.sa_index == self.sa_number - 1:
-            self.sa_index = 0
-        else:
-            self.sa_index += 1
+    def switch_service_account(self, reason=""):
+        json_files = sorted(listdir("accounts"))
+        if reason and self.sa_index < len(json_files):
+            exhausted_accounts[(json_files[self.sa_index], self._quota_kind())] = (
+                time() + SA_QUOTA_COOLDOWN
+            )
+        self.sa_index = (self.sa_index + 1) % self.sa_number
         self.sa_count += 1
-        LOGGER.info(f"Switching to {self.sa_index} index")
         self.service = self.authorize()
+        LOGGER.info(f"Switching to {self.sa_index} index")
 
     def get_id_from_url(self, link, user_id=""):
         if user_id and link.startswith("mtp:"):
@@ -163,30 +330,174 @@ class GoogleDriveHelper:
             .execute()
         )
 
+    def _cache_key(self, file_id):
+        return ("accounts" if self.use_sa else self.token_path, file_id)
+
+    def invalidate_folder(self, folder_id):
+        """Drops the cached listing of a folder the bot has just changed."""
+        with _cache_lock:
+            _folder_cache.pop(self._cache_key(folder_id), None)
+
+    def get_files_by_folder_id(self, folder_id, item_type=""):
+        """Returns the items of a folder, ordered by folder first, then name.
+
+        Listings are cached for ``FOLDER_CACHE_TTL`` seconds per folder and
+        credential kind, so count, clone, download and list of the same
+        folder share one walk.
+
+        Args:
+            folder_id: The id of the folder.
+            item_type: "folders", "files" or empty for both.
+
+        Returns:
+            The list of file resources.
+        """
+        files = self._get_folder(self.service, folder_id)
+        if item_type == "folders":
+            return [f for f in files if f["mimeType"] == self.G_DRIVE_DIR_MIME_TYPE]
+        if item_type:
+            return [f for f in files if f["mimeType"] != self.G_DRIVE_DIR_MIME_TYPE]
+        return files
+
+    def get_folder_tree(
+        self,
+        folder_id,
+        follow_shortcuts=False,
+        max_age=FOLDER_CACHE_TTL,
+    ):
+        """Lists a folder and all of its subfolders.
+
+        Each level of the tree is listed with up to ``GDRIVE_WORKERS``
+        folders in parallel, reusing cached listings.
+
+        Args:
+            folder_id: The id of the top folder.
+            follow_shortcuts: Also list the targets of folder shortcuts.
+            max_age: Cached listings older than this many seconds are
+                listed again. Transfers pass ``TRANSFER_CACHE_AGE``, so they
+                only reuse the walk of the count that just ran before them
+                and don't miss changes made outside the bot.
+
+        Returns:
+            A dict of folder id to its list of items, in breadth-first order.
+        """
+        tree = {}
+        level = [folder_id]
+        with ThreadPoolExecutor(
+            max_workers=max(Config.GDRIVE_WORKERS, 1)
+        ) as executor:
+            while level:
+                level = [f for f in dict.fromkeys(level) if f not in tree]
+                if len(level) == 1:
+                    results = [self._get_folder(self.service, level[0], max_age)]
+                else:
+                    results = executor.map(
+                        self._get_folder_threaded,
+                        level,
+                        [max_age] * len(level),
+                    )
+                next_level = []
+                for parent, files in zip(level, results, strict=True):
+                    tree[parent] = files
+                    for file in files:
+                        if file["mimeType"] == self.G_DRIVE_DIR_MIME_TYPE:
+                            next_level.append(file["id"])
+                        elif (
+                            follow_shortcuts
+                            and (details := file.get("shortcutDetails"))
+                            and details["targetMimeType"]
+                            == self.G_DRIVE_DIR_MIME_TYPE
+                        ):
+                            next_level.append(details["targetId"])
+                level = next_level
+        return tree
+
+    def get_shortcut_targets(self, files):
+        """Returns metadata of the targets of file shortcuts among ``files``.
+
+        Targets missing from the cache are fetched with batch requests.
+
+        Returns:
+            A dict of target id to its metadata.
+        """
+        targets = {}
+        missing = []
+        for file in files:
+            details = file.get("shortcutDetails")
+            if (
+                details is None
+                or details["targetMimeType"] == self.G_DRIVE_DIR_MIME_TYPE
+            ):
+                continue
+            with _cache_lock:
+                meta = _metadata_cache.get(self._cache_key(details["targetId"]))
+            if meta is not None:
+                targets[details["targetId"]] = meta
+            else:
+                missing.append(details["targetId"])
+        missing = list(dict.fromkeys(missing))
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                targets[request_id] = response
+
+        for i in range(0, len(missing), 100):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for target_id in missing[i : i + 100]:
+                batch.add(
+                    self.service.files().get(
+                        fileId=target_id,
+                        supportsAllDrives=True,
+                        fields="name, id, mimeType, size",
+                    ),
+                    request_id=target_id,
+                )
+            batch.execute()
+        for target_id in missing:
+            if target_id not in targets:
+                targets[target_id] = self.get_file_metadata(target_id)
+            with _cache_lock:
+                _metadata_cache[self._cache_key(target_id)] = targets[target_id]
+        return targets
+
+    def _get_folder_threaded(self, folder_id, max_age=FOLDER_CACHE_TTL):
+        service = (
+            get_service(self.credential_file, self._OAUTH_SCOPE)
+            if self.credential_file
+            else self.service
+        )
+        return self._get_folder(service, folder_id, max_age)
+
+    def _get_folder(self, service, folder_id, max_age=FOLDER_CACHE_TTL):
+        key = self._cache_key(folder_id)
+        with _cache_lock:
+            cached = _folder_cache.get(key)
+        if cached is not None and time() - cached[0] < max_age:
+            return cached[1]
+        listed_at = time()
+        files = self._fetch_folder_listing(service, folder_id)
+        with _cache_lock:
+            _folder_cache[key] = (listed_at, files)
+        return files
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(3),
         retry=retry_if_exception_type(Exception),
     )
-    def get_files_by_folder_id(self, folder_id, item_type=""):
+    def _fetch_folder_listing(self, service, folder_id):
         page_token = None
         files = []
-        if not item_type:
-            q = f"'{folder_id}' in parents and trashed = false"
-        elif item_type == "folders":
-            q = f"'{folder_id}' in parents and mimeType = '{self.G_DRIVE_DIR_MIME_TYPE}' and trashed = false"
-        else:
-            q = f"'{folder_id}' in parents and mimeType != '{self.G_DRIVE_DIR_MIME_TYPE}' and trashed = false"
         while True:
             response = (
-                self.service.files()
+                service.files()
                 .list(
                     supportsAllDrives=True,
                     includeItemsFromAllDrives=True,
-                    q=q,
+                    q=f"'{folder_id}' in parents and trashed = false",
                     spaces="drive",
-                    pageSize=200,
-                    fields="nextPageToken, files(id, name, mimeType, size, shortcutDetails)",
+                    pageSize=1000,
+                    fields="nextPageToken, files(id, name, mimeType, size, shortcutDetails(targetId, targetMimeType))",
                     orderBy="folder, name",
                     pageToken=page_token,
                 )
@@ -216,6 +527,8 @@ class GoogleDriveHelper:
             .create(body=file_metadata, supportsAllDrives=True)
             .execute()
         )
+        if dest_id is not None:
+            self.invalidate_folder(dest_id)
         file_id = file.get("id")
         if not Config.IS_TEAM_DRIVE:
             self.set_permission(file_id)
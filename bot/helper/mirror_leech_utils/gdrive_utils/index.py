@@ -0,0 +1,348 @@
+from bisect import bisect_left
+from json import dump, load
+from logging import getLogger
+from os import makedirs, replace
+from os import path as ospath
+from re import findall
+from threading import Lock, Thread
+from time import time
+from typing import ClassVar
+
+from googleapiclient.errors import HttpError
+
+LOGGER = getLogger(__name__)
+
+INDEX_DIR = "gdrive_index"
+SYNC_INTERVAL = 15
+SAVE_INTERVAL = 300
+G_DRIVE_DIR_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+def _words(text):
+    return findall(r"\w+", text.lower())
+
+
+class GoogleDriveIndex:
+    """Local metadata index of a shared drive or of the files owned in My Drive.
+
+    The first use starts listing the whole drive in a background thread and
+    saves a Changes API start page token, while searches fall back to live
+    queries. Once built, the index only applies ``changes.list`` since that
+    token, at most once every ``SYNC_INTERVAL`` seconds, so exact-name and
+    token searches are answered from memory. The index and its page token
+    are saved under ``INDEX_DIR`` at most once every ``SAVE_INTERVAL``
+    seconds and survive restarts.
+    """
+
+    _indexes: ClassVar[dict] = {}
+    _indexes_lock = Lock()
+
+    def __init__(self, key, drive_id):
+        self.key = key
+        self.drive_id = drive_id
+        self.files = {}
+        self.page_token = None
+        self.synced_at = 0
+        self.saved_at = 0
+        self._dirty = False
+        self._names = {}
+        self._tokens = {}
+        self._sorted_tokens = None
+        self._lock = Lock()
+        self._builder = None
+        self._loaded = False
+        self._path = ospath.join(INDEX_DIR, f"{key}.json")
+
+    @classmethod
+    def get(cls, key, drive_id):
+        """Returns the index stored under ``key``, creating it if needed.
+
+        Args:
+            key: Name of the index, unique per drive and credential.
+            drive_id: The shared drive id, or "root" for My Drive.
+
+        Returns:
+            The GoogleDriveIndex instance.
+        """
+        with cls._indexes_lock:
+            if key not in cls._indexes:
+                cls._indexes[key] = cls(key, drive_id)
+            return cls._indexes[key]
+
+    def search(
+        self, service, new_service, name, exact=False, item_type="", limit=150
+    ):
+        """Searches the index after applying pending changes.
+
+        Args:
+            service: An authorized Drive v3 service.
+            new_service: Returns an authorized Drive v3 service for the
+                thread that builds the index.
+            name: The file name, or space separated search keys.
+            exact: Match the whole name instead of every key as a word prefix,
+                like ``name =`` and ``name contains`` of the Drive API.
+            item_type: "files", "folders" or empty for both.
+            limit: Maximum number of returned files.
+
+        Returns:
+            A list of file resources ordered by folder first, then name, or
+            None while the index is being built.
+        """
+        with self._lock:
+            if not self._sync(service, new_service):
+                return None
+            if exact:
+                ids = self._names.get(name, set())
+            else:
+                ids = None
+                for word in _words(name):
+                    matches = self._prefix_ids(word)
+                    ids = matches if ids is None else ids & matches
+                    if not ids:
+                        break
+                ids = ids or set()
+            files = []
+            for file_id in ids:
+                file = self.files[file_id]
+                is_folder = file["mimeType"] == G_DRIVE_DIR_MIME_TYPE
+                if (item_type == "files" and is_folder) or (
+                    item_type == "folders" and not is_folder
+                ):
+                    continue
+                files.append(file)
+            self._save_if_due()
+        files.sort(
+            key=lambda f: (
+                f["mimeType"] != G_DRIVE_DIR_MIME_TYPE,
+                f["name"].lower(),
+            ),
+        )
+        return files[:limit]
+
+    def _prefix_ids(self, word):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens)
+        ids = set()
+        index = bisect_left(self._sorted_tokens, word)
+        while index < len(self._sorted_tokens) and self._sorted_tokens[
+            index
+        ].startswith(word):
+            ids |= self._tokens[self._sorted_tokens[index]]
+            index += 1
+        return ids
+
+    def _sync(self, service, new_service):
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+        if self.page_token is None:
+            self._start_build(new_service)
+            return False
+        if time() - self.synced_at >= SYNC_INTERVAL:
+            try:
+                self._apply_changes(service)
+            except HttpError as err:
+                if err.resp.status not in (404, 410):
+                    raise
+                LOGGER.info(f"Page token of Google Drive index {self.key} expired")
+                self._clear()
+                self.page_token = None
+                self._start_build(new_service)
+                return False
+        return True
+
+    def _start_build(self, new_service):
+        if self._builder is not None:
+            return
+        self._builder = Thread(
+            target=self._run_build,
+            args=(new_service,),
+            name=f"gdrive-index-{self.key}",
+            daemon=True,
+        )
+        self._builder.start()
+
+    def _run_build(self, new_service):
+        fresh = GoogleDriveIndex(self.key, self.drive_id)
+        try:
+            fresh._build(new_service())
+            fresh._save()
+        except Exception as e:
+            LOGGER.error(f"Failed to build Google Drive index {self.key}: {e}")
+            with self._lock:
+                self._builder = None
+            return
+        with self._lock:
+            self.files = fresh.files
+            self._names = fresh._names
+            self._tokens = fresh._tokens
+            self._sorted_tokens = fresh._sorted_tokens
+            self.page_token = fresh.page_token
+            self.synced_at = fresh.synced_at
+            self.saved_at = fresh.saved_at
+            self._dirty = False
+            self._builder = None
+
+    def _drive_kwargs(self):
+        if self.drive_id == "root":
+            return {}
+        return {"driveId": self.drive_id, "supportsAllDrives": True}
+
+    def _build(self, service):
+        LOGGER.info(f"Building Google Drive index: {self.key}")
+        page_token = (
+            service.changes().getStartPageToken(**self._drive_kwargs()).execute()
+        )["startPageToken"]
+        self._clear()
+        if self.drive_id == "root":
+            kwargs = {"q": "'me' in owners and trashed = false"}
+        else:
+            kwargs = {
+                "q": "trashed = false",
+                "driveId": self.drive_id,
+                "corpora": "drive",
+                "supportsAllDrives": True,
+                "includeItemsFromAllDrives": True,
+            }
+        next_page = None
+        while True:
+            response = (
+                service.files()
+                .list(
+                    spaces="drive",
+                    pageSize=1000,
+                    fields="nextPageToken, files(id, name, mimeType, size, parents)",
+                    pageToken=next_page,
+                    **kwargs,
+                )
+                .execute()
+            )
+            for file in response.get("files", []):
+                self._add(file)
+            next_page = response.get("nextPageToken")
+            if next_page is None:
+                break
+        self.page_token = page_token
+        self.synced_at = time()
+        LOGGER.info(f"Indexed {len(self.files)} files of Google Drive: {self.key}")
+
+    def _apply_changes(self, service):
+        changed = False
+        page_token = self.page_token
+        while page_token is not None:
+            response = (
+                service.changes()
+                .list(
+                    pageToken=page_token,
+                    spaces="drive",
+                    pageSize=1000,
+                    includeRemoved=True,
+                    includeItemsFromAllDrives=self.drive_id != "root",
+                    fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, size, parents, trashed, driveId, ownedByMe))",
+                    **self._drive_kwargs(),
+                )
+                .execute()
+            )
+            for change in response.get("changes", []):
+                if "fileId" not in change:
+                    continue
+                changed = True
+                file = change.get("file")
+                if (
+                    change.get("removed")
+                    or file is None
+                    or file.get("trashed")
+                    or (self.drive_id == "root" and not file.get("ownedByMe"))
+                    or (
+                        self.drive_id != "root"
+                        and file.get("driveId") != self.drive_id
+                    )
+                ):
+                    self._remove(change["fileId"])
+                else:
+                    self._add(file)
+            if "newStartPageToken" in response:
+                self.page_token = response["newStartPageToken"]
+            page_token = response.get("nextPageToken")
+        self.synced_at = time()
+        if changed:
+            self._dirty = True
+
+    def _clear(self):
+        self.files.clear()
+        self._names.clear()
+        self._tokens.clear()
+        self._sorted_tokens = None
+
+    def _add(self, file):
+        file_id = file["id"]
+        self._remove(file_id)
+        file = {
+            "id": file_id,
+            "name": file.get("name", ""),
+            "mimeType": file.get("mimeType", ""),
+            "size": file.get("size", "0"),
+            "parents": file.get("parents", []),
+        }
+        self.files[file_id] = file
+        self._names.setdefault(file["name"], set()).add(file_id)
+        for word in set(_words(file["name"])):
+            if word not in self._tokens:
+                self._tokens[word] = set()
+                self._sorted_tokens = None
+            self._tokens[word].add(file_id)
+
+    def _remove(self, file_id):
+        if (file := self.files.pop(file_id, None)) is None:
+            return
+        if (ids := self._names.get(file["name"])) is not None:
+            ids.discard(file_id)
+            if not ids:
+                del self._names[file["name"]]
+        for word in set(_words(file["name"])):
+            if (ids := self._tokens.get(word)) is not None:
+                ids.discard(file_id)
+                if not ids:
+                    del self._tokens[word]
+                    self._sorted_tokens = None
+
+    def _load(self):
+        if not ospath.exists(self._path):
+            return
+        try:
+            with open(self._path) as f:
+                data = load(f)
+        except Exception as e:
+            LOGGER.error(f"Failed to load Google Drive index {self.key}: {e}")
+            return
+        self._clear()
+        for file in data["files"]:
+            self._add(file)
+        self.page_token = data["page_token"]
+        self.saved_at = time()
+
+    def _save_if_due(self):
+        if self._dirty and time() - self.saved_at >= SAVE_INTERVAL:
+            try:
+                self._save()
+            except OSError as e:
+                LOGGER.error(f"Failed to save Google Drive index {self.key}: {e}")
+
+    def _save(self):
+        makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            dump(
+                {"page_token": self.page_token, "files": list(self.files.values())},
+                f,
+            )
+        replace(tmp_path, self._path)
+        self.saved_at = time()
+        self._dirty = False
+
+    def reset(self):
+        """Drops the index, so the next search lists the drive again."""
+        with self._lock:
+            self._clear()
+            self.page_token = None
+            self.synced_at = 0
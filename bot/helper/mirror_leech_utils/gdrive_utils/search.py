@@ -1,8 +1,14 @@
+from functools import partial
 from logging import getLogger
+from os import path as ospath
 
 from bot import drives_ids, drives_names, index_urls, user_data
 from bot.helper.ext_utils.status_utils import get_readable_file_size
-from bot.helper.mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
+from bot.helper.mirror_leech_utils.gdrive_utils.helper import (
+    GoogleDriveHelper,
+    get_service,
+)
+from bot.helper.mirror_leech_utils.gdrive_utils.index import GoogleDriveIndex
 
 LOGGER = getLogger(__name__)
 
@@ -21,7 +27,39 @@ class GoogleDriveSearch(GoogleDriveHelper):
         self._is_recursive = is_recursive
         self._item_type = item_type
 
-    def _drive_query(self, dir_id, file_name, is_recursive):
+    def _get_index(self, dir_id):
+        if dir_id == "root" and self.use_sa:
+            return None
+        credential = (
+            "accounts"
+            if self.use_sa
+            else ospath.splitext(ospath.basename(self.token_path))[0]
+        )
+        return GoogleDriveIndex.get(f"{dir_id}_{credential}", dir_id)
+
+    def _index_query(self, dir_id, key):
+        if (index := self._get_index(dir_id)) is None:
+            return None
+        try:
+            files = index.search(
+                self.service,
+                partial(get_service, self.credential_file, self._OAUTH_SCOPE),
+                key,
+                exact=self._stop_dup,
+                item_type="" if self._stop_dup else self._item_type,
+                limit=200 if dir_id == "root" else 150,
+            )
+        except Exception as err:
+            err = str(err).replace(">", "").replace("<", "")
+            LOGGER.error(f"Google Drive index unavailable, querying Drive: {err}")
+            return None
+        if files is None:
+            return None
+        return {"files": files}
+
+    def _drive_query(self, dir_id, file_name, is_recursive, key=""):
+        if is_recursive and key and (response := self._index_query(dir_id, key)):
+            return response
         try:
             if is_recursive:
                 if self._stop_dup:
@@ -98,7 +136,8 @@ class GoogleDriveSearch(GoogleDriveHelper):
 
     def drive_list(self, file_name, target_id="", user_id=""):
         msg = ""
-        file_name = self.escapes(str(file_name))
+        key = str(file_name).strip()
+        file_name = self.escapes(key)
         contents_no = 0
         telegraph_content = []
         Title = False
@@ -128,7 +167,7 @@ class GoogleDriveSearch(GoogleDriveHelper):
                 if self._is_recursive and len(dir_id) > 23
                 else self._is_recursive
             )
-            response = self._drive_query(dir_id, file_name, isRecur)
+            response = self._drive_query(dir_id, file_name, isRecur, key)
             if not response["files"]:
                 if self._no_multi:
                     break
@@ -20,6 +20,8 @@ from bot.helper.mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
 
 LOGGER = getLogger(__name__)
 
+SIMPLE_UPLOAD_SIZE = 5 * 1024 * 1024
+
 
 class GoogleDriveUpload(GoogleDriveHelper):
     def __init__(self, listener, path):
@@ -53,6 +55,7 @@ class GoogleDriveUpload(GoogleDriveHelper):
         try:
             if ospath.isfile(self._path):
                 mime_type = get_mime_type(self._path)
+                size = ospath.getsize(self._path)
                 link = self._upload_file(
                     self._path,
                     self.listener.name,
@@ -64,6 +67,9 @@ class GoogleDriveUpload(GoogleDriveHelper):
                     return
                 if link is None:
                     raise ValueError("Upload has been manually cancelled")
+                if size <= SIMPLE_UPLOAD_SIZE:
+                    with self._lock:
+                        self.proc_bytes += size
                 LOGGER.info(f"Uploaded To G-Drive: {self._path}")
             else:
                 mime_type = "Folder"
@@ -113,33 +119,37 @@ class GoogleDriveUpload(GoogleDriveHelper):
         return
 
     def _upload_dir(self, input_directory, dest_id):
-        list_dirs = listdir(input_directory)
-        if len(list_dirs) == 0:
-            return dest_id
-        new_id = None
-        for item in list_dirs:
+        files = []
+        self._create_tree(input_directory, dest_id, files)
+        if self.listener.is_cancelled:
+            return None
+        if files:
+            self._upload_files(files)
+        return None if self.listener.is_cancelled else dest_id
+
+    def _create_tree(self, input_directory, dest_id, files):
+        for item in listdir(input_directory):
             current_file_name = ospath.join(input_directory, item)
             if ospath.isdir(current_file_name):
                 current_dir_id = self.create_directory(item, dest_id)
-                new_id = self._upload_dir(
-                    current_file_name,
-                    current_dir_id,
-                )
+                self._create_tree(current_file_name, current_dir_id, files)
                 self.total_folders += 1
             else:
-                mime_type = get_mime_type(current_file_name)
-                file_name = current_file_name.split("/")[-1]
-                self._upload_file(
-                    current_file_name,
-                    file_name,
-                    mime_type,
-                    dest_id,
-                )
-                self.total_files += 1
-                new_id = dest_id
+                files.append((current_file_name, item, dest_id))
             if self.listener.is_cancelled:
                 break
-        return new_id
+
+    def _upload_files(self, files):
+        self.run_workers(files, self._upload_job)
+
+    def _upload_job(self, worker, job):
+        file_path, file_name, dest_id = job
+        size = ospath.getsize(file_path)
+        worker._upload_file(file_path, file_name, get_mime_type(file_path), dest_id)
+        with self._lock:
+            self.total_files += 1
+            if size <= SIMPLE_UPLOAD_SIZE:
+                self.proc_bytes += size
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
@@ -162,7 +172,8 @@ class GoogleDriveUpload(GoogleDriveHelper):
         if dest_id is not None:
             file_metadata["parents"] = [dest_id]
 
-        if ospath.getsize(file_path) == 0:
+        self.wait_write_slot()
+        if ospath.getsize(file_path) <= SIMPLE_UPLOAD_SIZE:
             media_body = MediaFileUpload(
                 file_path,
                 mimetype=mime_type,
@@ -174,18 +185,18 @@ class GoogleDriveUpload(GoogleDriveHelper):
                     body=file_metadata,
                     media_body=media_body,
                     supportsAllDrives=True,
+                    fields="id",
                 )
                 .execute()
             )
+            with contextlib.suppress(Exception):
+                remove(file_path)
+            self.invalidate_folder(dest_id)
             if not Config.IS_TEAM_DRIVE:
                 self.set_permission(response["id"])
-
-            drive_file = (
-                self.service.files()
-                .get(fileId=response["id"], supportsAllDrives=True)
-                .execute()
-            )
-            return self.G_DRIVE_BASE_DOWNLOAD_URL.format(drive_file.get("id"))
+            if not in_dir:
+                return self.G_DRIVE_BASE_DOWNLOAD_URL.format(response["id"])
+            return None
         media_body = MediaFileUpload(
             file_path,
             mimetype=mime_type,
@@ -224,7 +235,7 @@ class GoogleDriveUpload(GoogleDriveHelper):
                             raise err
                         if self.listener.is_cancelled:
                             return None
-                        self.switch_service_account()
+                        self.switch_service_account(reason)
                         LOGGER.info(f"Got: {reason}, Trying Again...")
                         return self._upload_file(
                             file_path,
@@ -239,6 +250,7 @@ class GoogleDriveUpload(GoogleDriveHelper):
             return None
         with contextlib.suppress(Exception):
             remove(file_path)
+        self.invalidate_folder(dest_id)
         self.file_processed_bytes = 0
         if not Config.IS_TEAM_DRIVE:
             self.set_permission(response["id"])
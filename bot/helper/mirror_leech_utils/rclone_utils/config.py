@@ -0,0 +1,125 @@
+from configparser import NoSectionError, RawConfigParser
+from types import MappingProxyType
+from typing import ClassVar
+
+from aiofiles import open as aiopen
+from aiofiles.os import listdir, makedirs, stat
+from aiofiles.os import path as aiopath
+
+
+class RcloneConfig:
+    """Registry of parsed rclone config files.
+
+    Each file (the owner ``rclone.conf`` and the per-user
+    ``rclone/{user_id}.conf``) is parsed once and parsed again only when
+    its modification time or size changes. Remote options are handed out
+    as read-only mappings shared by all tasks, so callers must copy them
+    before adding options.
+
+    The service account pool of the ``accounts`` directory is cached the
+    same way, and the ``rclone_sa`` configs built from it are rewritten
+    only when the pool changes.
+    """
+
+    _configs: ClassVar[dict] = {}
+    _sa_configs: ClassVar[dict] = {}
+    _accounts = (None, ())
+
+    @staticmethod
+    async def _signature(path):
+        st = await stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    @classmethod
+    async def _get(cls, config_path):
+        signature = await cls._signature(config_path)
+        cached = cls._configs.get(config_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        config = RawConfigParser()
+        async with aiopen(config_path) as f:
+            config.read_string(await f.read())
+        remotes = MappingProxyType(
+            {
+                section: MappingProxyType(dict(config.items(section)))
+                for section in config.sections()
+            },
+        )
+        cls._configs[config_path] = (signature, remotes)
+        return remotes
+
+    @classmethod
+    async def remotes(cls, config_path):
+        """Returns the remotes of a config file.
+
+        Args:
+            config_path: Path of the rclone config file.
+
+        Returns:
+            A read-only mapping of remote name to its read-only options.
+        """
+        return await cls._get(config_path)
+
+    @classmethod
+    async def remote_options(cls, config_path, remote):
+        """Returns the options of one remote, including its type.
+
+        Raises:
+            NoSectionError: The config file has no such remote.
+        """
+        remotes = await cls._get(config_path)
+        if remote not in remotes:
+            raise NoSectionError(remote)
+        return remotes[remote]
+
+    @classmethod
+    async def service_accounts(cls):
+        """Returns the sorted service account files of ``accounts``.
+
+        Returns:
+            A tuple of file names, empty if the directory doesn't exist.
+        """
+        if not await aiopath.isdir("accounts"):
+            cls._accounts = (None, ())
+            return ()
+        signature = await cls._signature("accounts")
+        if cls._accounts[0] != signature:
+            cls._accounts = (signature, tuple(sorted(await listdir("accounts"))))
+        return cls._accounts[1]
+
+    @classmethod
+    async def service_account_config(cls, remote, remote_opts):
+        """Returns a config with one ``saNNN`` drive remote per service
+        account, pointing to the same drive as ``remote``.
+
+        Args:
+            remote: Name of the drive remote in ``rclone.conf``.
+            remote_opts: Options of that remote.
+
+        Returns:
+            The config path and the number of service accounts, or None if
+            the remote has no team drive or root folder to share.
+        """
+        if gd_id := remote_opts.get("team_drive"):
+            option = "team_drive"
+        elif gd_id := remote_opts.get("root_folder_id"):
+            option = "root_folder_id"
+        else:
+            return None
+        accounts = await cls.service_accounts()
+        if not accounts:
+            return None
+        sa_conf_file = f"rclone_sa/{remote}.conf"
+        key = (accounts, option, gd_id)
+        if cls._sa_configs.get(sa_conf_file) != key or not await aiopath.isfile(
+            sa_conf_file,
+        ):
+            await makedirs("rclone_sa", exist_ok=True)
+            text = "".join(
+                f"[sa{i:03}]\ntype = drive\nscope = drive\nservice_account_file = accounts/{sa}\n{option} = {gd_id}\n\n"
+                for i, sa in enumerate(accounts)
+            )
+            async with aiopen(sa_conf_file, "w") as f:
+                await f.write(text)
+            cls._sa_configs[sa_conf_file] = key
+        return sa_conf_file, len(accounts)
@@ -1,11 +1,11 @@
-from asyncio import Event, gather, wait_for
-from configparser import RawConfigParser
+from asyncio import Event, Semaphore, create_task, gather, wait_for
 from functools import partial
 from json import loads
 from time import time
 
 from aiofiles import open as aiopen
 from aiofiles.os import path as aiopath
+from cachetools import TTLCache
 from pyrogram.filters import regex, user
 from pyrogram.handlers import CallbackQueryHandler
 
@@ -17,6 +17,7 @@ from bot.helper.ext_utils.status_utils import (
     get_readable_file_size,
     get_readable_time,
 )
+from bot.helper.mirror_leech_utils.rclone_utils.config import RcloneConfig
 from bot.helper.telegram_helper.button_build import ButtonMaker
 from bot.helper.telegram_helper.message_utils import (
     delete_message,
@@ -25,6 +26,83 @@ from bot.helper.telegram_helper.message_utils import (
 )
 
 LIST_LIMIT = 6
+LIST_CACHE_TTL = 60
+PREFETCH_LIMIT = 6
+
+_list_cache = TTLCache(maxsize=200, ttl=LIST_CACHE_TTL)
+_list_tasks = {}
+_prefetch_slots = Semaphore(2)
+
+
+async def _run_lsjson(config_path, path, prefetch):
+    if prefetch:
+        async with _prefetch_slots:
+            return await _run_lsjson(config_path, path, False)
+    if (listing := _list_cache.get((config_path, path))) is not None:
+        return listing, ""
+    cmd = [
+        "xone",
+        "lsjson",
+        "--fast-list",
+        "--no-mimetype",
+        "--no-modtime",
+        "--config",
+        config_path,
+        path,
+    ]
+    res, err, code = await cmd_exec(cmd)
+    if code not in [0, -9]:
+        return None, err
+    try:
+        result = sorted(loads(res) if res else [], key=lambda x: x["Path"])
+    except ValueError as e:
+        return None, str(e)
+    listing = {
+        "--dirs-only": tuple(item for item in result if item["IsDir"]),
+        "--files-only": tuple(item for item in result if not item["IsDir"]),
+    }
+    if code == 0:
+        _list_cache[(config_path, path)] = listing
+    return listing, ""
+
+
+def _start_listing(config_path, path, prefetch=False):
+    key = (config_path, path)
+    if (task := _list_tasks.get(key)) is None:
+        task = create_task(_run_lsjson(config_path, path, prefetch))
+        _list_tasks[key] = task
+        task.add_done_callback(lambda _: _list_tasks.pop(key, None))
+    return task
+
+
+async def list_path(config_path, path):
+    """Lists a remote path, with its folders and files sorted by name.
+
+    Listings are cached for ``LIST_CACHE_TTL`` seconds per config and path,
+    and concurrent requests for the same path share one ``lsjson``.
+
+    Returns:
+        A dict of ``--dirs-only`` and ``--files-only`` item tuples and an
+        empty string, or None and the error of rclone.
+    """
+    if (listing := _list_cache.get((config_path, path))) is not None:
+        return listing, ""
+    return await _start_listing(config_path, path)
+
+
+def prefetch_paths(config_path, paths):
+    """Lists paths in the background, a few at a time, so they are cached
+    by the time they are opened.
+    """
+    for path in paths:
+        if (config_path, path) not in _list_cache:
+            _start_listing(config_path, path, prefetch=True)
+
+
+def clear_list_cache(config_path):
+    """Drops the cached listings of a config after its remotes changed."""
+    for key in [key for key in _list_cache if key[0] == config_path]:
+        _list_cache.pop(key, None)
 
 
 @new_task
@@ -196,9 +274,18 @@ class RcloneList:
             self.iter_start = LIST_LIMIT * (pages - 1)
         page = (self.iter_start / LIST_LIMIT) + 1 if self.iter_start != 0 else 1
         buttons = ButtonMaker()
-        for index, idict in enumerate(
-            self.path_list[self.iter_start : LIST_LIMIT + self.iter_start],
-        ):
+        page_items = self.path_list[self.iter_start : LIST_LIMIT + self.iter_start]
+        prefetch_paths(
+            self.config_path,
+            [
+                f"{self.remote}{self.path}/{idict['Path']}"
+                if self.path
+                else f"{self.remote}{idict['Path']}"
+                for idict in page_items[:PREFETCH_LIMIT]
+                if idict["IsDir"]
+            ],
+        )
+        for index, idict in enumerate(page_items):
             orig_index = index + self.iter_start
             name = idict["Path"]
             if name in self.selected_pathes or any(
@@ -275,54 +362,32 @@ class RcloneList:
             self.item_type = "--dirs-only"
         elif itype:
             self.item_type = itype
-        cmd = [
-            "xone",
-            "lsjson",
-            self.item_type,
-            "--fast-list",
-            "--no-mimetype",
-            "--no-modtime",
-            "--config",
-            self.config_path,
-            f"{self.remote}{self.path}",
-        ]
         if self.listener.is_cancelled:
             return
-        res, err, code = await cmd_exec(cmd)
-        if code in [0, -9]:
-            result = loads(res)
-            if (
-                len(result) == 0
-                and itype != self.item_type
-                and self.list_status == "rcd"
-            ):
-                itype = (
-                    "--dirs-only"
-                    if self.item_type == "--files-only"
-                    else "--files-only"
-                )
-                self.item_type = itype
-                await self.get_path(itype)
-            else:
-                self.path_list = sorted(result, key=lambda x: x["Path"])
-                self.iter_start = 0
-                await self.get_path_buttons()
-        else:
+        listing, err = await list_path(self.config_path, f"{self.remote}{self.path}")
+        if listing is None:
             LOGGER.error(
                 f"While rclone listing. Path: {self.remote}{self.path}. Stderr: {err}",
             )
             self.remote = err[:4000]
             self.path = ""
             self.event.set()
+            return
+        if (
+            not listing[self.item_type]
+            and itype != self.item_type
+            and self.list_status == "rcd"
+        ):
+            self.item_type = (
+                "--dirs-only" if self.item_type == "--files-only" else "--files-only"
+            )
+        self.path_list = listing[self.item_type]
+        self.iter_start = 0
+        await self.get_path_buttons()
 
     async def list_remotes(self):
-        config = RawConfigParser()
-        async with aiopen(self.config_path) as f:
-            contents = await f.read()
-            config.read_string(contents)
-        if config.has_section("combine"):
-            config.remove_section("combine")
-        self._sections = config.sections()
+        remotes = await RcloneConfig.remotes(self.config_path)
+        self._sections = [remote for remote in remotes if remote != "combine"]
         if len(self._sections) == 1:
             self.remote = f"{self._sections[0]}:"
             await self.get_path()
@@ -0,0 +1,199 @@
+from asyncio import Lock, create_subprocess_exec, sleep
+from asyncio.subprocess import DEVNULL
+from logging import getLogger
+from secrets import token_hex
+from time import time
+
+from aiohttp import BasicAuth, ClientSession, ClientTimeout
+
+from bot.core.config_manager import Config
+from bot.helper.ext_utils.exceptions import RcloneRcException
+
+LOGGER = getLogger(__name__)
+
+RCD_PORT = 5572
+RCD_RETRY_DELAY = 300
+
+# Remote types that point to other named remotes of their config file and
+# can't be expressed as a self-contained connection string.
+WRAPPER_TYPES = {
+    "alias",
+    "cache",
+    "chunker",
+    "combine",
+    "compress",
+    "crypt",
+    "hasher",
+    "union",
+}
+
+
+def remote_fs(options, path=""):
+    """Builds an rclone connection string for a remote.
+
+    The remote is described by all of its config options, so the daemon
+    doesn't depend on the config file it was defined in, and remotes with
+    the same name in different config files never share an Fs.
+
+    Args:
+        options: The config options of the remote, including its type.
+        path: Path inside the remote.
+
+    Returns:
+        The connection string, e.g. ``:drive,team_drive="id":path``.
+    """
+    params = "".join(
+        f',{key}="{value.replace(chr(34), chr(34) * 2)}"'
+        for key, value in options.items()
+        if key != "type"
+    )
+    return f":{options['type']}{params}:{path}"
+
+
+def local_fs(path):
+    """Builds an rclone connection string for a local path."""
+    return f":local:{path}"
+
+
+class RcloneDaemon:
+    """Manages one persistent ``rclone rcd`` and calls its RC API.
+
+    The daemon is started on first use and listens on localhost with a
+    random user and password. If it can't be started, :meth:`start`
+    reports it as unavailable for ``RCD_RETRY_DELAY`` seconds and callers
+    fall back to one rclone process per operation.
+
+    rclone builds its HTTP transaction limiter once at startup and ignores
+    ``TPSLimit`` in the ``_config`` of a call, so ``RCLONE_RCD_TPSLIMIT``
+    is passed on the command line and the daemon is restarted once it has
+    no running jobs after the setting changed.
+    """
+
+    _proc = None
+    _session = None
+    _auth = None
+    _tpslimit = None
+    _failed_at = 0
+    _lock = Lock()
+
+    @staticmethod
+    def _tpslimit_setting():
+        return (
+            max(Config.RCLONE_RCD_TPSLIMIT, 0),
+            max(Config.RCLONE_RCD_TPSLIMIT_BURST, 1),
+        )
+
+    @classmethod
+    async def _is_idle(cls):
+        try:
+            jobs = await cls._post("job/list", {})
+        except Exception:
+            return False
+        return not jobs.get("runningIds", jobs.get("jobids"))
+
+    @classmethod
+    async def start(cls):
+        """Starts the daemon if it isn't running.
+
+        Returns:
+            True if the daemon is ready to accept calls, False otherwise.
+        """
+        if not Config.RCLONE_RCD:
+            return False
+        async with cls._lock:
+            tpslimit = cls._tpslimit_setting()
+            if cls._proc is not None and cls._proc.returncode is None:
+                if tpslimit == cls._tpslimit or not await cls._is_idle():
+                    return True
+                LOGGER.info("rclone rcd tpslimit changed, restarting rclone rcd")
+                await cls.stop()
+            if time() - cls._failed_at < RCD_RETRY_DELAY:
+                return False
+            user, password = token_hex(8), token_hex(16)
+            cls._auth = BasicAuth(user, password)
+            if cls._session is None:
+                cls._session = ClientSession(timeout=ClientTimeout(total=300))
+            try:
+                cls._proc = await create_subprocess_exec(
+                    "xone",
+                    "rcd",
+                    "--rc-addr",
+                    f"127.0.0.1:{RCD_PORT}",
+                    "--rc-user",
+                    user,
+                    "--rc-pass",
+                    password,
+                    "--rc-job-expire-duration",
+                    "10m",
+                    "--config",
+                    "rclone.conf",
+                    "--tpslimit",
+                    str(tpslimit[0]),
+                    "--tpslimit-burst",
+                    str(tpslimit[1]),
+                    stdout=DEVNULL,
+                    stderr=DEVNULL,
+                )
+                for _ in range(40):
+                    await sleep(0.25)
+                    if cls._proc.returncode is not None:
+                        break
+                    try:
+                        await cls._post("rc/noop", {})
+                    except Exception:
+                        continue
+                    LOGGER.info("rclone rcd started")
+                    cls._tpslimit = tpslimit
+                    return True
+            except Exception as e:
+                LOGGER.error(f"Failed to start rclone rcd: {e}")
+            cls._failed_at = time()
+            await cls.stop()
+            LOGGER.error("rclone rcd unavailable, using rclone processes")
+            return False
+
+    @classmethod
+    async def stop(cls):
+        """Kills the daemon, cancelling all of its jobs."""
+        if cls._proc is not None and cls._proc.returncode is None:
+            try:
+                cls._proc.kill()
+                await cls._proc.wait()
+            except Exception as e:
+                LOGGER.error(f"Failed to stop rclone rcd: {e}")
+        cls._proc = None
+
+    @classmethod
+    async def _post(cls, command, params):
+        async with cls._session.post(
+            f"http://127.0.0.1:{RCD_PORT}/{command}",
+            json=params,
+            auth=cls._auth,
+        ) as resp:
+            result = await resp.json(content_type=None)
+            if resp.status != 200:
+                raise RcloneRcException(result.get("error", f"HTTP {resp.status}"))
+            return result
+
+    @classmethod
+    async def call(cls, command, params=None):
+        """Calls an RC command.
+
+        Args:
+            command: The RC command, e.g. ``sync/copy``.
+            params: The JSON parameters of the command.
+
+        Returns:
+            The decoded JSON response.
+
+        Raises:
+            RcloneRcException: The daemon isn't running or the command failed.
+        """
+        if cls._proc is None or cls._proc.returncode is not None:
+            raise RcloneRcException("rclone rcd is not running")
+        try:
+            return await cls._post(command, params or {})
+        except RcloneRcException:
+            raise
+        except Exception as e:
+            raise RcloneRcException(f"rclone rcd: {e}") from e
@@ -1,19 +1,29 @@
 import contextlib
-from asyncio import create_subprocess_exec, gather, sleep, wait_for
+from asyncio import create_subprocess_exec, sleep, wait_for
 from asyncio.subprocess import PIPE
-from configparser import RawConfigParser
 from json import loads
 from logging import getLogger
+from os import path as ospath
 from random import randrange
 from re import findall as re_findall
 
-from aiofiles import open as aiopen
-from aiofiles.os import listdir, makedirs
 from aiofiles.os import path as aiopath
 
 from bot.core.config_manager import Config
 from bot.helper.ext_utils.bot_utils import cmd_exec, sync_to_async
 from bot.helper.ext_utils.files_utils import count_files_and_folders, get_mime_type
+from bot.helper.ext_utils.status_utils import (
+    get_readable_file_size,
+    get_readable_time,
+)
+from bot.helper.mirror_leech_utils.rclone_utils.config import RcloneConfig
+from bot.helper.mirror_leech_utils.rclone_utils.list import clear_list_cache
+from bot.helper.mirror_leech_utils.rclone_utils.rcd import (
+    WRAPPER_TYPES,
+    RcloneDaemon,
+    local_fs,
+    remote_fs,
+)
 
 LOGGER = getLogger(__name__)
 
@@ -34,6 +44,8 @@ class RcloneTransferHelper:
         self._sa_number = 0
         self._use_service_accounts = Config.USE_SERVICE_ACCOUNTS
         self._rclone_select = False
+        self._jobid = None
+        self._group = f"mltb/{listener.mid}"
 
     @property
     def transferred_size(self):
@@ -81,6 +93,117 @@ class RcloneTransferHelper:
                 ) = data[0]
             await sleep(0.5)
 
+    async def _use_rc(self, *remotes_opts):
+        return (
+            not self._listener.rc_flags
+            and all(opts["type"] not in WRAPPER_TYPES for opts in remotes_opts)
+            and await RcloneDaemon.start()
+        )
+
+    def _rc_params(self, params, transfers=None):
+        config = {
+            "CopyLinks": True,
+            "Metadata": True,
+            "LowLevelRetries": 1,
+            "UseListR": True,
+        }
+        if transfers:
+            config["Transfers"] = transfers
+        rc_filter = {"IgnoreCase": True}
+        if self._rclone_select:
+            rc_filter["FilesFrom"] = [self._listener.link]
+        else:
+            rc_filter["ExcludeRule"] = [
+                "*.{" + ",".join(self._listener.excluded_extensions) + "}",
+            ]
+        return {
+            **params,
+            "_async": True,
+            "_group": self._group,
+            "_config": config,
+            "_filter": rc_filter,
+        }
+
+    async def _rc_progress(self):
+        while True:
+            status = await RcloneDaemon.call("job/status", {"jobid": self._jobid})
+            stats = await RcloneDaemon.call("core/stats", {"group": self._group})
+            transferred = stats.get("bytes", 0)
+            total = stats.get("totalBytes", 0)
+            self._transferred_size = get_readable_file_size(transferred)
+            self._size = get_readable_file_size(total)
+            self._percentage = (
+                f"{round(transferred / total * 100, 2)}%" if total else "0%"
+            )
+            self._speed = f"{get_readable_file_size(stats.get('speed', 0))}/s"
+            eta = stats.get("eta")
+            self._eta = get_readable_time(eta) if eta else "-"
+            if status["finished"]:
+                return status["success"], status.get("error", "")
+            await sleep(1)
+
+    async def _start_rc(self, command, params):
+        """Runs an async RC job and follows its stats until it ends.
+
+        Returns:
+            None if the task was cancelled, an empty string on success,
+            otherwise the error of the job.
+        """
+        try:
+            self._jobid = (await RcloneDaemon.call(command, params))["jobid"]
+            success, error = await self._rc_progress()
+        except Exception as e:
+            success, error = False, str(e)
+        finally:
+            self._jobid = None
+            with contextlib.suppress(Exception):
+                await RcloneDaemon.call("core/stats-delete", {"group": self._group})
+        if self._listener.is_cancelled:
+            return None
+        return "" if success else error or "rclone job failed"
+
+    async def _run_rc(self, build, config_path, remote, remote_type):
+        """Runs the RC job returned by ``build(remote_opts)``, switching
+        service account remotes on rate limit errors like the process path.
+        """
+        while True:
+            try:
+                remote_opts = await RcloneConfig.remote_options(config_path, remote)
+                command, params = await build(remote_opts)
+            except Exception as e:
+                error = str(e)
+            else:
+                error = await self._start_rc(command, params)
+            if not error:
+                return error
+            LOGGER.error(error)
+            if (
+                self._sa_number != 0
+                and remote_type == "drive"
+                and "RATE_LIMIT_EXCEEDED" in error
+                and self._use_service_accounts
+            ):
+                if self._sa_count < self._sa_number:
+                    remote = self._switch_service_account()
+                    if self._listener.is_cancelled:
+                        return None
+                    continue
+                LOGGER.info(
+                    f"Reached maximum number of service accounts switching, which is {self._sa_count}",
+                )
+            return error
+
+    async def _rc_is_dir(self, fs, path):
+        if not path:
+            return True
+        item = (
+            await RcloneDaemon.call(
+                "operations/stat",
+                {"fs": fs, "remote": path, "opt": {"noModTime": True}},
+            )
+        ).get("item")
+        return item is None or item["IsDir"]
+
     def _switch_service_account(self):
         if self._sa_index == self._sa_number - 1:
             self._sa_index = 0
@@ -92,29 +215,17 @@ class RcloneTransferHelper:
         return remote
 
     async def _create_rc_sa(self, remote, remote_opts):
-        sa_conf_dir = "rclone_sa"
-        sa_conf_file = f"{sa_conf_dir}/{remote}.conf"
-        if await aiopath.isfile(sa_conf_file):
-            return sa_conf_file
-        await makedirs(sa_conf_dir, exist_ok=True)
-
-        if gd_id := remote_opts.get("team_drive"):
-            option = "team_drive"
-        elif gd_id := remote_opts.get("root_folder_id"):
-            option = "root_folder_id"
-        else:
+        """Returns the service account config of ``remote`` and picks a
+        random account from it, or keeps ``rclone.conf`` if the remote
+        can't be used with service accounts.
+        """
+        sa_config = await RcloneConfig.service_account_config(remote, remote_opts)
+        if sa_config is None:
             self._use_service_accounts = False
-            return "rclone.conf"
-
-        files = await listdir("accounts")
-        text = "".join(
-            f"[sa{i:03}]\ntype = drive\nscope = drive\nservice_account_file = accounts/{sa}\n{option} = {gd_id}\n\n"
-            for i, sa in enumerate(files)
-        )
-
-        async with aiopen(sa_conf_file, "w") as f:
-            await f.write(text)
-        return sa_conf_file
+            return "rclone.conf", remote
+        config_path, self._sa_number = sa_config
+        self._sa_index = randrange(self._sa_number)
+        return config_path, f"sa{self._sa_index:03}"
 
     async def _start_download(self, cmd, remote_type):
         self._proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
@@ -158,7 +269,7 @@ class RcloneTransferHelper:
     async def download(self, remote, config_path, path):
         self._is_download = True
         try:
-            remote_opts = await self._get_remote_options(config_path, remote)
+            remote_opts = await RcloneConfig.remote_options(config_path, remote)
         except Exception as err:
             await self._listener.on_download_error(str(err))
             return
@@ -168,17 +279,16 @@ class RcloneTransferHelper:
             remote_type == "drive"
             and self._use_service_accounts
             and config_path == "rclone.conf"
-            and await aiopath.isdir("accounts")
             and not remote_opts.get("service_account_file")
         ):
-            config_path = await self._create_rc_sa(remote, remote_opts)
+            config_path, remote = await self._create_rc_sa(remote, remote_opts)
             if config_path != "rclone.conf":
-                sa_files = await listdir("accounts")
-                self._sa_number = len(sa_files)
-                self._sa_index = randrange(self._sa_number)
-                remote = f"sa{self._sa_index:03}"
                 LOGGER.info(f"Download with service account {remote}")
 
+        if await self._use_rc(remote_opts):
+            await self._rc_download(config_path, remote, remote_type, path)
+            return
+
         cmd = self._get_updated_command(
             config_path,
             f"{remote}:{self._listener.link}",
@@ -203,40 +313,106 @@ class RcloneTransferHelper:
 
         await self._start_download(cmd, remote_type)
 
-    async def _get_gdrive_link(self, config_path, destination, mime_type):
-        epath = (
-            destination.rsplit("/", 1)[0] if mime_type == "Folder" else destination
-        )
+    async def _rc_download(self, config_path, remote, remote_type, path):
+        self._rclone_select = self._listener.link.startswith("rclone_select")
+        transfers = 1 if remote_type == "drive" else None
+
+        async def build(opts):
+            if remote_type == "drive":
+                opts = {**opts, "acknowledge_abuse": "true", "chunk_size": "64M"}
+            src = "" if self._rclone_select else self._listener.link
+            if await self._rc_is_dir(remote_fs(opts), src):
+                params = {"srcFs": remote_fs(opts, src), "dstFs": local_fs(path)}
+                return "sync/copy", self._rc_params(params, transfers)
+            params = {
+                "srcFs": remote_fs(opts),
+                "srcRemote": src,
+                "dstFs": local_fs(path),
+                "dstRemote": ospath.basename(src),
+            }
+            return "operations/copyfile", self._rc_params(params)
+
+        error = await self._run_rc(build, config_path, remote, remote_type)
+        if error is None:
+            return
+        if error:
+            await self._listener.on_download_error(error[:4000])
+            return
+        await self._listener.on_download_complete()
 
-        cmd = [
-            "xone",
-            "lsjson",
-            "--fast-list",
-            "--no-mimetype",
-            "--no-modtime",
-            "--config",
-            config_path,
-            epath,
-        ]
-        res, err, code = await cmd_exec(cmd)
+    async def _get_link(self, config_path, destination, mime_type, remote_opts):
+        """Resolves the link of one uploaded or cloned item.
 
-        if code == 0:
-            result = loads(res)
-            fid = next(
-                (r["ID"] for r in result if r["Path"] == self._listener.name),
-                "err",
-            )
-            link = (
-                f"https://drive.google.com/drive/folders/{fid}"
-                if mime_type == "Folder"
-                else f"https://drive.google.com/uc?id={fid}&export=download"
-            )
-        elif code != -9:
-            LOGGER.error(
-                f"while getting drive link. Path: {destination}. Stderr: {err}",
-            )
-            link = ""
-        return link
+        Drive links are built from the ID of the item itself, read with
+        ``operations/stat`` or ``lsjson --stat`` instead of listing its
+        parent folder. Other remotes use their public link.
+
+        Returns:
+            The link, or an empty string if it couldn't be resolved.
+        """
+        path = destination.split(":", 1)[1]
+        is_drive = remote_opts["type"] == "drive"
+        try:
+            if (
+                remote_opts["type"] not in WRAPPER_TYPES
+                and await RcloneDaemon.start()
+            ):
+                fs = remote_fs(remote_opts)
+                if is_drive:
+                    item = (
+                        await RcloneDaemon.call(
+                            "operations/stat",
+                            {
+                                "fs": fs,
+                                "remote": path,
+                                "opt": {"noModTime": True, "noMimeType": True},
+                            },
+                        )
+                    ).get("item")
+                    fid = item.get("ID") if item else None
+                else:
+                    return (
+                        await RcloneDaemon.call(
+                            "operations/publiclink",
+                            {"fs": fs, "remote": path},
+                        )
+                    ).get("url", "")
+            else:
+                cmd = (
+                    [
+                        "xone",
+                        "lsjson",
+                        "--stat",
+                        "--no-mimetype",
+                        "--no-modtime",
+                        "--config",
+                        config_path,
+                        destination,
+                    ]
+                    if is_drive
+                    else ["xone", "link", "--config", config_path, destination]
+                )
+                res, err, code = await cmd_exec(cmd)
+                if code != 0:
+                    if code != -9:
+                        LOGGER.error(
+                            f"while getting link. Path: {destination} | Stderr: {err}",
+                        )
+                    return ""
+                if not is_drive:
+                    return res
+                fid = loads(res).get("ID")
+        except Exception as e:
+            LOGGER.error(f"while getting link. Path: {destination} | Error: {e}")
+            return ""
+        if not fid:
+            LOGGER.error(f"while getting link. Path: {destination} | No ID")
+            return ""
+        return (
+            f"https://drive.google.com/drive/folders/{fid}"
+            if mime_type == "Folder"
+            else f"https://drive.google.com/uc?id={fid}&export=download"
+        )
 
     async def _start_upload(self, cmd, remote_type):
         self._proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
@@ -272,6 +448,28 @@ class RcloneTransferHelper:
         await self._listener.on_upload_error(error[:4000])
         return False
 
+    async def _rc_upload(self, path, rc_path, mime_type, remote):
+        config_path, fremote, remote_type = remote
+        transfers = 1 if remote_type == "drive" else None
+
+        async def build(opts):
+            if mime_type == "Folder":
+                params = {"srcFs": local_fs(path), "dstFs": remote_fs(opts, rc_path)}
+                return "sync/move", self._rc_params(params, transfers)
+            name = ospath.basename(path)
+            params = {
+                "srcFs": local_fs(ospath.dirname(path)),
+                "srcRemote": name,
+                "dstFs": remote_fs(opts),
+                "dstRemote": f"{rc_path}/{name}" if rc_path else name,
+            }
+            return "operations/movefile", self._rc_params(params)
+
+        error = await self._run_rc(build, config_path, fremote, remote_type)
+        if error:
+            await self._listener.on_upload_error(error[:4000])
+        return error == ""
+
     async def upload(self, path):
         self._is_upload = True
         rc_path = self._listener.up_dest
@@ -293,7 +491,7 @@ class RcloneTransferHelper:
             files = 1
 
         try:
-            remote_opts = await self._get_remote_options(oconfig_path, oremote)
+            remote_opts = await RcloneConfig.remote_options(oconfig_path, oremote)
         except Exception as err:
             await self._listener.on_upload_error(str(err))
             return
@@ -305,39 +503,42 @@ class RcloneTransferHelper:
             remote_type == "drive"
             and self._use_service_accounts
             and fconfig_path == "rclone.conf"
-            and await aiopath.isdir("accounts")
             and not remote_opts.get("service_account_file")
         ):
-            fconfig_path = await self._create_rc_sa(oremote, remote_opts)
+            fconfig_path, fremote = await self._create_rc_sa(oremote, remote_opts)
             if fconfig_path != "rclone.conf":
-                sa_files = await listdir("accounts")
-                self._sa_number = len(sa_files)
-                self._sa_index = randrange(self._sa_number)
-                fremote = f"sa{self._sa_index:03}"
                 LOGGER.info(f"Upload with service account {fremote}")
 
-        method = "move"
-        cmd = self._get_updated_command(
-            fconfig_path,
-            path,
-            f"{fremote}:{rc_path}",
-            method,
-        )
-        if remote_type == "drive" and not self._listener.rc_flags:
-            cmd.extend(
-                (
-                    "--tpslimit",
-                    "1",
-                    "--tpslimit-burst",
-                    "1",
-                    "--transfers",
-                    "1",
-                ),
+        if await self._use_rc(remote_opts):
+            result = await self._rc_upload(
+                path,
+                rc_path,
+                mime_type,
+                (fconfig_path, fremote, remote_type),
             )
-
-        result = await self._start_upload(cmd, remote_type)
+        else:
+            method = "move"
+            cmd = self._get_updated_command(
+                fconfig_path,
+                path,
+                f"{fremote}:{rc_path}",
+                method,
+            )
+            if remote_type == "drive" and not self._listener.rc_flags:
+                cmd.extend(
+                    (
+                        "--tpslimit",
+                        "1",
+                        "--tpslimit-burst",
+                        "1",
+                        "--transfers",
+                        "1",
+                    ),
+                )
+            result = await self._start_upload(cmd, remote_type)
         if not result:
             return
+        clear_list_cache(oconfig_path)
 
         if mime_type == "Folder":
             destination = f"{oremote}:{rc_path}"
@@ -346,25 +547,9 @@ class RcloneTransferHelper:
         else:
             destination = f"{oremote}:{self._listener.name}"
 
-        if remote_type == "drive":
-            link = await self._get_gdrive_link(oconfig_path, destination, mime_type)
-        else:
-            cmd = [
-                "xone",
-                "link",
-                "--config",
-                oconfig_path,
-                destination,
-            ]
-            res, err, code = await cmd_exec(cmd)
-
-            if code == 0:
-                link = res
-            elif code != -9:
-                LOGGER.error(
-                    f"while getting link. Path: {destination} | Stderr: {err}",
-                )
-                link = ""
+        link = await self._get_link(
+            oconfig_path, destination, mime_type, remote_opts
+        )
         if self._listener.is_cancelled:
             return
         LOGGER.info(f"Upload Done. Path: {destination}")
@@ -382,90 +567,107 @@ class RcloneTransferHelper:
         dst_remote, dst_path = destination.split(":", 1)
 
         try:
-            src_remote_opts, dst_remote_opt = await gather(
-                self._get_remote_options(config_path, src_remote),
-                self._get_remote_options(config_path, dst_remote),
+            src_remote_opts = await RcloneConfig.remote_options(
+                config_path,
+                src_remote,
+            )
+            dst_remote_opt = await RcloneConfig.remote_options(
+                config_path,
+                dst_remote,
             )
         except Exception as err:
             await self._listener.on_upload_error(str(err))
             return None, None
 
-        src_remote_type, dst_remote_type = (
-            src_remote_opts["type"],
-            dst_remote_opt["type"],
-        )
+        src_remote_type = src_remote_opts["type"]
 
-        cmd = self._get_updated_command(
-            config_path,
-            f"{src_remote}:{src_path}",
-            destination,
-            method,
-        )
-        if not self._listener.rc_flags and src_remote_type == "drive":
-            cmd.extend(
-                (
-                    "--drive-acknowledge-abuse",
-                    "--tpslimit",
-                    "3",
-                    "--tpslimit-burst",
-                    "1",
-                    "--transfers",
-                    "3",
-                ),
+        if await self._use_rc(src_remote_opts, dst_remote_opt):
+            error = await self._rc_clone(
+                config_path,
+                (src_remote, src_path, src_remote_type),
+                dst_remote_opt,
+                dst_path,
+                (mime_type, method),
+            )
+            if error is None:
+                return None, None
+        else:
+            cmd = self._get_updated_command(
+                config_path,
+                f"{src_remote}:{src_path}",
+                destination,
+                method,
             )
+            if not self._listener.rc_flags and src_remote_type == "drive":
+                cmd.extend(
+                    (
+                        "--drive-acknowledge-abuse",
+                        "--tpslimit",
+                        "3",
+                        "--tpslimit-burst",
+                        "1",
+                        "--transfers",
+                        "3",
+                    ),
+                )
 
-        self._proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
-        await self._progress()
-        _, stderr = await self._proc.communicate()
-        return_code = self._proc.returncode
+            self._proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+            await self._progress()
+            _, stderr = await self._proc.communicate()
+            return_code = self._proc.returncode
 
-        if self._listener.is_cancelled:
-            return None, None
+            if self._listener.is_cancelled or return_code == -9:
+                return None, None
+            error = "" if return_code == 0 else stderr.decode().strip()
+            if error:
+                LOGGER.error(error)
 
-        if return_code == -9:
-            return None, None
-        if return_code == 0:
+        if not error:
+            clear_list_cache(config_path)
             if mime_type != "Folder":
                 destination += (
                     f"/{self._listener.name}" if dst_path else self._listener.name
                 )
-            if dst_remote_type == "drive":
-                link = await self._get_gdrive_link(
-                    config_path,
-                    destination,
-                    mime_type,
-                )
-                return (
-                    (None, None)
-                    if self._listener.is_cancelled
-                    else (link, destination)
-                )
-            cmd = [
-                "xone",
-                "link",
-                "--config",
+            link = await self._get_link(
                 config_path,
                 destination,
-            ]
-            res, err, code = await cmd_exec(cmd)
-
+                mime_type,
+                dst_remote_opt,
+            )
             if self._listener.is_cancelled:
                 return None, None
+            return link, destination
 
-            if code == 0:
-                return res, destination
-            if code != -9:
-                LOGGER.error(
-                    f"while getting link. Path: {destination} | Stderr: {err}",
-                )
-                return None, destination
-            return None
-
-        error = stderr.decode().strip()
-        LOGGER.error(error)
         await self._listener.on_upload_error(error[:4000])
         return None, None
 
+    async def _rc_clone(self, config_path, src, dst_opts, dst_path, mode):
+        src_remote, src_path, src_remote_type = src
+        mime_type, method = mode
+        self._rclone_select = self._listener.link.startswith("rclone_select")
+        transfers = 3 if src_remote_type == "drive" else None
+
+        async def build(opts):
+            if src_remote_type == "drive":
+                opts = {**opts, "acknowledge_abuse": "true"}
+            if mime_type == "Folder":
+                params = {
+                    "srcFs": remote_fs(opts, src_path),
+                    "dstFs": remote_fs(dst_opts, dst_path),
+                }
+                command = "sync/sync" if method == "sync" else "sync/copy"
+                return command, self._rc_params(params, transfers)
+            name = ospath.basename(src_path)
+            params = {
+                "srcFs": remote_fs(opts),
+                "srcRemote": src_path,
+                "dstFs": remote_fs(dst_opts),
+                "dstRemote": f"{dst_path}/{name}" if dst_path else name,
+            }
+            return "operations/copyfile", self._rc_params(params)
+
+        return await self._run_rc(build, config_path, src_remote, src_remote_type)
+
     def _get_updated_command(
         self,
         config_path,
@@ -509,20 +711,14 @@ class RcloneTransferHelper:
                     cmd.append(flag.strip())
         return cmd
 
-    @staticmethod
-    async def _get_remote_options(config_path, remote):
-        config = RawConfigParser()
-        async with aiopen(config_path) as f:
-            contents = await f.read()
-            config.read_string(contents)
-        options = config.options(remote)
-        return {opt: config.get(remote, opt) for opt in options}
-
     async def cancel_task(self):
         self._listener.is_cancelled = True
         if self._proc is not None:
             with contextlib.suppress(Exception):
                 self._proc.kill()
+        if self._jobid is not None:
+            with contextlib.suppress(Exception):
+                await RcloneDaemon.call("job/stop", {"jobid": self._jobid})
         if self._is_download:
             LOGGER.info(f"Cancelling Download: {self._listener.name}")
             await self._listener.on_download_error("Stopped by user!")
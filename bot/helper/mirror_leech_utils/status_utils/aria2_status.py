@@ -1,6 +1,6 @@
 from time import time
 
-from bot import LOGGER
+from bot import LOGGER, task_dict
 from bot.core.torrent_manager import TorrentManager, aria2_name
 from bot.helper.ext_utils.status_utils import (
     MirrorStatus,
@@ -33,6 +33,7 @@ class Aria2Status:
         if self._download.get("followedBy", []):
             self._gid = self._download["followedBy"][0]
             self._download = await get_download(self._gid)
+            task_dict.refresh_gid(self)
 
     def progress(self):
         try:
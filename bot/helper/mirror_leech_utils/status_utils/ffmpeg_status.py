@@ -1,5 +1,3 @@
-import contextlib
-
 from bot import LOGGER
 from bot.helper.ext_utils.status_utils import (
     MirrorStatus,
@@ -58,10 +56,5 @@ class FFmpegStatus:
     async def cancel_task(self):
         LOGGER.info(f"Cancelling {self._cstatus}: {self.listener.name}")
         self.listener.is_cancelled = True
-        if (
-            self.listener.subproc is not None
-            and self.listener.subproc.returncode is None
-        ):
-            with contextlib.suppress(Exception):
-                self.listener.subproc.kill()
+        self._obj.kill()
         await self.listener.on_upload_error(f"{self._cstatus} stopped by user!")
@@ -1,4 +1,6 @@
+from asyncio import Lock
 from time import time
+from typing import ClassVar
 
 from bot import LOGGER, jd_downloads, jd_listener_lock
 from bot.core.jdownloader_booter import jdownloader
@@ -44,27 +46,84 @@ def _get_combined_info(result, old_info):
     }
 
 
+class JDSnapshot:
+    """Shared view of the JDownloader download list.
+
+    One ``query_packages`` call per refresh returns every package with all
+    the fields used by the listener and the status objects. Tasks made of
+    several packages are combined once per refresh, so a status page or a
+    completion check costs no MyJDownloader relay round-trip while the
+    snapshot is fresh.
+    """
+
+    packages: ClassVar[dict] = {}
+    tasks: ClassVar[dict] = {}
+    updated_at = 0
+    max_age = 3
+    _lock = Lock()
+
+    @classmethod
+    async def refresh(cls, max_age=0):
+        """Queries the packages unless the snapshot is younger than
+        ``max_age``, then rebuilds the combined info of every task.
+
+        Args:
+            max_age: Maximum accepted age of the snapshot in seconds. Zero
+                forces a refresh.
+        """
+        async with cls._lock:
+            if max_age and time() - cls.updated_at < max_age:
+                return
+            packages = await jdownloader.device.downloads.query_packages(
+                [
+                    {
+                        "bytesLoaded": True,
+                        "bytesTotal": True,
+                        "enabled": True,
+                        "maxResults": -1,
+                        "running": True,
+                        "speed": True,
+                        "eta": True,
+                        "status": True,
+                        "hosts": True,
+                        "finished": True,
+                        "saveTo": True,
+                    },
+                ],
+            )
+            cls.packages = {pack["uuid"]: pack for pack in packages}
+            tasks = {}
+            for gid, d_dict in list(jd_downloads.items()):
+                if result := [
+                    cls.packages[pid]
+                    for pid in d_dict.get("ids", [])
+                    if pid in cls.packages
+                ]:
+                    tasks[gid] = (
+                        _get_combined_info(result, cls.tasks.get(gid, {}))
+                        if len(result) > 1
+                        else result[0]
+                    )
+            cls.tasks = tasks
+            cls.updated_at = time()
+
+    @classmethod
+    async def get(cls, gid, old_info):
+        """Returns the combined info of a task from a fresh-enough snapshot.
+
+        Args:
+            gid: The gid of the JDownloader task.
+            old_info: Value to return if the task is unavailable.
+        """
+        try:
+            await cls.refresh(cls.max_age)
+        except Exception:
+            return old_info
+        return cls.tasks.get(gid, old_info)
+
+
 async def get_download(gid, old_info):
-    try:
-        result = await jdownloader.device.downloads.query_packages(
-            [
-                {
-                    "bytesLoaded": True,
-                    "bytesTotal": True,
-                    "enabled": True,
-                    "packageUUIDs": jd_downloads[gid]["ids"],
-                    "maxResults": -1,
-                    "running": True,
-                    "speed": True,
-                    "eta": True,
-                    "status": True,
-                    "hosts": True,
-                },
-            ],
-        )
-        return _get_combined_info(result, old_info) if len(result) > 1 else result[0]
-    except Exception:
-        return old_info
+    return await JDSnapshot.get(gid, old_info)
 
 
 class JDownloaderStatus:
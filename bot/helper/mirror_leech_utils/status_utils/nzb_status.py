@@ -1,4 +1,6 @@
-from asyncio import gather
+from asyncio import Lock, gather
+from time import time
+from typing import ClassVar
 
 from bot import LOGGER, nzb_jobs, nzb_listener_lock, sabnzbd_client
 from bot.helper.ext_utils.status_utils import (
@@ -9,46 +11,137 @@ from bot.helper.ext_utils.status_utils import (
 )
 
 
-async def get_download(nzo_id, old_info=None):
+def _fraction(value):
+    done, total = value.split("/")
+    return round((int(float(done)) / int(float(total))) * 100, 2)
+
+
+def _parse_action_line(slot, info):
+    """Fills the progress of a post-processing history slot from its
+    ``action_line``, e.g. ``Repairing: 45% (ETA 0:01:02)``.
+    """
+    action_line = slot.get("action_line") or ""
+    status = slot["status"]
     try:
-        queue = await sabnzbd_client.get_downloads(nzo_ids=nzo_id)
-        if res := queue["queue"]["slots"]:
-            slot = res[0]
-            if msg := slot["labels"]:
-                LOGGER.warning(" | ".join(msg))
-            return slot
-        history = await sabnzbd_client.get_history(nzo_ids=nzo_id)
-        if res := history["history"]["slots"]:
-            slot = res[0]
-            if slot["status"] == "Verifying":
-                percentage = slot["action_line"].split("Verifying: ")[-1].split("/")
-                percentage = round(
-                    (int(float(percentage[0])) / int(float(percentage[1]))) * 100, 2
-                )
-                old_info["percentage"] = percentage
-            elif slot["status"] == "Repairing":
-                action = slot["action_line"].split("Repairing: ")[-1].split()
-                percentage = action[0].strip("%")
-                eta = action[2]
-                old_info["percentage"] = percentage
-                old_info["timeleft"] = eta
-            elif slot["status"] == "Extracting":
-                if "Unpacking" in slot["action_line"]:
-                    action = slot["action_line"].split("Unpacking: ")[-1].split()
-                else:
-                    action = slot["action_line"].split("Direct Unpack: ")[-1].split()
-                percentage = action[0].split("/")
-                percentage = round(
-                    (int(float(percentage[0])) / int(float(percentage[1]))) * 100, 2
+        if status == "Verifying":
+            info["percentage"] = _fraction(action_line.split("Verifying: ")[-1])
+        elif status == "Repairing":
+            action = action_line.split("Repairing: ")[-1].split()
+            info["percentage"] = action[0].strip("%")
+            info["timeleft"] = action[2]
+        elif status == "Extracting":
+            if "Unpacking" in action_line:
+                action = action_line.split("Unpacking: ")[-1].split()
+            else:
+                action = action_line.split("Direct Unpack: ")[-1].split()
+            info["percentage"] = _fraction(action[0])
+            info["timeleft"] = action[2]
+    except (IndexError, ValueError, ZeroDivisionError):
+        pass
+
+
+class NzbSnapshot:
+    """Shared per-job view of the SABnzbd queue and history.
+
+    One refresh fetches the queue and history slots of all jobs started by
+    the bot, merges them into a table keyed by ``nzo_id`` and parses the
+    verify, repair and extract progress of post-processing jobs. The
+    listener and the status objects both read this table, so a status
+    refresh costs no SABnzbd requests while the table is fresh.
+
+    Jobs in post-processing keep the last known queue fields (name, size,
+    bytes left) so their status can still be shown.
+    """
+
+    jobs: ClassVar[dict] = {}
+    updated_at = 0
+    max_age = 3
+    _requested: ClassVar[set] = set()
+    _polled: ClassVar[set] = set()
+    _lock = Lock()
+
+    @classmethod
+    async def refresh(cls, max_age=0):
+        """Rebuilds the job table unless it is younger than ``max_age``.
+
+        Args:
+            max_age: Maximum accepted age of the table in seconds. Zero
+                forces a refresh.
+        """
+        async with cls._lock:
+            if max_age and time() - cls.updated_at < max_age:
+                return
+            nzo_ids = list(nzb_jobs.keys() | cls._requested)
+            if not nzo_ids:
+                cls.jobs = {}
+                cls._polled = set()
+                cls.updated_at = time()
+                return
+            queue, history = await gather(
+                sabnzbd_client.get_downloads(nzo_ids=nzo_ids),
+                sabnzbd_client.get_history(nzo_ids=nzo_ids),
+            )
+            jobs = {}
+            for slot in history["history"]["slots"]:
+                nzo_id = slot["nzo_id"]
+                info = dict(cls.jobs.get(nzo_id, {}))
+                info.update(
+                    status=slot["status"],
+                    fail_message=slot.get("fail_message", ""),
+                    source="history",
                 )
-                eta = action[2]
-                old_info["percentage"] = percentage
-                old_info["timeleft"] = eta
-            old_info["status"] = slot["status"]
-        return old_info
-    except Exception as e:
-        LOGGER.error(f"{e}: Sabnzbd, while getting job info. ID: {nzo_id}")
-        return old_info
+                info.setdefault("filename", slot["name"])
+                info.setdefault("size", slot["size"])
+                info.setdefault("mb", str(slot.get("bytes", 0) / 1048576))
+                info.setdefault("mbleft", "0")
+                info.setdefault("percentage", "100")
+                info.setdefault("timeleft", "0:00:00")
+                _parse_action_line(slot, info)
+                jobs[nzo_id] = info
+            for slot in queue["queue"]["slots"]:
+                nzo_id = slot["nzo_id"]
+                if (labels := slot["labels"]) and labels != cls.jobs.get(
+                    nzo_id,
+                    {},
+                ).get("labels"):
+                    LOGGER.warning(" | ".join(labels))
+                jobs[nzo_id] = {**slot, "source": "queue"}
+            cls.jobs = jobs
+            cls._polled = set(nzo_ids)
+            cls.updated_at = time()
+
+    @classmethod
+    async def get(cls, nzo_id, old_info=None):
+        """Returns the job with the given id from a fresh-enough table.
+
+        Args:
+            nzo_id: The SABnzbd job id.
+            old_info: Value to return if the job is unavailable.
+
+        Returns:
+            The job info, or ``old_info`` if it can't be found.
+        """
+        try:
+            if nzo_id in cls._polled:
+                await cls.refresh(cls.max_age)
+            else:
+                cls._requested.add(nzo_id)
+                await cls.refresh()
+        except Exception as e:
+            LOGGER.error(f"{e}: Sabnzbd, while getting job info. ID: {nzo_id}")
+            return old_info
+        return cls.jobs.get(nzo_id, old_info)
+
+    @classmethod
+    def remove(cls, nzo_id):
+        """Drops a deleted job from the table."""
+        cls._requested.discard(nzo_id)
+        cls._polled.discard(nzo_id)
+        cls.jobs.pop(nzo_id, None)
+
+
+async def get_download(nzo_id, old_info=None):
+    return await NzbSnapshot.get(nzo_id, old_info)
 
 
 class SabnzbdStatus:
@@ -131,3 +224,4 @@ class SabnzbdStatus:
         async with nzb_listener_lock:
             if self._gid in nzb_jobs:
                 del nzb_jobs[self._gid]
+        NzbSnapshot.remove(self._gid)
@@ -1,7 +1,7 @@
 from asyncio import gather, sleep
 
-from bot import LOGGER, qb_listener_lock, qb_torrents
-from bot.core.torrent_manager import TorrentManager
+from bot import LOGGER, qb_listener_lock, qb_torrents, task_dict
+from bot.core.torrent_manager import QbitSnapshot, TorrentManager
 from bot.helper.ext_utils.status_utils import (
     MirrorStatus,
     get_readable_file_size,
@@ -10,12 +10,7 @@ from bot.helper.ext_utils.status_utils import (
 
 
 async def get_download(tag, old_info=None):
-    try:
-        res = (await TorrentManager.qbittorrent.torrents.info(tag=tag))[0]
-        return res or old_info
-    except Exception as e:
-        LOGGER.error(f"{e}: Qbittorrent, while getting torrent info. Tag: {tag}")
-        return old_info
+    return await QbitSnapshot.get_by_tag(tag, old_info)
 
 
 class QbittorrentStatus:
@@ -27,7 +22,12 @@ class QbittorrentStatus:
         self.tool = "qbittorrent"
 
     async def update(self):
-        self._info = await get_download(f"{self.listener.mid}", self._info)
+        old_info = self._info
+        self._info = await get_download(f"{self.listener.mid}", old_info)
+        if self._info is not None and (
+            old_info is None or old_info.hash != self._info.hash
+        ):
+            task_dict.refresh_gid(self)
 
     def progress(self):
         return f"{round(self._info.progress * 100, 2)}%"
@@ -110,6 +110,7 @@ class QbittorrentStatus:
                     tags=[self._info.tags[0]],
                 ),
             )
+            QbitSnapshot.remove(self._info.hash)
             async with qb_listener_lock:
                 if self._info.tags[0] in qb_torrents:
                     del qb_torrents[self._info.tags[0]]
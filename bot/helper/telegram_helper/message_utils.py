@@ -315,7 +315,7 @@ async def update_status_message(sid, force=False):
                 obj.cancel()
                 del intervals["status"][sid]
             return
-        if text != status_dict[sid]["message"].text:
+        if text != status_dict[sid].get("text"):
             message = await edit_message(
                 status_dict[sid]["message"],
                 text,
@@ -334,6 +334,7 @@ async def update_status_message(sid, force=False):
                     )
                 return
             status_dict[sid]["message"].text = text
+            status_dict[sid]["text"] = text
             status_dict[sid]["time"] = time()
 
 
@@ -369,7 +370,9 @@ async def send_status_message(msg, user_id=0):
                 return
             await delete_message(old_message)
             message.text = text
-            status_dict[sid].update({"message": message, "time": time()})
+            status_dict[sid].update(
+                {"message": message, "time": time(), "text": text},
+            )
         else:
             text, buttons = await get_readable_message(sid, is_user)
             if text is None:
@@ -384,6 +387,7 @@ async def send_status_message(msg, user_id=0):
             status_dict[sid] = {
                 "message": message,
                 "time": time(),
+                "text": text,
                 "page_no": 1,
                 "page_step": 1,
                 "status": "All",
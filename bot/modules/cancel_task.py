@@ -91,6 +91,10 @@ def create_cancel_buttons(is_sudo, user_id=""):
         "Spltting",
         f"canall ms {MirrorStatus.STATUS_SPLIT} {user_id}",
     )
+    buttons.data_button(
+        "Joining",
+        f"canall ms {MirrorStatus.STATUS_JOIN} {user_id}",
+    )
     buttons.data_button(
         "Cloning",
         f"canall ms {MirrorStatus.STATUS_CLONE} {user_id}",
@@ -1,7 +1,5 @@
 from bot import (
     queue_dict_lock,
-    queued_dl,
-    queued_up,
     task_dict,
     task_dict_lock,
     user_data,
@@ -10,6 +8,8 @@ from bot.core.config_manager import Config
 from bot.helper.ext_utils.bot_utils import new_task
 from bot.helper.ext_utils.status_utils import get_task_by_gid
 from bot.helper.ext_utils.task_manager import (
+    queued_dl,
+    queued_up,
     start_dl_from_queued,
     start_up_from_queued,
 )
@@ -1,13 +1,14 @@
-from asyncio import Lock, sleep
+from asyncio import Lock, Queue, Semaphore, create_task, gather, sleep
 from datetime import datetime, timedelta
 from functools import partial
 from io import BytesIO
-from re import IGNORECASE, compile
+from re import IGNORECASE, compile, escape
 from time import time
+from urllib.parse import urlparse
 
 from apscheduler.triggers.interval import IntervalTrigger
 from feedparser import parse as feed_parse
-from httpx import AsyncClient
+from httpx import AsyncClient, Limits
 from pyrogram.filters import create
 from pyrogram.handlers import MessageHandler
 
@@ -15,7 +16,6 @@ from bot import LOGGER, rss_dict, scheduler
 from bot.core.config_manager import Config
 from bot.helper.ext_utils.bot_utils import arg_parser, get_size_bytes, new_task
 from bot.helper.ext_utils.db_handler import database
-from bot.helper.ext_utils.exceptions import RssShutdownException
 from bot.helper.ext_utils.help_messages import RSS_HELP_MESSAGE
 from bot.helper.ext_utils.status_utils import get_readable_file_size
 from bot.helper.telegram_helper.button_build import ButtonMaker
@@ -38,6 +38,140 @@ headers = {
     "Accept-Language": "en-US,en;q=0.5",
 }
 
+RSS_CONCURRENCY = 20
+RSS_HOST_CONCURRENCY = 2
+RSS_HOST_INTERVAL = 1
+RSS_SEND_INTERVAL = 3
+rss_client = {"client": None}
+feed_validators = {}
+pending_validators = {}
+host_limits = {}
+rss_filters = {}
+rss_send_queue = Queue()
+rss_dispatcher = {"task": None}
+
+
+class RssFilter:
+    """Include/exclude filters of a subscription compiled into regexes.
+
+    ``inf`` is a list of groups that must all match at least one of their
+    terms, ``exf`` excludes an item if any of its terms matches. With
+    ``sensitive`` terms are matched ignoring case.
+    """
+
+    def __init__(self, inf, exf, sensitive):
+        self.key = (repr(inf), repr(exf), bool(sensitive))
+        flags = IGNORECASE if sensitive else 0
+        self._inf = [
+            compile("|".join(escape(x) for x in flist), flags)
+            for flist in inf
+            if flist
+        ]
+        exf_terms = [escape(x) for flist in exf for x in flist]
+        self._exf = compile("|".join(exf_terms), flags) if exf_terms else None
+
+    def match(self, title):
+        if any(not pattern.search(title) for pattern in self._inf):
+            return False
+        return not (self._exf and self._exf.search(title))
+
+
+def get_rss_filter(user, title, data):
+    """Returns the compiled filter of a subscription, compiling it again only
+    if its filters changed since it was last compiled.
+    """
+    key = (repr(data["inf"]), repr(data["exf"]), bool(data.get("sensitive", False)))
+    rss_filter = rss_filters.get((user, title))
+    if rss_filter is None or rss_filter.key != key:
+        rss_filter = RssFilter(
+            data["inf"],
+            data["exf"],
+            data.get("sensitive", False),
+        )
+        rss_filters[(user, title)] = rss_filter
+    return rss_filter
+
+
+async def _dispatch_rss():
+    while True:
+        feed_msg, chat_id, topic_id = await rss_send_queue.get()
+        try:
+            await send_rss(feed_msg, chat_id, topic_id)
+        except Exception as e:
+            LOGGER.error(f"Rss dispatcher: {e}")
+        finally:
+            rss_send_queue.task_done()
+        await sleep(RSS_SEND_INTERVAL)
+
+
+def queue_rss(feed_msg, chat_id, topic_id):
+    rss_send_queue.put_nowait((feed_msg, chat_id, topic_id))
+    if rss_dispatcher["task"] is None or rss_dispatcher["task"].done():
+        rss_dispatcher["task"] = create_task(_dispatch_rss())
+
+
+def get_rss_client():
+    if rss_client["client"] is None or rss_client["client"].is_closed:
+        rss_client["client"] = AsyncClient(
+            headers=headers,
+            follow_redirects=True,
+            timeout=60,
+            verify=False,
+            http2=True,
+            limits=Limits(
+                max_connections=RSS_CONCURRENCY * 2,
+                max_keepalive_connections=RSS_CONCURRENCY,
+            ),
+        )
+    return rss_client["client"]
+
+
+async def fetch_feed(link, conditional=False):
+    """Fetches a feed through the shared client.
+
+    Requests to the same host are limited in concurrency and spaced by
+    RSS_HOST_INTERVAL. With ``conditional``, the ETag/Last-Modified of the
+    last processed response are sent and None is returned if the feed
+    didn't change. The validators of the new response only take effect
+    once :func:`save_validators` is called after it was processed.
+    """
+    host = urlparse(link).hostname
+    if host not in host_limits:
+        host_limits[host] = {"sem": Semaphore(RSS_HOST_CONCURRENCY), "last": 0}
+    limit = host_limits[host]
+    req_headers = {}
+    if conditional and (validators := feed_validators.get(link)):
+        if validators.get("etag"):
+            req_headers["If-None-Match"] = validators["etag"]
+        if validators.get("modified"):
+            req_headers["If-Modified-Since"] = validators["modified"]
+    tries = 0
+    async with limit["sem"]:
+        while True:
+            if (wait := limit["last"] + RSS_HOST_INTERVAL - time()) > 0:
+                await sleep(wait)
+            limit["last"] = time()
+            try:
+                res = await get_rss_client().get(link, headers=req_headers)
+                break
+            except Exception:
+                tries += 1
+                if tries > 3:
+                    raise
+    if res.status_code == 304:
+        return None
+    if conditional:
+        pending_validators[link] = {
+            "etag": res.headers.get("etag"),
+            "modified": res.headers.get("last-modified"),
+        }
+    return res.text
+
+
+def save_validators(link):
+    if validators := pending_validators.pop(link, None):
+        feed_validators[link] = validators
+
 
 async def rss_menu(event):
     user_id = event.from_user.id
@@ -135,14 +269,7 @@ async def rss_sub(_, message, pre_event):
             cmd = None
             stv = False
         try:
-            async with AsyncClient(
-                headers=headers,
-                follow_redirects=True,
-                timeout=60,
-                verify=False,
-            ) as client:
-                res = await client.get(feed_link)
-            html = res.text
+            html = await fetch_feed(feed_link)
             rss_d = feed_parse(html)
             last_title = rss_d.entries[0]["title"]
             if rss_d.entries[0].get("size"):
@@ -151,7 +278,7 @@ async def rss_sub(_, message, pre_event):
                 summary = rss_d.entries[0]["summary"]
                 matches = size_regex.findall(summary)
                 sizes = [match[0] for match in matches]
-                size = get_size_bytes(sizes[0])
+                size = get_size_bytes(sizes[0]) if sizes else 0
             else:
                 size = 0
             msg += "<b>Subscribed!</b>"
@@ -196,6 +323,7 @@ async def rss_sub(_, message, pre_event):
                             "tag": tag,
                         },
                     }
+                get_rss_filter(user_id, title, rss_dict[user_id][title])
             LOGGER.info(
                 f"Rss Feed Added: id: {user_id} - title: {title} - link: {feed_link} - c: {cmd} - inf: {inf} - exf: {exf} - stv: {stv}",
             )
@@ -252,6 +380,7 @@ async def rss_update(_, message, pre_event, state):
             updated.append(title)
             if state == "unsubscribe":
                 del rss_dict[user_id][title]
+                rss_filters.pop((user_id, title), None)
             elif state == "pause":
                 rss_dict[user_id][title]["paused"] = True
             elif state == "resume":
@@ -352,14 +481,7 @@ async def rss_get(_, message, pre_event):
                     message,
                     f"Getting the last <b>{count}</b> item(s) from {title}",
                 )
-                async with AsyncClient(
-                    headers=headers,
-                    follow_redirects=True,
-                    timeout=60,
-                    verify=False,
-                ) as client:
-                    res = await client.get(data["link"])
-                html = res.text
+                html = await fetch_feed(data["link"])
                 rss_d = feed_parse(html)
                 item_info = ""
                 for item_num in range(count):
@@ -443,6 +565,7 @@ async def rss_edit(_, message, pre_event):
                         y = x.split(" or ")
                         exf_lists.append(y)
                 rss_dict[user_id][title]["exf"] = exf_lists
+            get_rss_filter(user_id, title, rss_dict[user_id][title])
     if updated:
         await database.rss_update(user_id)
     await update_rss_menu(pre_event)
@@ -674,6 +797,84 @@ Timeout: 60 sec. Argument -c for command and arguments
             await query.answer(text="Already Running!", show_alert=True)
 
 
+def _get_entry(entry):
+    try:
+        url = entry["links"][1]["href"]
+    except IndexError:
+        url = entry["link"]
+    if entry.get("size"):
+        size = int(entry["size"])
+    elif entry.get("summary"):
+        matches = size_regex.findall(entry["summary"])
+        sizes = [match[0] for match in matches]
+        size = get_size_bytes(sizes[0]) if sizes else 0
+    else:
+        size = 0
+    return entry["title"], url, size
+
+
+async def _check_feed(user, title, data, rss_chat_id, rss_topic_id):
+    html = await fetch_feed(data["link"], conditional=True)
+    if html is None:
+        return
+    rss_d = feed_parse(html)
+    try:
+        last_link = rss_d.entries[0]["links"][1]["href"]
+    except IndexError:
+        last_link = rss_d.entries[0]["link"]
+    last_title = rss_d.entries[0]["title"]
+    if data["last_feed"] == last_link or data["last_title"] == last_title:
+        save_validators(data["link"])
+        return
+    new_entries = []
+    for entry in rss_d.entries:
+        item_title, url, size = _get_entry(entry)
+        if data["last_feed"] == url or data["last_title"] == item_title:
+            break
+        new_entries.append((item_title, url, size))
+    else:
+        LOGGER.warning(
+            f"Reached Max index no. {len(new_entries)} for this feed: {title}. Maybe you need to use less RSS_DELAY to not miss some torrents",
+        )
+    rss_filter = get_rss_filter(user, title, data)
+    for item_title, url, size in new_entries:
+        if not rss_filter.match(item_title):
+            continue
+        if command := data["command"]:
+            if size and Config.RSS_SIZE_LIMIT and size > Config.RSS_SIZE_LIMIT:
+                continue
+            cmd = command.split(maxsplit=1)
+            cmd.insert(1, url)
+            feed_msg = " ".join(cmd)
+            if not feed_msg.startswith("/"):
+                feed_msg = f"/{feed_msg}"
+        else:
+            feed_msg = f"<b>Name: </b><code>{item_title.replace('>', '').replace('<', '')}</code>"
+            feed_msg += f"\n\n<b>Link: </b><code>{url}</code>"
+            if size:
+                feed_msg += f"\n<b>Size: </b>{get_readable_file_size(size)}"
+        feed_msg += f"\n<b>Tag: </b><code>{data['tag']}</code> <code>{user}</code>"
+        queue_rss(feed_msg, rss_chat_id, rss_topic_id)
+    async with rss_dict_lock:
+        if user not in rss_dict or not rss_dict[user].get(title, False):
+            return
+        rss_dict[user][title].update(
+            {"last_feed": last_link, "last_title": last_title},
+        )
+    await database.rss_update(user)
+    save_validators(data["link"])
+    LOGGER.info(f"Feed Name: {title}")
+    LOGGER.info(f"Last item: {last_link}")
+
+
+async def _run_feed(sem, user, title, data, rss_chat_id, rss_topic_id):
+    async with sem:
+        try:
+            await _check_feed(user, title, data, rss_chat_id, rss_topic_id)
+        except Exception as e:
+            LOGGER.error(f"{e} - Feed Name: {title} - Feed Link: {data['link']}")
+
+
 async def rss_monitor():
     chat = Config.RSS_CHAT
     if not chat:
@@ -683,7 +884,6 @@ async def rss_monitor():
     if len(rss_dict) == 0:
         scheduler.pause()
         return
-    all_paused = True
     rss_topic_id = rss_chat_id = None
     if isinstance(chat, int):
         rss_chat_id = chat
@@ -693,141 +893,22 @@ async def rss_monitor():
         ]
     elif chat.lstrip("-").isdigit():
         rss_chat_id = int(chat)
-    for user, items in list(rss_dict.items()):
-        for title, data in items.items():
-            try:
-                if data["paused"]:
-                    continue
-                tries = 0
-                while True:
-                    try:
-                        async with AsyncClient(
-                            headers=headers,
-                            follow_redirects=True,
-                            timeout=60,
-                            verify=False,
-                        ) as client:
-                            res = await client.get(data["link"])
-                        html = res.text
-                        break
-                    except Exception:
-                        tries += 1
-                        if tries > 3:
-                            raise
-                        continue
-                rss_d = feed_parse(html)
-                try:
-                    last_link = rss_d.entries[0]["links"][1]["href"]
-                except IndexError:
-                    last_link = rss_d.entries[0]["link"]
-                finally:
-                    all_paused = False
-                last_title = rss_d.entries[0]["title"]
-                if (
-                    data["last_feed"] == last_link
-                    or data["last_title"] == last_title
-                ):
-                    continue
-                feed_count = 0
-                while True:
-                    try:
-                        await sleep(10)
-                    except Exception:
-                        raise RssShutdownException("Rss Monitor Stopped!") from None
-                    try:
-                        item_title = rss_d.entries[feed_count]["title"]
-                        try:
-                            url = rss_d.entries[feed_count]["links"][1]["href"]
-                        except IndexError:
-                            url = rss_d.entries[feed_count]["link"]
-                        if (
-                            data["last_feed"] == url
-                            or data["last_title"] == item_title
-                        ):
-                            break
-                        if rss_d.entries[feed_count].get("size"):
-                            size = int(rss_d.entries[feed_count]["size"])
-                        elif rss_d.entries[feed_count].get("summary"):
-                            summary = rss_d.entries[feed_count]["summary"]
-                            matches = size_regex.findall(summary)
-                            sizes = [match[0] for match in matches]
-                            size = get_size_bytes(sizes[0])
-                        else:
-                            size = 0
-                    except IndexError:
-                        LOGGER.warning(
-                            f"Reached Max index no. {feed_count} for this feed: {title}. Maybe you need to use less RSS_DELAY to not miss some torrents",
-                        )
-                        break
-                    parse = True
-                    for flist in data["inf"]:
-                        if (
-                            data.get("sensitive", False)
-                            and all(
-                                x.lower() not in item_title.lower() for x in flist
-                            )
-                        ) or (
-                            not data.get("sensitive", False)
-                            and all(x not in item_title for x in flist)
-                        ):
-                            parse = False
-                            feed_count += 1
-                            break
-                    if not parse:
-                        continue
-                    for flist in data["exf"]:
-                        if (
-                            data.get("sensitive", False)
-                            and any(x.lower() in item_title.lower() for x in flist)
-                        ) or (
-                            not data.get("sensitive", False)
-                            and any(x in item_title for x in flist)
-                        ):
-                            parse = False
-                            feed_count += 1
-                            break
-                    if not parse:
-                        continue
-                    if command := data["command"]:
-                        if (
-                            size
-                            and Config.RSS_SIZE_LIMIT
-                            and size > Config.RSS_SIZE_LIMIT
-                        ):
-                            feed_count += 1
-                            continue
-                        cmd = command.split(maxsplit=1)
-                        cmd.insert(1, url)
-                        feed_msg = " ".join(cmd)
-                        if not feed_msg.startswith("/"):
-                            feed_msg = f"/{feed_msg}"
-                    else:
-                        feed_msg = f"<b>Name: </b><code>{item_title.replace('>', '').replace('<', '')}</code>"
-                        feed_msg += f"\n\n<b>Link: </b><code>{url}</code>"
-                        if size:
-                            feed_msg += (
-                                f"\n<b>Size: </b>{get_readable_file_size(size)}"
-                            )
-                    feed_msg += f"\n<b>Tag: </b><code>{data['tag']}</code> <code>{user}</code>"
-                    await send_rss(feed_msg, rss_chat_id, rss_topic_id)
-                    feed_count += 1
-                async with rss_dict_lock:
-                    if user not in rss_dict or not rss_dict[user].get(title, False):
-                        continue
-                    rss_dict[user][title].update(
-                        {"last_feed": last_link, "last_title": last_title},
-                    )
-                await database.rss_update(user)
-                LOGGER.info(f"Feed Name: {title}")
-                LOGGER.info(f"Last item: {last_link}")
-            except RssShutdownException as ex:
-                LOGGER.info(ex)
-                break
-            except Exception as e:
-                LOGGER.error(f"{e} - Feed Name: {title} - Feed Link: {data['link']}")
-                continue
-    if all_paused:
+    feeds = [
+        (user, title, data)
+        for user, items in list(rss_dict.items())
+        for title, data in list(items.items())
+        if not data["paused"]
+    ]
+    if not feeds:
         scheduler.pause()
+        return
+    sem = Semaphore(RSS_CONCURRENCY)
+    await gather(
+        *(
+            _run_feed(sem, user, title, data, rss_chat_id, rss_topic_id)
+            for user, title, data in feeds
+        ),
+    )
 
 
 def add_job():
@@ -1,4 +1,3 @@
-from asyncio import gather, iscoroutinefunction
 from time import time
 
 from psutil import cpu_percent, disk_usage, virtual_memory
@@ -19,6 +18,7 @@ from bot.helper.ext_utils.status_utils import (
     MirrorStatus,
     get_readable_file_size,
     get_readable_time,
+    get_status_tick,
     speed_string_to_bytes,
 )
 from bot.helper.telegram_helper.button_build import ButtonMaker
@@ -32,22 +32,15 @@ from bot.helper.telegram_helper.message_utils import (
 )
 
 
-async def get_download_status(download):
-    tool = download.tool
-    if tool in [
+def get_download_speed(download):
+    if download.tool in [
         "telegram",
         "yt-dlp",
         "rclone",
         "gDriveApi",
     ]:
-        speed = download.speed()
-    else:
-        speed = 0
-    return (
-        await download.status()
-        if iscoroutinefunction(download.status)
-        else download.status()
-    ), speed
+        return download.speed()
+    return 0
 
 
 @new_task
@@ -139,10 +132,9 @@ async def status_pages(_, query):
         up_speed = 0
         seed_speed = ss
         async with task_dict_lock:
-            status_results = await gather(
-                *(get_download_status(download) for download in task_dict.values()),
-            )
-            for status, speed in status_results:
+            tick = await get_status_tick()
+            for download, status in tick["tasks"]:
+                speed = get_download_speed(download)
                 match status:
                     case MirrorStatus.STATUS_DOWNLOAD:
                         tasks["Download"] += 1
@@ -157,7 +149,7 @@ async def status_pages(_, query):
                         tasks["Archive"] += 1
                     case MirrorStatus.STATUS_EXTRACT:
                         tasks["Extract"] += 1
-                    case MirrorStatus.STATUS_SPLIT:
+                    case MirrorStatus.STATUS_SPLIT | MirrorStatus.STATUS_JOIN:
                         tasks["Split"] += 1
                     case MirrorStatus.STATUS_QUEUEDL:
                         tasks["QueueDl"] += 1